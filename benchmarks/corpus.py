@@ -0,0 +1,176 @@
+"""
+Synthetic PDF corpora for the benchmarks.
+
+Corpora:
+    many_small: Many short text documents
+    huge_images: Few long documents with one large uncompressed image per page
+    shared_font: Documents that all embed the same font program
+
+Usage:
+    python -m benchmarks.corpus /tmp/corpus --scale 1
+"""
+
+import os
+import sys
+import json
+import random
+from argparse import ArgumentParser
+
+import pypdf
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject, ArrayObject
+
+# Files and pages of each corpus at scale 1.
+CORPUS_SIZES = {
+    "many_small": {"files": 200, "pages": 3},
+    "huge_images": {"files": 2, "pages": 50, "image_kb": 512},
+    "shared_font": {"files": 20, "pages": 10, "font_kb": 256},
+}
+
+MANIFEST_NAME = "corpus.json"
+
+
+def add_content(pdf_write_obj, page, data, resources):
+    """Sets the content stream and resources of a page.
+
+    Args:
+        pdf_write_obj (pypdf.PdfWriter): Writer of the page.
+        page (pypdf.PageObject): Page.
+        data (bytes): Content stream.
+        resources (DictionaryObject): Page resources.
+    """
+    content = DecodedStreamObject()
+    content.set_data(data)
+    page[NameObject("/Contents")] = pdf_write_obj._add_object(content)
+    page[NameObject("/Resources")] = resources
+
+
+def get_text_font(pdf_write_obj, font_program=None):
+    """Adds a Helvetica font, optionally with an embedded font program.
+
+    Args:
+        pdf_write_obj (pypdf.PdfWriter): Writer to add the font to.
+        font_program (bytes, optional): Embedded font file data. Defaults to None.
+
+    Returns:
+        IndirectObject: Font reference.
+    """
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    if font_program:
+        font_file = DecodedStreamObject()
+        font_file.set_data(font_program)
+        font[NameObject("/FontDescriptor")] = pdf_write_obj._add_object(DictionaryObject({
+            NameObject("/Type"): NameObject("/FontDescriptor"),
+            NameObject("/FontName"): NameObject("/Helvetica"),
+            NameObject("/Flags"): NumberObject(32),
+            NameObject("/FontBBox"): ArrayObject([NumberObject(value) for value in (0, -200, 1000, 900)]),
+            NameObject("/FontFile"): pdf_write_obj._add_object(font_file),
+        }))
+    return pdf_write_obj._add_object(font)
+
+
+def write_text_pdf(path, page_count, font_program=None):
+    """Writes a PDF with a few lines of text per page.
+
+    Args:
+        path (string): Output path.
+        page_count (int): Number of pages.
+        font_program (bytes, optional): Font file data embedded in the font. Defaults to None.
+    """
+    pdf_write_obj = pypdf.PdfWriter()
+    font = get_text_font(pdf_write_obj, font_program)
+    name = os.path.basename(path)
+    for page_index in range(page_count):
+        page = pdf_write_obj.add_blank_page(612, 792)
+        lines = "".join(
+            "BT /F1 12 Tf 72 {0} Td (Line {1} of page {2} of {3}) Tj ET ".format(720 - line * 16, line + 1,
+                                                                                 page_index + 1, name)
+            for line in range(20))
+        add_content(pdf_write_obj, page, lines.encode("ascii"), DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}))
+    with open(path, "wb") as f:
+        pdf_write_obj.write(f)
+
+
+def write_image_pdf(path, page_count, image_kb):
+    """Writes a PDF with one uncompressed random gray image per page.
+
+    Args:
+        path (string): Output path.
+        page_count (int): Number of pages.
+        image_kb (int): Image size per page in KB.
+    """
+    side = int((image_kb * 1024) ** 0.5)
+    pdf_write_obj = pypdf.PdfWriter()
+    for page_index in range(page_count):
+        page = pdf_write_obj.add_blank_page(612, 792)
+        image = DecodedStreamObject()
+        image.set_data(os.urandom(side * side))
+        image.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(side),
+            NameObject("/Height"): NumberObject(side),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        })
+        add_content(pdf_write_obj, page, b"q 500 0 0 500 56 146 cm /Im0 Do Q", DictionaryObject({
+            NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): pdf_write_obj._add_object(image)})}))
+    with open(path, "wb") as f:
+        pdf_write_obj.write(f)
+
+
+def build_corpus(corpus_dir, scale=1.0):
+    """Writes all corpora into a directory, reusing it if built with the same scale.
+
+    Args:
+        corpus_dir (string): Corpus directory.
+        scale (float, optional): Multiplier of the file counts. Defaults to 1.
+
+    Returns:
+        dict: Corpus name -> {"files": list of paths, "pages": total page count}.
+    """
+    manifest_path = os.path.join(corpus_dir, MANIFEST_NAME)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("scale") == scale and manifest.get("sizes") == CORPUS_SIZES:
+            return manifest["corpora"]
+
+    corpora = {}
+    for corpus_name, size in CORPUS_SIZES.items():
+        folder = os.path.join(corpus_dir, corpus_name)
+        os.makedirs(folder, exist_ok=True)
+        file_count = max(1, int(round(size["files"] * scale)))
+        # Identical font bytes in every document, so shared resources can be detected
+        font_program = random.Random(0).randbytes(size["font_kb"] * 1024) if "font_kb" in size else None
+        files = []
+        for file_index in range(file_count):
+            path = os.path.join(folder, "{0}_{1:05d}.pdf".format(corpus_name, file_index + 1))
+            if "image_kb" in size:
+                write_image_pdf(path, size["pages"], size["image_kb"])
+            else:
+                write_text_pdf(path, size["pages"], font_program)
+            files.append(path)
+        corpora[corpus_name] = {"files": files, "pages": file_count * size["pages"]}
+
+    with open(manifest_path, "w") as f:
+        json.dump({"scale": scale, "sizes": CORPUS_SIZES, "corpora": corpora}, f, indent=4)
+    return corpora
+
+
+def main():
+    parser = ArgumentParser(description="Synthetic PDF corpus generator.")
+    parser.add_argument("corpus_dir", help="Directory to write the corpora to.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the file counts.")
+    args = parser.parse_args()
+
+    for corpus_name, corpus in build_corpus(args.corpus_dir, args.scale).items():
+        print("{0}: {1} files, {2} pages".format(corpus_name, len(corpus["files"]), corpus["pages"]))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Frame-time benchmark for drag-and-drop feedback over large output trees.
+
+Builds an offscreen DocumentOutputTreeWidget holding a large expanded
+document, then replays drag move events over it and measures the time of
+each event including the repaint it triggers.
+
+Usage:
+    python -m benchmarks.dragBenchmark --pages 5000 --moves 500
+"""
+
+import os
+import sys
+import time
+import statistics
+from argparse import ArgumentParser
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+
+def build_setup(page_count, output_dir):
+    """Returns a setup with one large document and one small document.
+
+    Args:
+        page_count (int): Pages of the large document.
+        output_dir (string): Output directory of the setup.
+
+    Returns:
+        dict: PDF Setup dictionary.
+    """
+    return {
+        "output_dir": output_dir,
+        "large": {str(page + 1): {str(page + 1): "large.pdf"} for page in range(page_count)},
+        "small": {"1": {"1": "small.pdf"}, "2": {"2": "small.pdf"}},
+    }
+
+
+def run(page_count, move_count):
+    """Replays drag moves over a large document and measures frame times.
+
+    Args:
+        page_count (int): Pages of the large document.
+        move_count (int): Number of drag move events.
+
+    Returns:
+        dict: Frame time statistics in milliseconds.
+    """
+    from ui.main import PyPdfPageManager
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = PyPdfPageManager()
+    window.resize(1200, 900)
+    window.show()
+    tree = window.document_output_tree_widget
+
+    tree.load_setup(build_setup(page_count, window.get_output_folder()))
+    for item in tree.get_items():
+        item.setExpanded(True)
+    app.processEvents()
+
+    # Drag a page of the small document over the large one
+    small_item = tree.topLevelItem(2)
+    tree.setCurrentItem(small_item.child(0))
+    tree.scrollToItem(tree.topLevelItem(1).child(page_count // 2))
+    app.processEvents()
+
+    mime_data = QtCore.QMimeData()
+    viewport_height = tree.viewport().height()
+    frame_times = []
+    for move in range(move_count):
+        position = QtCore.QPointF(50, (move * 7) % viewport_height)
+        event = QtGui.QDragMoveEvent(
+            position.toPoint(),
+            QtCore.Qt.MoveAction,
+            mime_data,
+            QtCore.Qt.LeftButton,
+            QtCore.Qt.NoModifier
+        )
+        start = time.perf_counter()
+        tree.dragMoveEvent(event)
+        app.processEvents()
+        frame_times.append((time.perf_counter() - start) * 1000)
+
+    window.close()
+    return {
+        "pages": page_count,
+        "moves": move_count,
+        "mean_ms": statistics.mean(frame_times),
+        "median_ms": statistics.median(frame_times),
+        "p95_ms": sorted(frame_times)[int(len(frame_times) * 0.95) - 1],
+        "max_ms": max(frame_times),
+    }
+
+
+def main():
+    parser = ArgumentParser(description="Drag-and-drop frame-time benchmark.")
+    parser.add_argument("--pages", type=int, default=5000, help="Pages of the large document.")
+    parser.add_argument("--moves", type=int, default=500, help="Number of drag move events.")
+    args = parser.parse_args()
+
+    result = run(args.pages, args.moves)
+    for key, value in result.items():
+        print("{0}: {1}".format(key, round(value, 3) if isinstance(value, float) else value))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Memory and read syscall benchmark of mmap-backed source reading.
+
+Writes a large image-heavy PDF, then splits it into chunks once with
+sources read whole into memory and once through a memory mapping. Each
+mode runs in a fresh process so peak RSS and the read counters of
+/proc/self/io (Linux only) are not shared between modes.
+
+Usage:
+    python -m benchmarks.mmapBenchmark --pages 100 --image-kb 1024
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from argparse import ArgumentParser, SUPPRESS
+
+from benchmarks.corpus import write_image_pdf
+
+
+def read_proc_counters():
+    """Returns the process read counters and memory figures from /proc/self.
+
+    Returns:
+        dict: syscr and rchar of /proc/self/io, VmHWM and RssAnon of /proc/self/status in KB.
+    """
+    counters = {}
+    with open("/proc/self/io") as f:
+        for line in f:
+            key, value = line.split(":")
+            counters[key] = int(value)
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            if key in ("VmHWM", "RssAnon", "RssFile"):
+                counters[key] = int(value.split()[0])
+    return counters
+
+
+def run_mode(source, output_dir, use_mmap, chunk_pages):
+    """Splits the source into chunks and measures the current process.
+
+    Args:
+        source (string): Source PDF path.
+        output_dir (string): Output directory.
+        use_mmap (bool): Read the source through a memory mapping.
+        chunk_pages (int): Pages per output document.
+
+    Returns:
+        dict: Time, peak RSS, anonymous RSS and read counters of the run.
+    """
+    from engine.pdfEngine import PdfEngine
+
+    before = read_proc_counters()
+    start = time.perf_counter()
+
+    pdf_engine = PdfEngine(use_mmap=use_mmap)
+    reader_cache = pdf_engine.new_reader_cache()
+    page_total = pdf_engine.get_page_count(source, reader_cache)
+    doc_items = (
+        ("chunk_{0}".format(chunk_start // chunk_pages + 1), {
+            str(page - chunk_start + 1): {str(page + 1): source}
+            for page in range(chunk_start, min(chunk_start + chunk_pages, page_total))})
+        for chunk_start in range(0, page_total, chunk_pages))
+    # Measure before the cache is cleared at the end of the job
+    after = None
+    for out_path in pdf_engine.iter_generate_docs(
+            output_dir, doc_items, {"benchmark": source}, reader_cache=reader_cache):
+        after = read_proc_counters()
+
+    return {
+        "mmap": use_mmap,
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": round(after["VmHWM"] / 1024, 1),
+        "rss_anon_mb": round(after["RssAnon"] / 1024, 1),
+        "rss_file_mb": round(after["RssFile"] / 1024, 1),
+        "read_syscalls": after["syscr"] - before["syscr"],
+        "read_mb": round((after["rchar"] - before["rchar"]) / 1024 / 1024, 1),
+    }
+
+
+def main():
+    parser = ArgumentParser(description="mmap source reading benchmark.")
+    parser.add_argument("--pages", type=int, default=100, help="Pages of the source PDF.")
+    parser.add_argument("--image-kb", type=int, default=1024, help="Image size per page in KB.")
+    parser.add_argument("--chunk-pages", type=int, default=10, help="Pages per output document.")
+    parser.add_argument("--child", help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        source, output_dir, use_mmap = json.loads(args.child)
+        print(json.dumps(run_mode(source, output_dir, use_mmap, args.chunk_pages)))
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="mmapBenchmark")
+    try:
+        source = os.path.join(work_dir, "source.pdf")
+        write_image_pdf(source, args.pages, args.image_kb)
+        print("source: {0} pages, {1} MB".format(args.pages, round(os.path.getsize(source) / 1024 / 1024, 1)))
+        for use_mmap in (False, True):
+            output_dir = os.path.join(work_dir, "mmap" if use_mmap else "read")
+            child = json.dumps([source, output_dir, use_mmap])
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.mmapBenchmark", "--chunk-pages", str(args.chunk_pages),
+                 "--child", child],
+                check=True, capture_output=True, text=True).stdout
+            print(output.strip())
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
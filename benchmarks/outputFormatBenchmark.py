@@ -0,0 +1,133 @@
+"""
+File size and first page load benchmark of the output formats.
+
+Merges each synthetic corpus into one output per output format and
+records the generation time, the file size, the bytes a viewer needs
+before it can show the first page and the time to open the file and
+render its first page with QtPdf (pdfium, as in Chromium). Without
+linearization the cross reference data is at the end of the file, so
+the whole file is counted as needed for the first page. The linearized
+format needs pikepdf, it is skipped if pikepdf is not installed.
+
+Usage:
+    python -m benchmarks.outputFormatBenchmark --corpus-dir /tmp/corpus --files 20
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+from argparse import ArgumentParser
+
+from benchmarks.corpus import build_corpus
+
+
+def get_first_page_bytes(path):
+    """Returns the bytes of a file a viewer reads before it can show the first page.
+
+    Args:
+        path (string): PDF path.
+
+    Returns:
+        int: End of the first page section of a linearized file, else the file size.
+    """
+    with open(path, "rb") as f:
+        head = f.read(1024)
+    match = re.search(rb"/Linearized\b.*?/E\s+(\d+)", head, re.DOTALL)
+    return int(match.group(1)) if match else os.path.getsize(path)
+
+
+def time_first_page(path, repeats=5):
+    """Times opening a file and rendering its first page.
+
+    Args:
+        path (string): PDF path.
+        repeats (int, optional): Timed runs. Defaults to 5.
+
+    Returns:
+        float: Best time in seconds.
+    """
+    from PySide6 import QtCore, QtPdf
+
+    times = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        pdf_document = QtPdf.QPdfDocument()
+        pdf_document.load(path)
+        pdf_document.render(0, QtCore.QSize(612, 792))
+        pdf_document.close()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(corpus_dir, file_count, scale=1.0):
+    """Runs the benchmark.
+
+    Args:
+        corpus_dir (string): Corpus directory, built if missing.
+        file_count (int): Files of each corpus merged into the output.
+        scale (float, optional): Corpus scale. Defaults to 1.
+
+    Returns:
+        dict: corpus -> output format -> measurements.
+    """
+    from engine.pdfEngine import PdfEngine
+    from engine.outputFormat import OUTPUT_FORMATS
+
+    formats = list(OUTPUT_FORMATS)
+    try:
+        import pikepdf  # noqa: F401
+    except ImportError:
+        print("Skipping the linearized format, pikepdf is not installed.", file=sys.stderr)
+        formats.remove("linearized")
+
+    pdf_engine = PdfEngine()
+    work_dir = tempfile.mkdtemp(prefix="outputFormatBenchmark")
+    results = {}
+    try:
+        for corpus_name, corpus in build_corpus(corpus_dir, scale).items():
+            pdf_dict = pdf_engine.generate_merged_dict(corpus["files"][:file_count], work_dir)
+            doc_key, doc_val = next((key, value) for key, value in pdf_dict.items() if key != "output_dir")
+            results[corpus_name] = {}
+            for output_format in formats:
+                doc_val = dict(doc_val, options={"format": output_format})
+                start = time.perf_counter()
+                out_path = pdf_engine.generate_doc(doc_key + "_" + output_format, doc_val, work_dir)
+                result = {
+                    "generate_seconds": round(time.perf_counter() - start, 4),
+                    "size_kb": round(os.path.getsize(out_path) / 1024, 1),
+                    "first_page_kb": round(get_first_page_bytes(out_path) / 1024, 1),
+                    "first_page_seconds": round(time_first_page(out_path), 5),
+                }
+                results[corpus_name][output_format] = result
+                print("{0:<12} {1:<15} {2:>8.3f} s {3:>10.1f} KB {4:>10.1f} KB {5:>9.5f} s".format(
+                    corpus_name, output_format, result["generate_seconds"], result["size_kb"],
+                    result["first_page_kb"], result["first_page_seconds"]), flush=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = ArgumentParser(description="Output format size and first page benchmark.")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "pyPdfPageManagerCorpus"),
+                        help="Corpus directory, built if missing.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the corpus file counts.")
+    parser.add_argument("--files", type=int, default=20, help="Files of each corpus merged into the output.")
+    parser.add_argument("--output", help="Write the results JSON to this file.")
+    args = parser.parse_args()
+
+    print("{0:<12} {1:<15} {2:>10} {3:>13} {4:>13} {5:>11}".format(
+        "corpus", "format", "generate", "size", "first page", "open+page1"))
+    results = run(args.corpus_dir, args.files, args.scale)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Cold start benchmark of the GUI, measuring time-to-first-paint.
+
+Every run starts a fresh interpreter that imports the main window, builds
+it, shows it and exits on the first paint event. The parent times the
+whole run from process start, so interpreter start up is included, and
+the child reports where that time went. With --importtime the child runs
+under python -X importtime and the slowest imports are listed.
+
+Usage:
+    python -m benchmarks.startupBenchmark --runs 5 --importtime
+"""
+
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+from argparse import ArgumentParser, SUPPRESS
+
+
+def run_child():
+    """Builds and shows the main window, printing the timings at its first paint."""
+    start = time.perf_counter()
+    from PySide6 import QtCore, QtWidgets
+    from ui.main import PyPdfPageManager
+    imported = time.perf_counter()
+
+    app = QtWidgets.QApplication([])
+    window = PyPdfPageManager()
+    constructed = time.perf_counter()
+
+    class FirstPaintFilter(QtCore.QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QtCore.QEvent.Paint and not timings:
+                timings.update({
+                    "import_seconds": imported - start,
+                    "construct_seconds": constructed - imported,
+                    "first_paint_seconds": time.perf_counter() - start,
+                    "modules": len(sys.modules),
+                    "pypdf_loaded": "pypdf" in sys.modules,
+                    "qtpdf_loaded": "PySide6.QtPdf" in sys.modules,
+                })
+                print(json.dumps(timings), flush=True)
+                QtCore.QTimer.singleShot(0, app.quit)
+            return False
+
+    timings = {}
+    paint_filter = FirstPaintFilter()
+    app.installEventFilter(paint_filter)
+    window.show()
+    app.exec()
+
+
+def parse_importtime(stderr, top=15):
+    """Returns the slowest imports of python -X importtime output.
+
+    Args:
+        stderr (string): Standard error of the child.
+        top (int, optional): Number of imports to return. Defaults to 15.
+
+    Returns:
+        list: (cumulative microseconds, self microseconds, module) tuples, slowest first.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        imports.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def run_once(importtime=False):
+    """Times one cold start in a fresh interpreter.
+
+    Args:
+        importtime (bool, optional): Run the child under -X importtime. Defaults to False.
+
+    Returns:
+        tuple: (child timings dict with "total_seconds" added, stderr of the child)
+    """
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        "-m", "benchmarks.startupBenchmark", "--child", "1"]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    total = time.perf_counter() - start
+    stdout, stderr = process.communicate()
+    if not line:
+        raise RuntimeError("Start up benchmark child failed:\n" + stderr)
+
+    timings = json.loads(line)
+    timings["total_seconds"] = total
+    return timings, stderr
+
+
+def main():
+    parser = ArgumentParser(description="GUI cold start benchmark.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts.")
+    parser.add_argument("--importtime", action="store_true", help="List the slowest imports of one more run.")
+    parser.add_argument("--top", type=int, default=15, help="Number of imports listed with --importtime.")
+    parser.add_argument("--child", help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return 0
+
+    runs = [run_once()[0] for run in range(args.runs)]
+    for key in ("import_seconds", "construct_seconds", "first_paint_seconds", "total_seconds"):
+        values = [timings[key] for timings in runs]
+        print("{0:<20} median {1:.3f} s, best {2:.3f} s".format(key, statistics.median(values), min(values)))
+    print("modules loaded: {0}, pypdf loaded: {1}, QtPdf loaded: {2}".format(
+        runs[0]["modules"], runs[0]["pypdf_loaded"], runs[0]["qtpdf_loaded"]))
+
+    if args.importtime:
+        timings, stderr = run_once(importtime=True)
+        print("\n{0:>10} {1:>10}  module".format("cumul ms", "self ms"))
+        for cumulative_us, self_us, module in parse_importtime(stderr, args.top):
+            print("{0:>10.1f} {1:>10.1f} {2}".format(cumulative_us / 1000, self_us / 1000, module))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+Benchmark suite of the setup builders, generation and output tree.
+
+Runs every case on the synthetic corpora, recording the best time of a
+few repeats, page throughput and peak Python memory (tracemalloc, in a
+separate untimed run) to a JSON results file. With --baseline the
+results are compared against a stored results file, and the exit code
+is 1 if any case got slower than the threshold allows.
+
+Usage:
+    python -m benchmarks.suite --corpus-dir /tmp/corpus --output results.json
+    python -m benchmarks.suite --corpus-dir /tmp/corpus --baseline benchmarks/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import tracemalloc
+from importlib import metadata
+from argparse import ArgumentParser
+
+from benchmarks.corpus import build_corpus
+
+# Slowdowns smaller than this are timer noise, not regressions.
+NOISE_SECONDS = 0.005
+
+
+def get_versions():
+    """Returns the versions of Python and the dependencies that matter for performance.
+
+    Returns:
+        dict: Package name -> version.
+    """
+    versions = {"python": platform.python_version()}
+    for package in ("pypdf", "PySide6", "numpy"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def check_size_split(pdf_dict, documents, max_bytes):
+    """Checks that a size split plan cut its sources into at least as many outputs as their size needs.
+
+    Args:
+        pdf_dict (dict): Setup of generate_size_split_dict.
+        documents (list): Source files of the setup.
+        max_bytes (int): Size budget of the split.
+
+    Raises:
+        RuntimeError: If a source was cut into too few outputs, e.g. because its streams were not counted.
+
+    Returns:
+        dict: The setup.
+    """
+    for document in documents:
+        needed = -(-os.path.getsize(document) // max_bytes)
+        planned = sum(1 for doc_key, doc_val in pdf_dict.items()
+                      if doc_key != "output_dir" and any(document in page_val.values() for page_val in doc_val.values()))
+        if planned < needed:
+            raise RuntimeError("Size split planned {0} outputs of {1}, its size needs at least {2}".format(
+                planned, document, needed))
+    return pdf_dict
+
+
+def get_cases(corpora, work_dir):
+    """Returns the benchmark cases.
+
+    Each case is (name, pages processed, setup function, timed function). The
+    setup function prepares untimed state and returns the argument of the
+    timed function.
+
+    Args:
+        corpora (dict): Corpora as returned by build_corpus.
+        work_dir (string): Scratch directory for outputs.
+
+    Returns:
+        list: Benchmark cases.
+    """
+    from engine.pdfEngine import PdfEngine
+
+    pdf_engine = PdfEngine()
+    small = corpora["many_small"]
+    huge = corpora["huge_images"]
+    shared = corpora["shared_font"]
+    setup_path = os.path.join(work_dir, "setup.json")
+
+    def output_dir(name):
+        path = os.path.join(work_dir, name)
+        shutil.rmtree(path, ignore_errors=True)
+        return path
+
+    def no_setup():
+        return None
+
+    cases = [
+        ("generate_dict.many_small", small["pages"], no_setup,
+         lambda arg: pdf_engine.generate_dict(small["files"], work_dir)),
+        ("generate_merged_dict.many_small", small["pages"], no_setup,
+         lambda arg: pdf_engine.generate_merged_dict(small["files"], work_dir)),
+        ("generate_split_dict.many_small", small["pages"], no_setup,
+         lambda arg: pdf_engine.generate_split_dict(small["files"], work_dir)),
+        ("generate_size_split_dict.huge_images", huge["pages"], no_setup,
+         lambda arg: check_size_split(pdf_engine.generate_size_split_dict(huge["files"], work_dir, 2 * 1024 ** 2),
+                                      huge["files"], 2 * 1024 ** 2)),
+        ("generate_docs.merge_many_small", small["pages"],
+         lambda: pdf_engine.generate_merged_dict(small["files"], output_dir("merge_small")),
+         pdf_engine.generate_docs),
+        ("generate_docs.split_huge_images", huge["pages"],
+         lambda: pdf_engine.generate_split_dict(huge["files"], output_dir("split_huge")),
+         pdf_engine.generate_docs),
+        ("generate_docs.merge_shared_font", shared["pages"],
+         lambda: pdf_engine.generate_merged_dict(shared["files"], output_dir("merge_shared")),
+         pdf_engine.generate_docs),
+        ("save_setup.split_many_small", small["pages"],
+         lambda: pdf_engine.generate_split_dict(small["files"], work_dir),
+         lambda pdf_dict: pdf_engine.save_setup(pdf_dict, setup_path)),
+        ("load_setup.split_many_small", small["pages"],
+         lambda: pdf_engine.save_setup(pdf_engine.generate_split_dict(small["files"], work_dir), setup_path),
+         lambda arg: pdf_engine.load_setup(setup_path)),
+    ]
+
+    try:
+        cases.extend(get_tree_cases(pdf_engine, small, work_dir))
+    except ImportError as e:
+        print("Skipping output tree cases: {0}".format(e), file=sys.stderr)
+    return cases
+
+
+def get_tree_cases(pdf_engine, corpus, work_dir):
+    """Returns the offscreen output tree cases.
+
+    Args:
+        pdf_engine (PdfEngine): Engine building the setup.
+        corpus (dict): Corpus to load.
+        work_dir (string): Output folder of the setup.
+
+    Raises:
+        ImportError: If PySide6 is not installed.
+
+    Returns:
+        list: Benchmark cases.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6 import QtWidgets
+    from ui.main import PyPdfPageManager
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = PyPdfPageManager()
+    tree = window.document_output_tree_widget
+    pdf_dict = pdf_engine.generate_split_dict(corpus["files"], work_dir)
+
+    def load_tree():
+        tree.clear_setup()
+        tree.load_setup(pdf_dict)
+        app.processEvents()
+
+    def clear_tree():
+        tree.clear_setup()
+        app.processEvents()
+
+    return [
+        ("tree.load_setup.split_many_small", corpus["pages"], clear_tree, lambda arg: load_tree()),
+        ("tree.get_current_setup.split_many_small", corpus["pages"], load_tree,
+         lambda arg: tree.get_current_setup()),
+    ]
+
+
+def run_case(setup, function, repeats):
+    """Times a case and measures its peak Python memory.
+
+    Args:
+        setup (callable): Untimed setup returning the argument of function.
+        function (callable): Timed function.
+        repeats (int): Number of timed runs.
+
+    Returns:
+        dict: Best and mean seconds and peak traced memory in MB.
+    """
+    times = []
+    for repeat in range(repeats):
+        arg = setup()
+        start = time.perf_counter()
+        function(arg)
+        times.append(time.perf_counter() - start)
+
+    arg = setup()
+    tracemalloc.start()
+    try:
+        function(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"best_seconds": min(times), "mean_seconds": sum(times) / len(times), "peak_mb": peak / 1024 / 1024}
+
+
+def run(corpus_dir, scale=1.0, repeats=3, case_filter=None):
+    """Runs the suite.
+
+    Args:
+        corpus_dir (string): Corpus directory, built if missing.
+        scale (float, optional): Corpus scale. Defaults to 1.
+        repeats (int, optional): Timed runs per case. Defaults to 3.
+        case_filter (string, optional): Only run cases containing this text. Defaults to None.
+
+    Returns:
+        dict: Results with versions, platform and per case measurements.
+    """
+    corpora = build_corpus(corpus_dir, scale)
+    work_dir = tempfile.mkdtemp(prefix="benchmarkSuite")
+    results = {}
+    try:
+        for name, pages, setup, function in get_cases(corpora, work_dir):
+            if case_filter and case_filter not in name:
+                continue
+            result = run_case(setup, function, repeats)
+            result["pages"] = pages
+            result["pages_per_second"] = pages / result["best_seconds"] if result["best_seconds"] else None
+            results[name] = {key: round(value, 6) if isinstance(value, float) else value
+                             for key, value in result.items()}
+            print("{0}: {1:.4f} s, {2:.0f} pages/s, {3:.1f} MB".format(
+                name, result["best_seconds"], result["pages_per_second"] or 0, result["peak_mb"]), flush=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "versions": get_versions(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "repeats": repeats,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Compares results against a baseline.
+
+    Args:
+        results (dict): Results of this run.
+        baseline (dict): Stored results.
+        threshold (float): Slowdown ratio reported as a regression.
+
+    Returns:
+        list: (case name, baseline seconds, seconds, ratio, is regression) tuples.
+    """
+    comparison = []
+    for name, result in results["results"].items():
+        baseline_result = baseline.get("results", {}).get(name)
+        if not baseline_result or not baseline_result["best_seconds"]:
+            continue
+        ratio = result["best_seconds"] / baseline_result["best_seconds"]
+        is_regression = ratio > threshold and result["best_seconds"] - baseline_result["best_seconds"] > NOISE_SECONDS
+        comparison.append((name, baseline_result["best_seconds"], result["best_seconds"], ratio, is_regression))
+    return comparison
+
+
+def main():
+    parser = ArgumentParser(description="Engine and output tree benchmark suite.")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "pyPdfPageManagerCorpus"),
+                        help="Corpus directory, built if missing.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the corpus file counts.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per case.")
+    parser.add_argument("--filter", help="Only run cases containing this text.")
+    parser.add_argument("--output", help="Write the results JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against this results JSON.")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Slowdown ratio against the baseline reported as a regression.")
+    args = parser.parse_args()
+
+    results = run(args.corpus_dir, args.scale, args.repeats, args.filter)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    if baseline.get("scale") != args.scale:
+        print("Baseline was recorded at scale {0}, times are not comparable.".format(baseline.get("scale")))
+
+    regressions = 0
+    print("\n{0:<45} {1:>10} {2:>10} {3:>7}".format("case", "baseline", "now", "ratio"))
+    for name, baseline_seconds, seconds, ratio, is_regression in compare(results, baseline, args.threshold):
+        regressions += is_regression
+        print("{0:<45} {1:>10.4f} {2:>10.4f} {3:>7.2f}{4}".format(
+            name, baseline_seconds, seconds, ratio, "  REGRESSION" if is_regression else ""))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""
+Headless command line interface of pyPdfPageManager.
+
+Commands:
+    run: Generate the PDFs of a saved setup
+    stream: Merge or split input PDFs while they are being scanned
+    watch: Generate PDFs from files dropped into watched folders
+    serve: Run the local HTTP job API
+    shard: Split a saved setup into a sharded job for several hosts
+    work: Generate the shards of a sharded job
+    coordinate: Retry failed shards of a sharded job and merge their results
+    setup: Interleave, concatenate, reverse, select or rotate the pages of setup documents
+"""
+
+import os
+import sys
+import json
+import getpass
+import signal
+import logging
+import argparse
+import multiprocessing
+
+
+def iter_input_files(args):
+    """
+    Yields the input files of the command line, then those of the input list file.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+
+    Yields:
+        str: PDF file path
+    """
+    yield from args.inputs
+    if args.input_list:
+        with open(args.input_list, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+
+
+def ask_password(document, attempt):
+    """
+    Password provider asking on the terminal.
+
+    Args:
+        document (str): Path of the encrypted PDF file
+        attempt (int): Number of this attempt, starting at 1
+
+    Returns:
+        str: The password, None if nothing was entered
+    """
+    prompt = "Password for {0}: ".format(document)
+    if attempt > 1:
+        prompt = "Wrong password. " + prompt
+    return getpass.getpass(prompt) or None
+
+
+def get_credentials(args):
+    """
+    Returns a credential cache with the passwords of the password file.
+
+    Only run and stream ask for missing passwords, and only on a terminal.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        CredentialCache: Credential cache
+    """
+    from engine.credentials import CredentialCache
+
+    interactive = args.command in ("run", "stream") and sys.stdin.isatty()
+    credentials = CredentialCache(provider=ask_password if interactive else None)
+    if args.password_file:
+        with open(args.password_file, "r") as f:
+            for document, password in json.load(f).items():
+                credentials.set_password(document, password)
+    return credentials
+
+
+def get_pdf_engine(args):
+    """
+    Returns an engine using the reading mode, profiling, passwords, output format and staging of the command line.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        PdfEngine: Engine
+    """
+    from engine.instrumentation import Instrumentation
+    from engine.pdfEngine import PdfEngine
+
+    staging = None
+    if args.stage_dir:
+        from engine.stagingCache import StagingCache
+        staging = StagingCache(args.stage_dir, max_bytes=args.stage_limit * 1024 ** 2)
+    return PdfEngine(use_mmap=args.mmap, instrumentation=Instrumentation(profile_dir=args.profile_dir),
+                     credentials=get_credentials(args), output_format=args.format, staging=staging)
+
+
+def print_stats(args, pdf_engine):
+    """
+    Prints the stage timing summary of the engine, and its staging statistics, to stderr if asked for.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+        pdf_engine (PdfEngine): Engine that ran the job
+    """
+    if args.stats:
+        print(pdf_engine.instrumentation.format_summary(), file=sys.stderr, flush=True)
+        if pdf_engine.staging is not None:
+            print(pdf_engine.staging.format_stats(), file=sys.stderr, flush=True)
+
+
+def run(args):
+    """
+    Generates the PDFs of a saved setup, printing each output path once written.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    """
+    pdf_engine = get_pdf_engine(args)
+    pdf_dict = pdf_engine.load_setup(args.setup)
+    doc_items = ((doc_key, doc_val) for doc_key, doc_val in pdf_dict.items() if doc_key != "output_dir")
+    for out_path in pdf_engine.iter_generate_docs(pdf_dict["output_dir"], doc_items, pdf_dict, resume=args.resume):
+        print(out_path, flush=True)
+    print_stats(args, pdf_engine)
+
+
+def stream(args):
+    """
+    Builds setup documents from the inputs and generates them as they are built,
+    printing each output path once written.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    """
+    pdf_engine = get_pdf_engine(args)
+    builders = {
+        "documents": pdf_engine.iter_dict,
+        "merge": pdf_engine.iter_merged_dict,
+        "split": pdf_engine.iter_split_dict,
+    }
+    # Identifies the job for --resume without holding every input in memory
+    job_key = {"mode": args.mode, "output_dir": args.output_dir, "inputs": args.inputs,
+               "input_list": args.input_list}
+    reader_cache = pdf_engine.new_reader_cache()
+    doc_items = builders[args.mode](iter_input_files(args), reader_cache=reader_cache)
+    for out_path in pdf_engine.iter_generate_docs(
+            args.output_dir, doc_items, job_key, resume=args.resume, reader_cache=reader_cache):
+        print(out_path, flush=True)
+    print_stats(args, pdf_engine)
+
+
+def watch(args):
+    """
+    Runs the watch folder service until interrupted.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    """
+    from engine.watchService import WatchService, load_rules
+
+    service = WatchService(load_rules(args.rules), pdf_engine=get_pdf_engine(args), use_inotify=not args.poll)
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.stop())
+
+    def print_metrics(metrics):
+        print(json.dumps(metrics, sort_keys=True), flush=True)
+        print_stats(args, service.pdf_engine)
+
+    try:
+        service.serve_forever(metrics_callback=print_metrics, metrics_interval=args.metrics_interval)
+    except KeyboardInterrupt:
+        service.stop()
+    print_metrics(service.get_metrics())
+
+
+def serve(args):
+    """
+    Runs the local HTTP job API until interrupted.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    """
+    from engine.jobQueue import JobQueue
+    from engine.jobServer import JobServer
+
+    job_queue = JobQueue(max_workers=args.workers, max_pending=args.max_pending, pdf_engine=get_pdf_engine(args))
+    server = JobServer(args.host, args.port, job_queue=job_queue)
+    # Stop like on Ctrl+C, serve_forever runs in this thread
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print("Serving jobs on {0}".format(server.url), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        job_queue.shutdown()
+        print_stats(args, job_queue.pdf_engine)
+
+
+def shard(args):
+    """
+    Splits a saved setup into the shards of a job directory, printing the number of shards.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    """
+    from engine.pdfEngine import PdfEngine
+    from engine.shardedJob import ShardedJob
+
+    pdf_dict = PdfEngine().load_setup(args.setup)
+    print(ShardedJob(args.job_dir).create(pdf_dict, shard_size=args.shard_size), flush=True)
+
+
+def work(args):
+    """
+    Generates the shards of a job directory until every shard is done, printing each shard once done.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    """
+    from engine.shardedJob import ShardedJob, ShardWorker
+
+    worker = ShardWorker(ShardedJob(args.job_dir), pdf_engine=get_pdf_engine(args), max_attempts=args.max_attempts)
+    # Stop like on Ctrl+C, the claim of the running shard expires and the coordinator retries it
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for shard in worker.run(exit_when_idle=args.exit_when_idle):
+            print(shard, flush=True)
+    except KeyboardInterrupt:
+        pass
+    print_stats(args, worker.pdf_engine)
+
+
+def coordinate(args):
+    """
+    Retries failed shards of a job directory until every shard is done or failed for good,
+    then prints the output paths of the job.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    """
+    from engine.shardedJob import ShardedJob, ShardCoordinator
+
+    coordinator = ShardCoordinator(ShardedJob(args.job_dir), max_attempts=args.max_attempts,
+                                   lease_seconds=args.lease)
+    if args.local_workers:
+        coordinator.start_local_workers(
+            args.local_workers, engine_options={"use_mmap": args.mmap, "output_format": args.format})
+
+    def print_progress(counts):
+        print(json.dumps(counts, sort_keys=True), file=sys.stderr, flush=True)
+
+    results = coordinator.wait(progress_callback=print_progress if args.verbose else None)
+    for out_path in results["out_paths"]:
+        print(out_path, flush=True)
+    for shard_name, error in results["failed"].items():
+        print("Shard {0} failed: {1}".format(shard_name, error), file=sys.stderr, flush=True)
+    return 1 if results["failed"] else 0
+
+
+def edit_setup(args):
+    """
+    Applies a page order operation to documents of a saved setup and saves the result.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+    """
+    from engine.pdfEngine import PdfEngine
+    from engine.setupAlgebra import apply_operation
+
+    pdf_engine = PdfEngine()
+    pdf_dict = pdf_engine.load_setup(args.setup)
+    try:
+        pdf_dict = apply_operation(
+            pdf_dict, args.operation.replace("-", "_"), args.documents, doc_name=args.name, ranges=args.pages,
+            steps=args.steps, reverse_last=args.reverse_last)
+    except (KeyError, ValueError) as exception:
+        print(exception.args[0], file=sys.stderr, flush=True)
+        return 1
+    pdf_engine.save_setup(pdf_dict, os.path.abspath(args.output or args.setup))
+
+
+def build_parser():
+    """
+    Builds the argument parser.
+
+    Returns:
+        argparse.ArgumentParser: Parser with one sub parser per command
+    """
+    parser = argparse.ArgumentParser(prog="pyPdfPageManager", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress to stderr")
+    parser.add_argument(
+        "--mmap", action="store_true", help="Read input PDFs through memory mappings, for large local files")
+    parser.add_argument(
+        "--stats", action="store_true", help="Print time spent per stage (open, parse, decrypt, append, navigate, serialize, fsync)")
+    parser.add_argument("--profile-dir", help="Write a cProfile .prof file per generation job to this folder")
+    parser.add_argument(
+        "--password-file", help="JSON file mapping encrypted input PDF paths to their passwords")
+    parser.add_argument(
+        "--format", choices=["classic", "object_streams", "linearized"], default="classic",
+        help="Output format of documents without a format option (linearized needs pikepdf)")
+    parser.add_argument(
+        "--stage-dir", help="Copy input PDFs to this local folder once and read them from there, for network storage")
+    parser.add_argument(
+        "--stage-limit", type=int, default=2048, help="Size limit of the staged copies in MB (default 2048)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Generate the PDFs of a saved setup")
+    run_parser.add_argument("setup", help="Setup JSON file")
+    run_parser.add_argument("--resume", action="store_true", help="Skip documents of an interrupted run")
+    run_parser.set_defaults(function=run)
+
+    stream_parser = commands.add_parser(
+        "stream", help="Merge or split input PDFs while they are being scanned")
+    stream_parser.add_argument(
+        "mode", choices=["documents", "merge", "split"],
+        help="One output per input, one merged output, or one output per page")
+    stream_parser.add_argument("inputs", nargs="*", help="Input PDF files")
+    stream_parser.add_argument("-o", "--output-dir", required=True, help="Output folder")
+    stream_parser.add_argument("--input-list", help="Text file with one input PDF path per line")
+    stream_parser.add_argument("--resume", action="store_true", help="Skip documents of an interrupted run")
+    stream_parser.set_defaults(function=stream)
+
+    watch_parser = commands.add_parser("watch", help="Generate PDFs from files dropped into watched folders")
+    watch_parser.add_argument("rules", help="JSON rule file")
+    watch_parser.add_argument("--poll", action="store_true", help="Poll the folders instead of using inotify")
+    watch_parser.add_argument(
+        "--metrics-interval", type=float, default=60.0, help="Seconds between metrics lines on stdout")
+    watch_parser.set_defaults(function=watch)
+
+    serve_parser = commands.add_parser("serve", help="Run the local HTTP job API")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    serve_parser.add_argument("--port", type=int, default=8765, help="Port to bind")
+    serve_parser.add_argument("--workers", type=int, default=2, help="Number of jobs run at once")
+    serve_parser.add_argument("--max-pending", type=int, default=16, help="Queued jobs before returning 503")
+    serve_parser.set_defaults(function=serve)
+
+    shard_parser = commands.add_parser("shard", help="Split a saved setup into a sharded job for several hosts")
+    shard_parser.add_argument("setup", help="Setup JSON file")
+    shard_parser.add_argument("job_dir", help="Job folder on storage shared by the hosts")
+    shard_parser.add_argument("--shard-size", type=int, default=1000, help="Documents per shard")
+    shard_parser.set_defaults(function=shard)
+
+    work_parser = commands.add_parser("work", help="Generate the shards of a sharded job")
+    work_parser.add_argument("job_dir", help="Job folder")
+    work_parser.add_argument("--max-attempts", type=int, default=3, help="Attempts before a shard fails for good")
+    work_parser.add_argument(
+        "--exit-when-idle", action="store_true", help="Exit when no shard is left to claim instead of waiting for retries")
+    work_parser.set_defaults(function=work)
+
+    coordinate_parser = commands.add_parser(
+        "coordinate", help="Retry failed shards of a sharded job and merge their results")
+    coordinate_parser.add_argument("job_dir", help="Job folder")
+    coordinate_parser.add_argument("--max-attempts", type=int, default=3, help="Attempts before a shard fails for good")
+    coordinate_parser.add_argument(
+        "--lease", type=float, default=600.0, help="Seconds without progress before a shard is taken from its worker")
+    coordinate_parser.add_argument(
+        "--local-workers", type=int, default=0, help="Also run this many worker processes on this host")
+    coordinate_parser.set_defaults(function=coordinate)
+
+    setup_parser = commands.add_parser(
+        "setup", help="Interleave, concatenate, reverse, select or rotate the pages of setup documents")
+    setup_parser.add_argument("setup", help="Setup JSON file")
+    setup_parser.add_argument(
+        "operation", choices=["interleave", "concatenate", "reverse", "select", "rotate-order"],
+        help="Interleave or concatenate the documents into one, or reorder each document")
+    setup_parser.add_argument("documents", nargs="+", help="Setup document names, in order")
+    setup_parser.add_argument("-o", "--output", help="Setup JSON file to write (default: overwrite the setup)")
+    setup_parser.add_argument("--name", help="Name of the combined document (default: the first document's)")
+    setup_parser.add_argument(
+        "--reverse-last", action="store_true",
+        help="Take the last document backwards, e.g. the backs of a duplex scan")
+    setup_parser.add_argument("--pages", help="Page ranges kept by select, e.g. 1-4,8,10- or 20-1")
+    setup_parser.add_argument("--steps", type=int, default=1, help="Positions rotate-order moves the pages forward")
+    setup_parser.set_defaults(function=edit_setup)
+    return parser
+
+
+def main(argv=None):
+    """
+    Parses the arguments and runs the command.
+
+    Args:
+        argv (list, optional): Arguments. Defaults to None, using sys.argv.
+    """
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    # Required for worker processes of the frozen PyInstaller build
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from engine.jobLog import JobLog
+from engine.pdfEngine import PdfEngine
+
+
+class AsyncPdfEngine():
+    """asyncio facade over PdfEngine.
+
+    Parsing and writing run in an executor so the event loop is never
+    blocked. Documents of a setup are generated concurrently up to
+    max_concurrency, each running document using its own ReaderCache as
+    readers are not safe to share between threads. Cancelling a call stops
+    starting new documents; documents already being written finish in the
+    executor, are recorded in the job log and can be skipped on resume.
+    """
+    def __init__(self, pdf_engine=None, max_concurrency=4, executor=None):
+        """Initialize the async engine.
+
+        Args:
+            pdf_engine (PdfEngine, optional): Wrapped engine. Defaults to None, creating one.
+            max_concurrency (int, optional): Maximum number of documents generated at once. Defaults to 4.
+            executor (concurrent.futures.Executor, optional): Executor running engine calls.
+                Defaults to None, using a thread pool of max_concurrency threads.
+        """
+        self.pdf_engine = pdf_engine or PdfEngine()
+        self.max_concurrency = max_concurrency
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="AsyncPdfEngine")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Shuts down the executor if it was created by this engine."""
+        if self._own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, function, *args, **kwargs):
+        """Runs a blocking call in the executor.
+
+        Args:
+            function (callable): Blocking function.
+            *args: Positional arguments.
+            **kwargs: Keyword arguments.
+
+        Returns:
+            object: Return value of the function.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    async def aload_setup(self, load_file):
+        """Async PdfEngine.load_setup."""
+        return await self.run(self.pdf_engine.load_setup, load_file)
+
+    async def asave_setup(self, data, save_file):
+        """Async PdfEngine.save_setup."""
+        return await self.run(self.pdf_engine.save_setup, data, save_file)
+
+    async def agenerate_dict(self, document_list, output_folder):
+        """Async PdfEngine.generate_dict."""
+        return await self.run(self.pdf_engine.generate_dict, document_list, output_folder)
+
+    async def agenerate_merged_dict(self, document_list, output_folder):
+        """Async PdfEngine.generate_merged_dict."""
+        return await self.run(self.pdf_engine.generate_merged_dict, document_list, output_folder)
+
+    async def agenerate_split_dict(self, document_list, output_folder):
+        """Async PdfEngine.generate_split_dict."""
+        return await self.run(self.pdf_engine.generate_split_dict, document_list, output_folder)
+
+    async def agenerate_page_count_split_dict(self, document_list, output_folder, page_count):
+        """Async PdfEngine.generate_page_count_split_dict."""
+        return await self.run(
+            self.pdf_engine.generate_page_count_split_dict, document_list, output_folder, page_count)
+
+    async def agenerate_size_split_dict(self, document_list, output_folder, max_bytes):
+        """Async PdfEngine.generate_size_split_dict."""
+        return await self.run(self.pdf_engine.generate_size_split_dict, document_list, output_folder, max_bytes)
+
+    async def agenerate_bookmark_split_dict(self, document_list, output_folder):
+        """Async PdfEngine.generate_bookmark_split_dict."""
+        return await self.run(self.pdf_engine.generate_bookmark_split_dict, document_list, output_folder)
+
+    async def aiter_docs(self, pdf_dict, resume=False):
+        """Generates the documents of a PDF Setup dict, yielding each as it completes.
+
+        Documents already completed by an interrupted run are yielded first
+        when resuming. The job log is written from the event loop only.
+
+        Args:
+            pdf_dict (dict): PDF Setup dict.
+            resume (bool, optional): Resume an interrupted job. Defaults to False.
+
+        Yields:
+            tuple: (doc_key, output path) in completion order.
+        """
+        output_dir = pdf_dict["output_dir"]
+        await self.run(os.makedirs, output_dir, exist_ok=True)
+        job_log = JobLog(output_dir, pdf_dict)
+        await self.run(job_log.start, resume)
+
+        reader_caches = asyncio.Queue()
+        for _ in range(self.max_concurrency):
+            reader_caches.put_nowait(self.pdf_engine.new_reader_cache())
+
+        started = set()
+
+        async def generate(doc_key, doc_val):
+            reader_cache = await reader_caches.get()
+            started.add(doc_key)
+            try:
+                return doc_key, await self.run(
+                    self.pdf_engine.generate_doc, doc_key, doc_val, output_dir, reader_cache)
+            finally:
+                reader_caches.put_nowait(reader_cache)
+
+        tasks = []
+        try:
+            for doc_key, doc_val in pdf_dict.items():
+                if doc_key == "output_dir":
+                    continue
+                if job_log.is_complete(doc_key):
+                    yield doc_key, job_log.completed[doc_key]["path"]
+                    continue
+                tasks.append(asyncio.ensure_future(generate(doc_key, doc_val)))
+                tasks[-1].set_name(doc_key)
+
+            for next_done in asyncio.as_completed(tasks):
+                doc_key, out_path = await next_done
+                job_log.mark_complete(doc_key, out_path)
+                yield doc_key, out_path
+        except BaseException:
+            # Documents already in the executor cannot be stopped, let them
+            # finish so the log records every file written to disk
+            finishing = []
+            for task in tasks:
+                if task.done() or task.get_name() in started:
+                    finishing.append(task)
+                else:
+                    task.cancel()
+            for task in finishing:
+                try:
+                    doc_key, out_path = await task
+                except (Exception, asyncio.CancelledError):
+                    continue
+                if not job_log.is_complete(doc_key):
+                    job_log.mark_complete(doc_key, out_path)
+            job_log.close()
+            raise
+        finally:
+            while not reader_caches.empty():
+                reader_caches.get_nowait().clear()
+
+        job_log.finish()
+
+    async def agenerate_docs(self, pdf_dict, resume=False):
+        """Async PdfEngine.generate_docs, generating documents concurrently.
+
+        Args:
+            pdf_dict (dict): PDF Setup dict.
+            resume (bool, optional): Resume an interrupted job. Defaults to False.
+
+        Returns:
+            list: Output paths in setup order.
+        """
+        out_paths = {}
+        async for doc_key, out_path in self.aiter_docs(pdf_dict, resume=resume):
+            out_paths[doc_key] = out_path
+        return [out_paths[doc_key] for doc_key in pdf_dict if doc_key in out_paths]
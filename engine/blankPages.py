@@ -0,0 +1,95 @@
+import numpy as np
+
+from engine.pageCache import PageCache
+
+# Side of the square thumbnail ink coverage is measured on.
+INK_IMAGE_SIZE = 96
+
+# Gray values below this count as ink.
+INK_GRAY_LEVEL = 200
+
+# Fraction of each side ignored, scanners leave dark borders and punch holes there.
+INK_MARGIN = 0.05
+
+
+def compute_ink_coverage(document, password=None):
+    """Renders a PDF file and measures the ink coverage of each page.
+
+    Runs in worker processes. All pages are measured at once on a stack
+    of equally sized thumbnails.
+
+    Args:
+        document (string): Path of PDF file.
+        password (string, optional): Password of an encrypted source. Defaults to None.
+
+    Returns:
+        list: Fraction of inked pixels of each page.
+    """
+    from engine.pageRaster import render_pages_gray
+
+    images = render_pages_gray(document, size=INK_IMAGE_SIZE, password=password)
+    if not images:
+        return []
+    margin = int(INK_IMAGE_SIZE * INK_MARGIN)
+    stack = np.stack(images)[:, margin:INK_IMAGE_SIZE - margin, margin:INK_IMAGE_SIZE - margin]
+    coverage = (stack < INK_GRAY_LEVEL).mean(axis=(1, 2))
+    return [float(value) for value in coverage]
+
+
+class BlankPageDetector():
+    """Detects blank pages by their ink coverage on a low resolution render.
+
+    Coverage is computed per source in a process pool and cached per page.
+    """
+    CACHE_KIND = "ink"
+
+    def __init__(self, page_cache=None):
+        """Initialize the blank page detector.
+
+        Args:
+            page_cache (PageCache, optional): Cache of page coverage. Defaults to None,
+                using the default page cache.
+        """
+        self.page_cache = page_cache or PageCache()
+
+    def close(self):
+        """Closes the page cache."""
+        self.page_cache.close()
+
+    def get_ink_coverage(self, documents, max_workers=None, progress_callback=None, passwords=None):
+        """Returns the ink coverage of every page of the documents.
+
+        Args:
+            documents (list): List of PDF files.
+            max_workers (int, optional): Number of worker processes. Defaults to None, one per CPU.
+            progress_callback (callable, optional): Called with (done, total) after each source.
+            passwords (dict, optional): Passwords of encrypted sources, keyed by document. Defaults to None.
+
+        Returns:
+            dict: numpy array of page coverage, keyed by document.
+        """
+        document_values = self.page_cache.get_document_values(
+            documents, self.CACHE_KIND, compute_ink_coverage, encode="{0:.6f}".format,
+            max_workers=max_workers, progress_callback=progress_callback, passwords=passwords)
+        return {document: np.array(values, dtype=np.float64) for document, values in document_values.items()}
+
+    def find_blank_pages(self, documents, max_coverage=0.002, max_workers=None, progress_callback=None,
+                         passwords=None):
+        """Finds pages with at most a given ink coverage.
+
+        Args:
+            documents (list): List of PDF files.
+            max_coverage (float, optional): Highest fraction of inked pixels of a blank page. Defaults to 0.002.
+            max_workers (int, optional): Number of worker processes. Defaults to None.
+            progress_callback (callable, optional): Called with (done, total) after each computed source.
+            passwords (dict, optional): Passwords of encrypted sources, keyed by document. Defaults to None.
+
+        Returns:
+            list: (document, page number) tuples of blank pages.
+        """
+        coverage = self.get_ink_coverage(documents, max_workers, progress_callback, passwords)
+        blank_pages = []
+        for document in documents:
+            page_indexes = np.flatnonzero(coverage.get(document, np.empty(0)) <= max_coverage)
+            blank_pages.extend((document, int(page_index) + 1) for page_index in page_indexes)
+        return blank_pages
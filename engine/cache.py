@@ -0,0 +1,42 @@
+import os
+import hashlib
+
+# Bytes hashed from the start and the end of a file for its fingerprint.
+FINGERPRINT_CHUNK = 65536
+
+
+def get_cache_dir():
+    """Returns the local cache directory, creating it if needed.
+
+    The PYPDFPAGEMANAGER_CACHE environment variable overrides the default
+    ~/.pyPdfPageManager location.
+
+    Returns:
+        string: Cache directory path.
+    """
+    cache_dir = os.environ.get("PYPDFPAGEMANAGER_CACHE") or os.path.expanduser("~/.pyPdfPageManager")
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    return cache_dir
+
+
+def get_file_fingerprint(path):
+    """Returns a cheap fingerprint identifying the content of a file.
+
+    Combines size and modification time with a hash of the first and last
+    64 KB, so a changed file gets a new fingerprint without reading it all.
+
+    Args:
+        path (string): File path.
+
+    Returns:
+        string: Fingerprint.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK))
+        if stat.st_size > FINGERPRINT_CHUNK:
+            f.seek(max(FINGERPRINT_CHUNK, stat.st_size - FINGERPRINT_CHUNK))
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return "{0}-{1}-{2}".format(stat.st_size, stat.st_mtime_ns, digest.hexdigest()[:16])
@@ -0,0 +1,154 @@
+import logging
+import threading
+
+import pypdf
+from pypdf.errors import FileNotDecryptedError
+
+logger = logging.getLogger(__name__)
+
+from engine.cache import get_file_fingerprint
+
+
+class CredentialCache():
+    """Session cache of the passwords and file keys of encrypted sources.
+
+    PdfReader already tries the empty password, which opens files only
+    protected by an owner password. Other sources are unlocked with, in
+    order, their cached file key, their cached password and the passwords
+    returned by the provider. The provider is asked one source at a time,
+    and only once per source even when many readers of it are opened in
+    parallel. Nothing is written to disk, the cache lives as long as the
+    engine.
+
+    Reusing the file key skips the key derivation, which for AES-256
+    takes a few milliseconds per reader and is repeated for every wrong
+    password tried.
+    """
+    def __init__(self, provider=None, max_attempts=3):
+        """Initialize the credential cache.
+
+        Args:
+            provider (callable, optional): Called with (document, attempt) to ask for a
+                password, returns the password or None to give up. Defaults to None,
+                only trying known passwords.
+            max_attempts (int, optional): Passwords asked from the provider per source.
+                Defaults to 3.
+        """
+        self.provider = provider
+        self.max_attempts = max_attempts
+        self._passwords = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._document_locks = {}
+        self._prompt_lock = threading.Lock()
+
+    def set_password(self, document, password):
+        """Stores a known password of a source, e.g. from a password file.
+
+        Args:
+            document (string): Path of PDF file.
+            password (string): Password of the source.
+        """
+        with self._lock:
+            self._passwords[document] = password
+            self._keys.pop(document, None)
+
+    def get_password(self, document):
+        """Returns the known password of a source, e.g. to open it in a viewer.
+
+        Args:
+            document (string): Path of PDF file.
+
+        Returns:
+            string: The password, None if unknown.
+        """
+        with self._lock:
+            return self._passwords.get(document)
+
+    def forget(self, document):
+        """Drops the password and file key of a source.
+
+        Args:
+            document (string): Path of PDF file.
+        """
+        with self._lock:
+            self._passwords.pop(document, None)
+            self._keys.pop(document, None)
+
+    def clear(self):
+        """Drops all passwords and file keys."""
+        with self._lock:
+            self._passwords.clear()
+            self._keys.clear()
+
+    def _get_document_lock(self, document):
+        with self._lock:
+            return self._document_locks.setdefault(document, threading.Lock())
+
+    def unlock(self, reader, document):
+        """Decrypts the reader of an encrypted source.
+
+        Args:
+            reader (pypdf.PdfReader): Reader of the source.
+            document (string): Path of PDF file.
+
+        Raises:
+            FileNotDecryptedError: If no password could decrypt the source.
+
+        Returns:
+            pypdf.PdfReader: The decrypted reader.
+        """
+        encryption = getattr(reader, "_encryption", None)
+        if not reader.is_encrypted or (encryption is not None and encryption.is_decrypted()):
+            return reader
+
+        with self._get_document_lock(document):
+            fingerprint = get_file_fingerprint(document)
+            if self._use_key(reader, self._keys.get(document), fingerprint):
+                return reader
+
+            password = self._passwords.get(document)
+            if password is not None and self._try_password(reader, document, password, fingerprint):
+                return reader
+
+            if self.provider is not None:
+                with self._prompt_lock:
+                    for attempt in range(1, self.max_attempts + 1):
+                        password = self.provider(document, attempt)
+                        if password is None:
+                            break
+                        if self._try_password(reader, document, password, fingerprint):
+                            return reader
+                        logger.warning("Wrong password for %s", document)
+
+        raise FileNotDecryptedError("No valid password for {0}".format(document))
+
+    def _try_password(self, reader, document, password, fingerprint):
+        """Decrypts the reader with a password, caching it and the file key on success.
+
+        Returns:
+            bool: True if the password was valid.
+        """
+        if reader.decrypt(password) == pypdf.PasswordType.NOT_DECRYPTED:
+            return False
+        encryption = getattr(reader, "_encryption", None)
+        with self._lock:
+            self._passwords[document] = password
+            if getattr(encryption, "_key", None):
+                self._keys[document] = (fingerprint, encryption._key, encryption._password_type)
+        return True
+
+    def _use_key(self, reader, cached_key, fingerprint):
+        """Unlocks the reader with a cached file key of the same file content.
+
+        Falls back to the password if the installed pypdf keeps its key elsewhere.
+
+        Returns:
+            bool: True if the key was installed.
+        """
+        encryption = getattr(reader, "_encryption", None)
+        if cached_key is None or cached_key[0] != fingerprint or not hasattr(encryption, "_key"):
+            return False
+        encryption._key = cached_key[1]
+        encryption._password_type = cached_key[2]
+        return True
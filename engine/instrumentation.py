@@ -0,0 +1,142 @@
+import os
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+# Stages timed by PdfEngine, in pipeline order.
+STAGES = ("open", "parse", "decrypt", "append", "navigate", "serialize", "fsync")
+
+
+class Instrumentation():
+    """Per-stage timers, counters and optional cProfile capture of PdfEngine jobs.
+
+    Stages:
+        open: Reading or mapping a source file
+        parse: Building a PdfReader, reading the xref and trailer
+        decrypt: Unlocking an encrypted source, including password prompts
+        append: Copying a page into the writer with its transforms, which
+            includes resolving the objects pypdf parses lazily
+        navigate: Copying annotations and remapping outlines, links and named
+            destinations to the output pages
+        serialize: PdfWriter.write to the temp file
+        fsync: Flushing the output file and its directory to disk
+
+    Listeners are called with (stage, seconds, info) after every timed
+    stage. Totals are shared by every job of the engine, call reset before
+    a job to get its own summary. Safe to use from several threads.
+    """
+    def __init__(self, profile_dir=None):
+        """Initialize the instrumentation.
+
+        Args:
+            profile_dir (string, optional): Directory to write a cProfile .prof file
+                per job to. Defaults to None, not profiling.
+        """
+        self.profile_dir = profile_dir
+        self.last_profile = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all stage totals and counters."""
+        with self._lock:
+            self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+            self.stage_counts = dict.fromkeys(STAGES, 0)
+            self.counters = {}
+
+    def add_listener(self, listener):
+        """Registers a callable called with (stage, seconds, info) after every timed stage.
+
+        Args:
+            listener (callable): Stage listener.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a stage listener.
+
+        Args:
+            listener (callable): Stage listener.
+        """
+        self._listeners.remove(listener)
+
+    @contextmanager
+    def stage(self, name, **info):
+        """Times the enclosed block as a stage.
+
+        Args:
+            name (string): Stage name, one of STAGES or a custom one.
+            **info: Details passed to the listeners, e.g. document=path.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+                self.stage_counts[name] = self.stage_counts.get(name, 0) + 1
+            for listener in self._listeners:
+                listener(name, seconds, info)
+
+    def count(self, name, amount=1):
+        """Adds to a counter, e.g. "pages" or "documents".
+
+        Args:
+            name (string): Counter name.
+            amount (int, optional): Amount to add. Defaults to 1.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def job(self, job_name):
+        """Profiles the enclosed job with cProfile if a profile dir is set.
+
+        Only the calling thread is profiled. The stats are kept in
+        last_profile and written to <profile_dir>/<job_name>.prof.
+
+        Args:
+            job_name (string): Name of the profile file.
+        """
+        if not self.profile_dir:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, job_name + ".prof"))
+            self.last_profile = pstats.Stats(profiler)
+
+    def get_summary(self):
+        """Returns the stage totals and counters.
+
+        Returns:
+            dict: {"stages": {stage: {"seconds", "count"}}, "counters": {name: value}}
+        """
+        with self._lock:
+            return {
+                "stages": {name: {"seconds": round(self.stage_seconds[name], 6), "count": self.stage_counts[name]}
+                           for name in self.stage_seconds},
+                "counters": dict(self.counters),
+            }
+
+    def format_summary(self):
+        """Returns a one line summary for status bars and logs.
+
+        Returns:
+            string: e.g. "open 0.01s, parse 0.20s, append 1.32s, serialize 0.80s, fsync 0.05s | 120 pages"
+        """
+        summary = self.get_summary()
+        stages = ", ".join("{0} {1:.2f}s".format(name, stage["seconds"])
+                           for name, stage in summary["stages"].items() if stage["count"])
+        counters = ", ".join("{0} {1}".format(value, name) for name, value in summary["counters"].items())
+        return " | ".join(part for part in (stages, counters) if part)
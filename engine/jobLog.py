@@ -0,0 +1,139 @@
+import os
+import json
+import hashlib
+
+
+class JobLog():
+    """Append-only log of completed output documents for a generation job.
+
+    The log lives next to the outputs and records every document once its
+    file has been atomically renamed into place. Each record is flushed and
+    fsynced, so after a crash the log never claims a document that is not
+    fully on disk. A torn trailing line is ignored on load and cut off
+    before a resumed run appends to the log.
+    """
+    LOG_NAME = ".pyPdfPageManager.joblog"
+
+    def __init__(self, output_dir, pdf_dict, log_path=None):
+        """Initialize the job log for a PDF Setup dict.
+
+        Args:
+            output_dir (string): Output directory of the job.
+            pdf_dict (dict): PDF Setup dict being generated.
+            log_path (string, optional): Path of the log. Defaults to None,
+                using LOG_NAME in the output directory.
+        """
+        self.log_path = log_path or os.path.join(output_dir, self.LOG_NAME)
+        self.setup_hash = self.get_setup_hash(pdf_dict)
+        self.completed = {}
+        self._valid_size = 0
+        self._log_file = None
+
+    @staticmethod
+    def get_setup_hash(pdf_dict):
+        """Returns a stable hash of the PDF Setup dict.
+
+        Args:
+            pdf_dict (dict): PDF Setup dict.
+
+        Returns:
+            string: Hex digest identifying the setup.
+        """
+        data = json.dumps(pdf_dict, sort_keys=True, default=str)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def load(self):
+        """Reads completed documents from an existing log of the same setup.
+
+        Returns:
+            bool: True if a log for this setup was found.
+        """
+        self.completed = {}
+        self._valid_size = 0
+        if not os.path.isfile(self.log_path):
+            return False
+
+        with open(self.log_path, "rb") as f:
+            lines = f.read().splitlines(keepends=True)
+
+        records = []
+        for line in lines:
+            try:
+                # A line without its newline was cut short even if it parses
+                if not line.endswith(b"\n"):
+                    raise ValueError("Unterminated record")
+                records.append(json.loads(line))
+            except ValueError:
+                # Torn write from a crash, everything before it is valid.
+                break
+            self._valid_size += len(line)
+
+        if not records or records[0].get("setup") != self.setup_hash:
+            return False
+
+        for record in records[1:]:
+            self.completed[record["document"]] = record
+        return True
+
+    def is_complete(self, doc_key):
+        """Checks if a document was completed and its output is still intact.
+
+        Args:
+            doc_key (string): Output document name.
+
+        Returns:
+            bool: True if the document can be skipped on resume.
+        """
+        record = self.completed.get(doc_key)
+        if not record:
+            return False
+        out_path = record["path"]
+        return os.path.isfile(out_path) and os.path.getsize(out_path) == record["size"]
+
+    def start(self, resume=False):
+        """Opens the log for appending, starting a new log unless resuming.
+
+        Args:
+            resume (bool, optional): Keep the records of a previous run.
+                Defaults to False.
+        """
+        if not (resume and self.load()):
+            self.completed = {}
+            self._log_file = open(self.log_path, "w")
+            self._append({"setup": self.setup_hash})
+        else:
+            self._log_file = open(self.log_path, "a")
+            # Drop a torn trailing line, new records would be appended to it
+            self._log_file.truncate(self._valid_size)
+
+    def mark_complete(self, doc_key, out_path):
+        """Records a document as completed.
+
+        Args:
+            doc_key (string): Output document name.
+            out_path (string): Path of the completed output file.
+        """
+        record = {
+            "document": doc_key,
+            "path": out_path,
+            "size": os.path.getsize(out_path)
+        }
+        self.completed[doc_key] = record
+        self._append(record)
+
+    def finish(self):
+        """Closes and removes the log once every document is completed."""
+        self.close()
+        if os.path.isfile(self.log_path):
+            os.remove(self.log_path)
+
+    def close(self):
+        """Closes the log file, keeping it on disk for a later resume."""
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+
+    def _append(self, record):
+        self._log_file.write(json.dumps(record) + "\n")
+        self._log_file.flush()
+        os.fsync(self._log_file.fileno())
@@ -0,0 +1,283 @@
+import os
+import time
+import queue
+import uuid
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+from engine.pdfEngine import PdfEngine
+
+
+class Job():
+    """A generation job for one PDF Setup dict, with its status events.
+
+    Status goes from "queued" to "running" to "done" or "failed". Every
+    change is recorded as an event, so observers can follow a job by
+    waiting for events past the last one they saw.
+    """
+    def __init__(self, pdf_dict, resume=False, job_id=None, source=None):
+        """Initialize a queued job.
+
+        Args:
+            pdf_dict (dict): PDF Setup dict to generate.
+            resume (bool, optional): Resume an interrupted job. Defaults to False.
+            job_id (string, optional): Job id. Defaults to None, generating one.
+            source (object, optional): What submitted the job, e.g. a watch rule. Defaults to None.
+        """
+        self.job_id = job_id or uuid.uuid4().hex
+        self.pdf_dict = pdf_dict
+        self.resume = resume
+        self.source = source
+        self.status = None
+        self.out_paths = []
+        self.error = None
+        self.submitted_time = time.time()
+        self.started_time = None
+        self.finished_time = None
+        self.events = []
+        self._condition = threading.Condition()
+        self.set_status("queued")
+
+    def set_status(self, status, **fields):
+        """Changes the job status and records an event.
+
+        Args:
+            status (string): New status.
+            **fields: Extra event fields.
+        """
+        with self._condition:
+            self.status = status
+            event = {"job_id": self.job_id, "status": status, "time": time.time()}
+            event.update(fields)
+            self.events.append(event)
+            self._condition.notify_all()
+
+    def is_finished(self):
+        """Checks if the job is done or failed.
+
+        Returns:
+            bool: True if the job will not change anymore.
+        """
+        return self.status in ("done", "failed")
+
+    def wait_events(self, start=0, timeout=None):
+        """Waits for events past a position.
+
+        Args:
+            start (int, optional): Number of events already seen. Defaults to 0.
+            timeout (float, optional): Seconds to wait. Defaults to None, waiting until there are new events.
+
+        Returns:
+            list: New events, empty on timeout.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.events) > start, timeout)
+            return list(self.events[start:])
+
+    def wait(self, timeout=None):
+        """Waits until the job is finished.
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None.
+
+        Returns:
+            bool: True if the job is finished.
+        """
+        with self._condition:
+            return self._condition.wait_for(self.is_finished, timeout)
+
+    def to_dict(self):
+        """Returns the job status as a JSON serializable dict.
+
+        Returns:
+            dict: Job id, status, output paths and error.
+        """
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "out_paths": list(self.out_paths),
+            "error": self.error,
+            "submitted_time": self.submitted_time,
+            "started_time": self.started_time,
+            "finished_time": self.finished_time,
+        }
+
+
+class JobQueue():
+    """Bounded queue of generation jobs run by a fixed pool of worker threads.
+
+    submit raises queue.Full when max_pending jobs are waiting, so
+    producers feel backpressure instead of growing the queue without limit.
+    Jobs writing to the same output dir run one at a time, as they share
+    its job log.
+    """
+    def __init__(self, max_workers=2, max_pending=16, pdf_engine=None, keep_finished=1000):
+        """Initialize the queue and start its workers.
+
+        Args:
+            max_workers (int, optional): Number of worker threads. Defaults to 2.
+            max_pending (int, optional): Maximum number of waiting jobs. Defaults to 16.
+            pdf_engine (PdfEngine, optional): Engine generating the documents. Defaults to None.
+            keep_finished (int, optional): Number of finished jobs kept for status queries. Defaults to 1000.
+        """
+        self.pdf_engine = pdf_engine or PdfEngine()
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self._finished_ids = []
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._output_dir_locks = defaultdict(threading.Lock)
+        self._listeners = []
+        self._started_time = time.time()
+        self._running = 0
+        self._counts = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0, "documents": 0}
+        self._busy_seconds = 0.0
+        self._workers = []
+        for worker_index in range(max_workers):
+            worker = threading.Thread(
+                target=self._work, name="JobQueueWorker-{0}".format(worker_index), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def add_listener(self, listener):
+        """Registers a callable called with each finished job, from a worker thread.
+
+        Args:
+            listener (callable): Called with the finished Job.
+        """
+        self._listeners.append(listener)
+
+    def submit(self, pdf_dict, resume=False, job_id=None, source=None):
+        """Queues a generation job.
+
+        Args:
+            pdf_dict (dict): PDF Setup dict to generate.
+            resume (bool, optional): Resume an interrupted job. Defaults to False.
+            job_id (string, optional): Job id. Defaults to None, generating one.
+            source (object, optional): What submitted the job. Defaults to None.
+
+        Raises:
+            queue.Full: If max_pending jobs are already waiting.
+
+        Returns:
+            Job: The queued job.
+        """
+        job = Job(pdf_dict, resume=resume, job_id=job_id, source=source)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self.jobs[job.job_id]
+                self._counts["rejected"] += 1
+            raise
+        with self._lock:
+            self._counts["submitted"] += 1
+        return job
+
+    def get_job(self, job_id):
+        """Returns a known job.
+
+        Args:
+            job_id (string): Job id.
+
+        Returns:
+            Job: The job, None if unknown.
+        """
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def get_metrics(self):
+        """Returns queue depth and throughput metrics.
+
+        Returns:
+            dict: Queue depth, running jobs, job and document counts,
+                throughput per minute, worker utilization since start and
+                the engine's stage timing summary.
+        """
+        with self._lock:
+            elapsed = max(time.time() - self._started_time, 1e-6)
+            metrics = dict(self._counts)
+            metrics.update({
+                "queue_depth": self._queue.qsize(),
+                "max_pending": self.max_pending,
+                "running": self._running,
+                "workers": len(self._workers),
+                "uptime_seconds": round(elapsed, 3),
+                "jobs_per_minute": round((self._counts["done"] + self._counts["failed"]) * 60.0 / elapsed, 3),
+                "documents_per_minute": round(self._counts["documents"] * 60.0 / elapsed, 3),
+                "utilization": round(self._busy_seconds / (elapsed * max(len(self._workers), 1)), 3),
+            })
+        metrics["instrumentation"] = self.pdf_engine.instrumentation.get_summary()
+        return metrics
+
+    def join(self):
+        """Waits until all queued jobs are finished."""
+        self._queue.join()
+
+    def shutdown(self, wait=True):
+        """Stops the workers once the queued jobs are finished.
+
+        Args:
+            wait (bool, optional): Wait for the workers to exit. Defaults to True.
+        """
+        for worker in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _work(self):
+        """Worker thread loop running queued jobs until a None sentinel."""
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job):
+        """Runs one job and records its result.
+
+        Args:
+            job (Job): Job to run.
+        """
+        with self._lock:
+            self._running += 1
+        with self._lock:
+            output_dir_lock = self._output_dir_locks[os.path.abspath(str(job.pdf_dict.get("output_dir", "")))]
+        with output_dir_lock:
+            job.started_time = time.time()
+            job.set_status("running")
+            try:
+                job.out_paths = self.pdf_engine.generate_docs(job.pdf_dict, resume=job.resume)
+            except Exception as e:
+                logger.exception("Job %s failed", job.job_id)
+                job.error = str(e)
+                status = "failed"
+            else:
+                status = "done"
+            job.finished_time = time.time()
+
+        with self._lock:
+            self._running -= 1
+            self._counts[status] += 1
+            self._counts["documents"] += len(job.out_paths)
+            self._busy_seconds += job.finished_time - job.started_time
+            self._finished_ids.append(job.job_id)
+            while len(self._finished_ids) > self.keep_finished:
+                self.jobs.pop(self._finished_ids.pop(0), None)
+
+        job.set_status(status, out_paths=list(job.out_paths), error=job.error)
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception:
+                logger.exception("Job listener failed for %s", job.job_id)
@@ -0,0 +1,206 @@
+import json
+import queue
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+from engine.jobQueue import JobQueue
+
+# Largest accepted setup JSON body.
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler of the job API.
+
+    Routes:
+        POST /jobs                Queue a PDF Setup JSON, ?resume=1 resumes an interrupted job
+        GET  /jobs/<id>           Job status
+        GET  /jobs/<id>/events    Job status events as newline delimited JSON, until finished
+        GET  /metrics             Job queue metrics
+    """
+    server_version = "pyPdfPageManager"
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def send_json(self, status, data, headers=None):
+        """Sends a JSON response.
+
+        Args:
+            status (int): HTTP status.
+            data (object): JSON serializable body.
+            headers (dict, optional): Extra headers. Defaults to None.
+        """
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, headers=None):
+        """Sends a JSON error response.
+
+        Args:
+            status (int): HTTP status.
+            message (string): Error message.
+            headers (dict, optional): Extra headers. Defaults to None.
+        """
+        self.send_json(status, {"error": message}, headers)
+
+    def get_route(self):
+        """Splits the request path into parts and query.
+
+        Returns:
+            tuple: (list of path parts, query dict)
+        """
+        url = urlsplit(self.path)
+        return [part for part in url.path.split("/") if part], parse_qs(url.query)
+
+    def do_GET(self):
+        parts, query = self.get_route()
+        job_queue = self.server.job_queue
+        if parts == ["metrics"]:
+            self.send_json(200, job_queue.get_metrics())
+            return
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = job_queue.get_job(parts[1])
+            if job is None:
+                self.send_error_json(404, "Unknown job {0}".format(parts[1]))
+            elif len(parts) == 2:
+                self.send_json(200, job.to_dict())
+            elif parts[2] == "events":
+                self.stream_events(job)
+            else:
+                self.send_error_json(404, "Not found")
+            return
+        self.send_error_json(404, "Not found")
+
+    def do_POST(self):
+        parts, query = self.get_route()
+        if parts != ["jobs"]:
+            self.send_error_json(404, "Not found")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self.send_error_json(411, "Content-Length required")
+            return
+        if length > MAX_BODY_BYTES:
+            self.send_error_json(413, "Setup larger than {0} bytes".format(MAX_BODY_BYTES))
+            return
+
+        try:
+            pdf_dict = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self.send_error_json(400, "Invalid JSON: {0}".format(e))
+            return
+        error = self.server.validate_setup(pdf_dict)
+        if error:
+            self.send_error_json(400, error)
+            return
+
+        resume = query.get("resume", ["0"])[0].lower() in ("1", "true", "yes")
+        try:
+            job = self.server.job_queue.submit(pdf_dict, resume=resume)
+        except queue.Full:
+            self.send_error_json(503, "Job queue is full", {"Retry-After": str(self.server.retry_after)})
+            return
+        self.send_json(202, job.to_dict(), {"Location": "/jobs/{0}".format(job.job_id)})
+
+    def stream_events(self, job):
+        """Streams the events of a job as newline delimited JSON until it is finished.
+
+        Args:
+            job (Job): Job to follow.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+
+        seen = 0
+        while True:
+            events = job.wait_events(seen, timeout=self.server.heartbeat_seconds)
+            lines = events or [{"job_id": job.job_id, "status": job.status, "heartbeat": True}]
+            try:
+                self.wfile.write("".join(json.dumps(event) + "\n" for event in lines).encode("utf-8"))
+                self.wfile.flush()
+            except OSError:
+                # Client went away
+                return
+            seen += len(events)
+            if events and events[-1]["status"] in ("done", "failed"):
+                return
+
+
+class JobServer(ThreadingHTTPServer):
+    """Local HTTP server queueing PDF Setup JSON jobs on a bounded JobQueue.
+
+    Binds to localhost by default, there is no authentication.
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=8765, job_queue=None, retry_after=5, heartbeat_seconds=15.0):
+        """Initialize and bind the server.
+
+        Args:
+            host (string, optional): Address to bind. Defaults to "127.0.0.1".
+            port (int, optional): Port to bind, 0 picks a free one. Defaults to 8765.
+            job_queue (JobQueue, optional): Queue running the jobs. Defaults to None, creating one.
+            retry_after (int, optional): Seconds clients are asked to wait when the queue is full. Defaults to 5.
+            heartbeat_seconds (float, optional): Seconds between heartbeat lines of idle event streams.
+                Defaults to 15.
+        """
+        super().__init__((host, port), JobRequestHandler)
+        self.job_queue = job_queue or JobQueue()
+        self.retry_after = retry_after
+        self.heartbeat_seconds = heartbeat_seconds
+
+    @property
+    def url(self):
+        """Base URL of the server."""
+        host, port = self.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def validate_setup(self, pdf_dict):
+        """Checks the shape of a submitted PDF Setup dict.
+
+        Args:
+            pdf_dict (object): Decoded request body.
+
+        Returns:
+            string: Error message, None if the setup is valid.
+        """
+        if not isinstance(pdf_dict, dict):
+            return "Setup must be a JSON object"
+        if not isinstance(pdf_dict.get("output_dir"), str) or not pdf_dict["output_dir"]:
+            return "Setup needs an output_dir"
+        for doc_key, doc_val in pdf_dict.items():
+            if doc_key != "output_dir" and not isinstance(doc_val, dict):
+                return "Document {0!r} must be a JSON object of pages".format(doc_key)
+        return None
+
+    def start(self):
+        """Serves requests in a background thread.
+
+        Returns:
+            threading.Thread: The serving thread.
+        """
+        thread = threading.Thread(target=self.serve_forever, name="JobServer", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """Stops serving and shuts the job queue down once queued jobs are finished."""
+        self.shutdown()
+        self.server_close()
+        self.job_queue.shutdown()
@@ -0,0 +1,303 @@
+import logging
+
+from pypdf.generic import (ArrayObject, DictionaryObject, Fit, IndirectObject, NameObject,
+                           TextStringObject)
+
+logger = logging.getLogger(__name__)
+
+# Annotation keys holding the destination of internal links, replaced when links are copied.
+LINK_DESTINATION_KEYS = ("/Dest", "/A", "/P")
+
+
+class SourceNavigation():
+    """Outline, named destinations and page numbers of a source, read once.
+
+    Destinations are resolved to source page indices when the source is
+    read and indexed by page, so an output only looks up the outline items
+    and names of its own pages, however many outputs take pages of the
+    source. Sources without outline and named destinations, the common
+    case, cost a catalog lookup; their page numbers are only mapped when a
+    link has to be resolved.
+
+    Attributes:
+        page_numbers (dict): {page object number: page index}, None until needed.
+        outline (list): Outline items as dicts with "id", "parent" (id or None), "title",
+            "page" (index or None), "fit" (destination type and arguments), "color",
+            "bold", "italic", "open" and "children" keys.
+        outline_items (list): Every outline item, by id.
+        outline_by_page (dict): {page index: [outline item ids]}.
+        named_destinations (dict): {name: (page index, fit)}.
+        names_by_page (dict): {page index: [names]}.
+    """
+    def __init__(self, reader):
+        """Reads the navigation of a source.
+
+        Args:
+            reader (pypdf.PdfReader): Reader of the source.
+        """
+        self.page_numbers = None
+        self.outline = []
+        self.outline_items = []
+        self.outline_by_page = {}
+        self.named_destinations = {}
+        self.names_by_page = {}
+
+        root = reader.root_object
+        names = root.get("/Names")
+        names = names.get_object() if names is not None else None
+        has_outline = "/Outlines" in root
+        has_names = "/Dests" in root or (isinstance(names, DictionaryObject) and "/Dests" in names)
+        if not has_outline and not has_names:
+            return
+
+        self.load_page_numbers(reader)
+        if has_outline:
+            try:
+                self.outline = self.read_outline(reader.outline)
+            except Exception as exception:
+                logger.warning("Ignoring unreadable outline: %s", exception)
+                self.outline, self.outline_items, self.outline_by_page = [], [], {}
+        destinations = {}
+        if has_names:
+            try:
+                destinations = reader.named_destinations
+            except Exception as exception:
+                logger.warning("Ignoring unreadable named destinations: %s", exception)
+        for name, destination in destinations.items():
+            page = self.get_page_index(destination.page)
+            if page is not None:
+                name = self.get_name(name)
+                self.named_destinations[name] = (page, list(destination.dest_array[1:]))
+                self.names_by_page.setdefault(page, []).append(name)
+
+    def get_name(self, name):
+        """Returns a destination name as a string, names from /Dests without their slash."""
+        return str(name)[1:] if isinstance(name, NameObject) else str(name)
+
+    def load_page_numbers(self, reader):
+        """Maps the page object numbers of the source to page indices, once.
+
+        Args:
+            reader (pypdf.PdfReader): Reader of the source.
+        """
+        if self.page_numbers is None:
+            self.page_numbers = {page.indirect_reference.idnum: index for index, page in enumerate(reader.pages)
+                                 if page.indirect_reference is not None}
+
+    def get_page_index(self, page):
+        """Returns the source page index of a destination page reference, None if not a page of the source.
+
+        The page numbers must be loaded.
+        """
+        if isinstance(page, int):
+            return page if 0 <= page < len(self.page_numbers) else None
+        idnum = getattr(page, "idnum", None)
+        if idnum is None:
+            idnum = getattr(getattr(page, "indirect_reference", None), "idnum", None)
+        return self.page_numbers.get(idnum)
+
+    def read_outline(self, items, parent=None):
+        """Converts a pypdf outline, where children lists follow their parent item, and indexes it.
+
+        Args:
+            items (list): Outline as returned by PdfReader.outline.
+            parent (int, optional): Id of the parent item. Defaults to None, the top level.
+
+        Returns:
+            list: Outline items, see the outline attribute.
+        """
+        outline = []
+        for item in items:
+            if isinstance(item, list):
+                if outline:
+                    outline[-1]["children"] = self.read_outline(item, outline[-1]["id"])
+                continue
+            font_format = int(item.font_format or 0)
+            page = self.get_page_index(item.page)
+            if page is not None:
+                self.outline_by_page.setdefault(page, []).append(len(self.outline_items))
+            outline.append({
+                "id": len(self.outline_items),
+                "parent": parent,
+                "title": item.title or "",
+                "page": page,
+                "fit": list(item.dest_array[1:]) if item.typ else [NameObject("/Fit")],
+                "color": tuple(float(value) for value in item.color) if item.color else None,
+                "bold": bool(font_format & 2),
+                "italic": bool(font_format & 1),
+                "open": (item.outline_count or 0) >= 0,
+                "children": [],
+            })
+            self.outline_items.append(outline[-1])
+        return outline
+
+    def resolve(self, destination, reader):
+        """Resolves a link destination to a source page.
+
+        Args:
+            destination (pypdf.generic.PdfObject): Explicit destination array or destination name.
+            reader (pypdf.PdfReader): Reader of the source, to map its page numbers if not done yet.
+
+        Returns:
+            tuple: (page index, fit), None if the destination is not a page of the source.
+        """
+        destination = destination.get_object() if isinstance(destination, IndirectObject) else destination
+        if isinstance(destination, DictionaryObject):
+            # Destinations of the /Dests dictionary may be wrapped as {/D [...]}
+            destination = destination.get("/D")
+        if isinstance(destination, (str, NameObject)):
+            return self.named_destinations.get(self.get_name(destination))
+        if isinstance(destination, ArrayObject) and destination:
+            self.load_page_numbers(reader)
+            page = self.get_page_index(destination[0])
+            if page is not None:
+                return page, list(destination[1:])
+        return None
+
+
+class NavigationMap():
+    """Maps the navigation of sources to the pages of one output document.
+
+    Pages are added to the map in output order. Outline items, named
+    destinations and internal links pointing to a source page that is in
+    the output are retargeted to its first output page, the others are
+    dropped as they would lead nowhere.
+    """
+    def __init__(self):
+        """Initialize an empty map."""
+        self.positions = {}
+        self.sources = {}
+
+    def add_page(self, document, page_index, position):
+        """Records the output position of a source page.
+
+        Args:
+            document (string): Path of the source.
+            page_index (int): Source page index.
+            position (int): Output page index.
+        """
+        if (document, page_index) not in self.positions:
+            self.positions[(document, page_index)] = position
+            self.sources.setdefault(document, []).append(page_index)
+
+    def get_target(self, document, resolved, targets):
+        """Returns the output destination of a resolved source destination.
+
+        Args:
+            document (string): Path of the source.
+            resolved (tuple): (page index, fit) as returned by SourceNavigation.resolve, or None.
+            targets (list): Output page references by output page index.
+
+        Returns:
+            pypdf.generic.ArrayObject: Explicit destination, None if the page is not in the output.
+        """
+        if resolved is None:
+            return None
+        position = self.positions.get((document, resolved[0]))
+        if position is None:
+            return None
+        return ArrayObject([targets[position]] + resolved[1])
+
+    def copy_annotations(self, pdf_write_obj, page, source_page, document, navigation, targets):
+        """Copies the annotations of a source page to its output page, retargeting internal links.
+
+        Args:
+            pdf_write_obj (pypdf.PdfWriter): Writer owning the output page.
+            page (pypdf.PageObject): Output page, added without its annotations.
+            source_page (pypdf.PageObject): Source page.
+            document (string): Path of the source.
+            navigation (SourceNavigation): Navigation of the source.
+            targets (list): Output page references by output page index, None to drop
+                internal links, e.g. of pages placed onto imposed sheets.
+        """
+        annots = ArrayObject()
+        for annot_ref in source_page.get("/Annots", None) or []:
+            annot = annot_ref.get_object()
+            if not isinstance(annot, DictionaryObject):
+                continue
+            destination = self.get_link_destination(annot)
+            if destination is None:
+                clone = annot_ref.clone(pdf_write_obj)
+                annots.append(clone if isinstance(clone, IndirectObject) else pdf_write_obj._add_object(clone))
+                continue
+
+            target = None
+            if targets is not None:
+                target = self.get_target(document, navigation.resolve(destination, source_page.pdf), targets)
+            if target is None:
+                continue
+            link = DictionaryObject({key: value for key, value in annot.items()
+                                     if key not in LINK_DESTINATION_KEYS}).clone(pdf_write_obj)
+            link[NameObject("/Dest")] = target
+            link[NameObject("/P")] = page.indirect_reference
+            annots.append(pdf_write_obj._add_object(link))
+        if annots:
+            page[NameObject("/Annots")] = annots
+
+    def get_link_destination(self, annot):
+        """Returns the destination of an internal link annotation, None for other annotations."""
+        if annot.get("/Subtype") != "/Link":
+            return None
+        if "/Dest" in annot:
+            return annot["/Dest"]
+        action = annot.get("/A")
+        if isinstance(action, DictionaryObject) and action.get("/S") == "/GoTo" and "/Next" not in action:
+            return action.get("/D")
+        return None
+
+    def write(self, pdf_write_obj, navigations, targets):
+        """Writes the outlines and named destinations of the sources to the output.
+
+        Outlines are added in order of the first output page of each source.
+        An item whose page is not in the output is kept without destination
+        if some of its children are. Named destinations keep the name the
+        first source gives them.
+
+        Args:
+            pdf_write_obj (pypdf.PdfWriter): Output writer.
+            navigations (dict): {document: SourceNavigation} of the sources.
+            targets (list): Output page references by output page index.
+        """
+        names = {}
+        for document, pages in self.sources.items():
+            navigation = navigations[document]
+            kept = set()
+            for page in pages:
+                for item_id in navigation.outline_by_page.get(page, ()):
+                    while item_id is not None and item_id not in kept:
+                        kept.add(item_id)
+                        item_id = navigation.outline_items[item_id]["parent"]
+                for name in navigation.names_by_page.get(page, ()):
+                    if name not in names:
+                        names[name] = self.get_target(document, navigation.named_destinations[name], targets)
+            if kept:
+                self.write_outline(pdf_write_obj, navigation.outline, kept, document, targets, None)
+
+        if names:
+            # Sorted once, PdfWriter.add_named_destination_array inserts each name with a linear search
+            name_array = pdf_write_obj.get_named_dest_root()
+            for name in sorted(names):
+                name_array.extend([TextStringObject(name), pdf_write_obj._add_object(names[name])])
+
+    def write_outline(self, pdf_write_obj, outline, kept, document, targets, parent):
+        """Adds the outline items of a source that lead into the output, below a parent item.
+
+        Args:
+            pdf_write_obj (pypdf.PdfWriter): Output writer.
+            outline (list): Outline items of SourceNavigation.
+            kept (set): Ids of the items leading into the output and of their ancestors.
+            document (string): Path of the source.
+            targets (list): Output page references by output page index.
+            parent (pypdf.generic.IndirectObject): Parent item, None for the top level.
+        """
+        for item in outline:
+            if item["id"] not in kept:
+                continue
+            target = None
+            if item["page"] is not None:
+                target = self.get_target(document, (item["page"], item["fit"]), targets)
+            outline_ref = pdf_write_obj.add_outline_item(
+                item["title"], target[0] if target is not None else None, parent,
+                color=item["color"], bold=item["bold"], italic=item["italic"],
+                fit=Fit(item["fit"][0], tuple(item["fit"][1:])), is_open=item["open"])
+            self.write_outline(pdf_write_obj, item["children"], kept, document, targets, outline_ref)
@@ -0,0 +1,185 @@
+import io
+import zlib
+
+from pypdf.generic import ArrayObject, NameObject, NumberObject, StreamObject
+
+# Values of the "format" output option of a setup document.
+OUTPUT_FORMATS = ("classic", "object_streams", "linearized")
+
+# Objects packed into each object stream.
+OBJECTS_PER_STREAM = 100
+
+# Bytes of a stream compressed on trial, and the ratio it must reach to compress all of it.
+COMPRESS_SAMPLE = 65536
+COMPRESS_RATIO = 0.9
+
+
+def write_object_streams(pdf_write_obj, stream, objects_per_stream=OBJECTS_PER_STREAM):
+    """Writes a PDF packing its objects into compressed object streams, with a cross-reference stream.
+
+    Streams stay top level objects as the format requires, every other
+    object is packed into Flate compressed object streams. Streams without
+    a filter are Flate compressed as well when that makes them smaller,
+    as qpdf does for linearized output. The classic xref table of 20 bytes
+    per object is replaced by a compressed binary cross-reference stream.
+    The header is raised to PDF 1.5 if needed.
+    Encrypted writers are written the classic way, pypdf encrypts objects
+    one by one.
+
+    Args:
+        pdf_write_obj (pypdf.PdfWriter): Writer holding the output.
+        stream (file): Binary stream to write to.
+        objects_per_stream (int, optional): Objects per object stream. Defaults to OBJECTS_PER_STREAM.
+    """
+    if pdf_write_obj._encryption:
+        pdf_write_obj.write(stream)
+        return
+
+    version = max(pdf_write_obj.pdf_header[len("%PDF-"):], "1.5")
+    stream.write("%PDF-{0}\n".format(version).encode() + b"%\xE2\xE3\xCF\xD3\n")
+
+    # idnum -> (type, offset or object stream, generation or index), as in the xref stream
+    entries = {0: (0, 0, 65535)}
+    packable = []
+    for idnum, obj in enumerate(pdf_write_obj._objects, start=1):
+        if obj is None:
+            entries[idnum] = (0, 0, 0)
+        elif isinstance(obj, StreamObject):
+            entries[idnum] = (1, stream.tell(), 0)
+            write_indirect_object(stream, idnum, compress_stream(obj))
+        else:
+            packable.append((idnum, obj))
+
+    next_idnum = len(pdf_write_obj._objects) + 1
+    for start in range(0, len(packable), objects_per_stream):
+        chunk = packable[start:start + objects_per_stream]
+        body = io.BytesIO()
+        offsets = []
+        for index, (idnum, obj) in enumerate(chunk):
+            offsets.append("{0} {1}".format(idnum, body.tell()))
+            obj.write_to_stream(body)
+            body.write(b"\n")
+            entries[idnum] = (2, next_idnum, index)
+        header = " ".join(offsets).encode() + b"\n"
+
+        object_stream = StreamObject()
+        object_stream.set_data(header + body.getvalue())
+        object_stream.update({
+            NameObject("/Type"): NameObject("/ObjStm"),
+            NameObject("/N"): NumberObject(len(chunk)),
+            NameObject("/First"): NumberObject(len(header)),
+        })
+        entries[next_idnum] = (1, stream.tell(), 0)
+        write_indirect_object(stream, next_idnum, object_stream.flate_encode())
+        next_idnum += 1
+
+    xref_idnum = next_idnum
+    xref_location = stream.tell()
+    entries[xref_idnum] = (1, xref_location, 0)
+    offset_width = max(1, (xref_location.bit_length() + 7) // 8)
+    xref_data = b"".join(
+        entry_type.to_bytes(1, "big") + field.to_bytes(offset_width, "big") + index.to_bytes(2, "big")
+        for entry_type, field, index in (entries[idnum] for idnum in range(xref_idnum + 1)))
+
+    xref_stream = StreamObject()
+    xref_stream.set_data(xref_data)
+    xref_stream.update({
+        NameObject("/Type"): NameObject("/XRef"),
+        NameObject("/Size"): NumberObject(xref_idnum + 1),
+        NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(offset_width), NumberObject(2)]),
+        NameObject("/Root"): pdf_write_obj.root_object.indirect_reference,
+    })
+    if pdf_write_obj._info is not None:
+        xref_stream[NameObject("/Info")] = pdf_write_obj._info.indirect_reference
+    if pdf_write_obj._ID is not None:
+        xref_stream[NameObject("/ID")] = pdf_write_obj._ID
+    write_indirect_object(stream, xref_idnum, xref_stream.flate_encode())
+    stream.write("startxref\n{0}\n%%EOF\n".format(xref_location).encode())
+
+
+def compress_stream(obj):
+    """Returns a Flate compressed copy of a stream without filter, if it is smaller.
+
+    A sample is compressed first, so incompressible data such as noisy raw
+    images is not compressed in full for nothing.
+
+    Args:
+        obj (pypdf.generic.StreamObject): Stream.
+
+    Returns:
+        pypdf.generic.StreamObject: The compressed copy, or the stream itself.
+    """
+    if "/Filter" in obj:
+        return obj
+    data = obj.get_data()
+    if len(data) > COMPRESS_SAMPLE:
+        sample = data[:COMPRESS_SAMPLE]
+        if len(zlib.compress(sample)) > len(sample) * COMPRESS_RATIO:
+            return obj
+    compressed = obj.flate_encode()
+    return compressed if len(compressed._data) < len(obj._data) else obj
+
+
+def write_indirect_object(stream, idnum, obj):
+    """Writes an indirect object definition.
+
+    Args:
+        stream (file): Binary stream to write to.
+        idnum (int): Object number.
+        obj (pypdf.generic.PdfObject): Object.
+    """
+    stream.write("{0} 0 obj\n".format(idnum).encode())
+    obj.write_to_stream(stream)
+    stream.write(b"\nendobj\n")
+
+
+def linearize(source, stream, object_streams=True):
+    """Rewrites a PDF linearized for fast web view.
+
+    A linearized file starts with the objects of its first page and hint
+    tables, so a viewer fetching it over HTTP range requests shows the
+    first page before the rest is downloaded. Uses qpdf through pikepdf,
+    an optional dependency.
+
+    Args:
+        source (file): Binary stream of the PDF to linearize.
+        stream (file): Binary stream to write to.
+        object_streams (bool, optional): Also pack objects into object streams. Defaults to True.
+
+    Raises:
+        ImportError: If pikepdf is not installed.
+    """
+    try:
+        import pikepdf
+    except ImportError:
+        raise ImportError("The linearized output format needs pikepdf, install it with: pip install pikepdf")
+
+    mode = pikepdf.ObjectStreamMode.generate if object_streams else pikepdf.ObjectStreamMode.disable
+    with pikepdf.open(source) as pdf:
+        pdf.save(stream, linearize=True, object_stream_mode=mode)
+
+
+def write_pdf(pdf_write_obj, stream, output_format="classic"):
+    """Writes a PDF in an output format.
+
+    Args:
+        pdf_write_obj (pypdf.PdfWriter): Writer holding the output.
+        stream (file): Binary stream to write to.
+        output_format (string, optional): One of OUTPUT_FORMATS. Defaults to "classic".
+
+    Raises:
+        ValueError: If the output format is unknown.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Unknown output format {0!r}, expected one of {1}".format(output_format, OUTPUT_FORMATS))
+
+    if output_format == "classic":
+        pdf_write_obj.write(stream)
+    elif output_format == "object_streams":
+        write_object_streams(pdf_write_obj, stream)
+    else:
+        # qpdf packs the object streams itself, writing the classic way is cheaper
+        source = io.BytesIO()
+        pdf_write_obj.write(source)
+        source.seek(0)
+        linearize(source, stream)
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+from engine.cache import get_cache_dir, get_file_fingerprint
+
+
+class PageCache():
+    """Local SQLite cache of computed per-page values.
+
+    Values are keyed by the fingerprint of the source file, the page number
+    and the kind of value, so results survive restarts and are recomputed
+    only when a source file changes.
+    """
+    def __init__(self, db_path=None):
+        """Initialize and open the page cache.
+
+        Args:
+            db_path (string, optional): SQLite database path. Defaults to None,
+                using page_cache.sqlite in the cache directory.
+        """
+        self.db_path = db_path or os.path.join(get_cache_dir(), "page_cache.sqlite")
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS page_values ("
+            "fingerprint TEXT, page INTEGER, kind TEXT, value TEXT, "
+            "PRIMARY KEY (fingerprint, page, kind))")
+        self.connection.commit()
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+    def get_values(self, fingerprint, kind):
+        """Returns all cached values of a kind for a source file.
+
+        Args:
+            fingerprint (string): Fingerprint of the source file.
+            kind (string): Kind of value, e.g. "phash".
+
+        Returns:
+            dict: Cached values keyed by page number.
+        """
+        rows = self.connection.execute(
+            "SELECT page, value FROM page_values WHERE fingerprint = ? AND kind = ?",
+            (fingerprint, kind)).fetchall()
+        return dict(rows)
+
+    def set_values(self, fingerprint, kind, values):
+        """Stores values of a kind for pages of a source file.
+
+        Args:
+            fingerprint (string): Fingerprint of the source file.
+            kind (string): Kind of value, e.g. "phash".
+            values (dict): Values keyed by page number.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO page_values (fingerprint, page, kind, value) VALUES (?, ?, ?, ?)",
+                [(fingerprint, page, kind, value) for page, value in values.items()])
+
+    def get_document_values(self, documents, kind, worker, encode=str, max_workers=None, progress_callback=None,
+                            passwords=None):
+        """Returns the values of a kind for every page of the documents.
+
+        Sources without cached values are computed with the worker in a
+        process pool and stored.
+
+        Args:
+            documents (list): List of PDF files.
+            kind (string): Kind of value, e.g. "phash".
+            worker (callable): Top-level function returning a list of values per page for a PDF file
+                and its password.
+            encode (callable, optional): Converts a worker value to its cached string. Defaults to str.
+            max_workers (int, optional): Number of worker processes. Defaults to None, one per CPU.
+            progress_callback (callable, optional): Called with (done, total) after each computed source.
+            passwords (dict, optional): Passwords of encrypted sources, keyed by document. Defaults to None.
+
+        Returns:
+            dict: List of cached value strings in page order, keyed by document.
+        """
+        document_values = {}
+        stale = {}
+        for document in documents:
+            fingerprint = get_file_fingerprint(document)
+            cached = self.get_values(fingerprint, kind)
+            if cached:
+                document_values[document] = [value for page, value in sorted(cached.items())]
+            else:
+                stale[document] = fingerprint
+        if not stale:
+            return document_values
+
+        # Spawn workers, forking a process running Qt threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        passwords = passwords or {}
+        done = 0
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            futures = {pool.submit(worker, document, passwords.get(document)): document for document in stale}
+            for future in as_completed(futures):
+                document = futures[future]
+                try:
+                    values = [encode(value) for value in future.result()]
+                except Exception:
+                    logger.exception("Computing %s failed for %s", kind, document)
+                    values = []
+                document_values[document] = values
+                self.set_values(stale[document], kind, {
+                    page_index + 1: value for page_index, value in enumerate(values)})
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(stale))
+        return document_values
@@ -0,0 +1,203 @@
+import shlex
+from collections import defaultdict
+
+
+class PageIndex():
+    """In-memory index of output pages for search and filtering.
+
+    Every page gets an integer id and is indexed by its output document,
+    source document and source page number. Output documents are indexed
+    by an opaque key with a separate display name, so renaming a document
+    or moving a page only touches that entry instead of rebuilding.
+
+    Queries are whitespace separated terms, all of which must match:
+        source:<text>    Source document path contains text.
+        doc:<text>       Output document name contains text.
+        page:<n>         Source page number n.
+        page:<a>-<b>     Source page number between a and b.
+        <text>           Output document name or source path contains text.
+    """
+    def __init__(self):
+        """Initialize an empty page index."""
+        self.clear()
+
+    def clear(self):
+        """Removes all pages and documents from the index."""
+        self._next_id = 1
+        self._pages = {}
+        self._doc_pages = defaultdict(set)
+        self._doc_names = {}
+        self._source_pages = defaultdict(set)
+
+    def add_page(self, doc_key, source_document, source_page):
+        """Adds a page to the index.
+
+        Args:
+            doc_key (hashable): Key of the output document.
+            source_document (string): Path of the source document.
+            source_page (int|string): Source page number.
+
+        Returns:
+            int: Id of the new page.
+        """
+        page_id = self._next_id
+        self._next_id += 1
+        self._pages[page_id] = [doc_key, source_document, int(source_page)]
+        self._doc_pages[doc_key].add(page_id)
+        self._source_pages[source_document].add(page_id)
+        return page_id
+
+    def remove_page(self, page_id):
+        """Removes a page from the index.
+
+        Args:
+            page_id (int): Id of the page.
+        """
+        doc_key, source_document, source_page = self._pages.pop(page_id)
+        self._doc_pages[doc_key].discard(page_id)
+        self._source_pages[source_document].discard(page_id)
+
+    def move_page(self, page_id, doc_key):
+        """Moves a page to another output document.
+
+        Args:
+            page_id (int): Id of the page.
+            doc_key (hashable): Key of the new output document.
+        """
+        page = self._pages[page_id]
+        self._doc_pages[page[0]].discard(page_id)
+        page[0] = doc_key
+        self._doc_pages[doc_key].add(page_id)
+
+    def set_doc_name(self, doc_key, name):
+        """Sets the display name of an output document.
+
+        Args:
+            doc_key (hashable): Key of the output document.
+            name (string): Name matched by doc: terms.
+        """
+        self._doc_names[doc_key] = name
+
+    def remove_doc(self, doc_key):
+        """Removes an output document, which must have no pages left.
+
+        Args:
+            doc_key (hashable): Key of the output document.
+        """
+        self._doc_pages.pop(doc_key, None)
+        self._doc_names.pop(doc_key, None)
+
+    def get_doc_pages(self, doc_key):
+        """Returns the page ids of an output document.
+
+        Args:
+            doc_key (hashable): Key of the output document.
+
+        Returns:
+            set: Page ids.
+        """
+        return self._doc_pages.get(doc_key, set())
+
+    def get_page_doc(self, page_id):
+        """Returns the output document key of a page.
+
+        Args:
+            page_id (int): Id of the page.
+
+        Returns:
+            hashable: Output document key.
+        """
+        return self._pages[page_id][0]
+
+    def find_pages(self, source_document, source_page):
+        """Returns the ids of all output pages showing a source page.
+
+        Args:
+            source_document (string): Path of the source document.
+            source_page (int|string): Source page number.
+
+        Returns:
+            set: Page ids.
+        """
+        source_page = int(source_page)
+        return {
+            page_id for page_id in self._source_pages.get(source_document, ())
+            if self._pages[page_id][2] == source_page
+        }
+
+    def get_source_docs(self, source_document):
+        """Returns the keys of output documents holding pages of a source.
+
+        Args:
+            source_document (string): Path of the source document.
+
+        Returns:
+            set: Output document keys.
+        """
+        return {self._pages[page_id][0] for page_id in self._source_pages.get(source_document, ())}
+
+    def parse_query(self, query):
+        """Parses a query into its terms.
+
+        Args:
+            query (string): Query text.
+
+        Returns:
+            list: (field, value) tuples, field is "source", "doc", "page" or "any".
+        """
+        try:
+            tokens = shlex.split(query)
+        except ValueError:
+            tokens = query.split()
+
+        terms = []
+        for token in tokens:
+            field, separator, value = token.partition(":")
+            if separator and field.lower() in ("source", "doc", "page") and value:
+                terms.append((field.lower(), value))
+            else:
+                terms.append(("any", token))
+        return terms
+
+    def query(self, query):
+        """Returns the ids of pages matching a query.
+
+        Args:
+            query (string): Query text.
+
+        Returns:
+            set: Matching page ids, or None for an empty query.
+        """
+        terms = self.parse_query(query)
+        if not terms:
+            return None
+
+        result = None
+        for field, value in terms:
+            ids = self._match_term(field, value.lower(), result)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result
+
+    def _match_term(self, field, value, candidates):
+        if field == "page":
+            start, separator, end = value.partition("-")
+            try:
+                start = int(start) if start else 1
+                end = int(end) if end else (start if not separator else float("inf"))
+            except ValueError:
+                return set()
+            pages = candidates if candidates is not None else self._pages
+            return {page_id for page_id in pages if start <= self._pages[page_id][2] <= end}
+
+        ids = set()
+        if field in ("source", "any"):
+            for source_document, page_ids in self._source_pages.items():
+                if value in source_document.lower():
+                    ids |= page_ids
+        if field in ("doc", "any"):
+            for doc_key, name in self._doc_names.items():
+                if value in name.lower():
+                    ids |= self._doc_pages.get(doc_key, set())
+        return ids
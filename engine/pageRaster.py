@@ -0,0 +1,51 @@
+import numpy as np
+
+
+def render_pages_gray(document, size=None, max_size=64, password=None):
+    """Renders every page of a PDF file as a small grayscale image.
+
+    Pages are rendered with QtPdf, which works without a running Qt
+    application, so this can be called from worker processes. Transparent
+    page backgrounds are composited onto white.
+
+    Args:
+        document (string): Path of PDF file.
+        size (int, optional): Render every page to a size x size square. Defaults to None.
+        max_size (int, optional): Longest side in pixels when keeping the page
+            aspect ratio, used if size is not given. Defaults to 64.
+        password (string, optional): Password of an encrypted source. Defaults to None.
+
+    Returns:
+        list: float32 arrays of gray values 0-255, one per page.
+    """
+    from PySide6 import QtCore, QtGui, QtPdf
+
+    pdf_document = QtPdf.QPdfDocument()
+    if password is not None:
+        pdf_document.setPassword(password)
+    error = pdf_document.load(document)
+    if error != QtPdf.QPdfDocument.Error.None_:
+        raise IOError("Could not render {0}: {1}".format(document, error))
+
+    images = []
+    try:
+        for page_index in range(pdf_document.pageCount()):
+            if size:
+                image_size = QtCore.QSize(size, size)
+            else:
+                point_size = pdf_document.pagePointSize(page_index)
+                scale = max_size / max(point_size.width(), point_size.height(), 1.0)
+                image_size = QtCore.QSize(
+                    max(1, round(point_size.width() * scale)), max(1, round(point_size.height() * scale)))
+
+            image = pdf_document.render(page_index, image_size).convertToFormat(
+                QtGui.QImage.Format_ARGB32_Premultiplied)
+            pixels = np.frombuffer(image.constBits(), np.uint8).reshape(
+                image.height(), image.bytesPerLine() // 4, 4)[:, :image.width()]
+
+            # Premultiplied BGRA over white: color + (255 - alpha)
+            bgr = pixels[..., :3].astype(np.float32) + (255 - pixels[..., 3:4].astype(np.float32))
+            images.append(bgr @ np.array([0.114, 0.587, 0.299], dtype=np.float32))
+    finally:
+        pdf_document.close()
+    return images
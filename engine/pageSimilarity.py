@@ -0,0 +1,252 @@
+import os
+
+import numpy as np
+
+from engine.pageCache import PageCache
+
+# Side of the thumbnail the DCT is computed on, and of its kept low frequencies.
+HASH_IMAGE_SIZE = 32
+HASH_DCT_SIZE = 8
+
+# Thumbnails with a lower gray standard deviation are treated as flat (blank) pages.
+FLAT_PAGE_DEVIATION = 2.0
+
+# Largest share of the non-flat pages a group of separator sheets may take.
+MAX_SEPARATOR_SHARE = 0.5
+
+
+def get_dct_matrix(size):
+    """Returns the orthonormal DCT-II matrix of a size.
+
+    Args:
+        size (int): Matrix size.
+
+    Returns:
+        numpy.ndarray: size x size DCT matrix.
+    """
+    frequencies = np.arange(size)[:, None]
+    samples = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * samples + 1) * frequencies / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+def compute_phashes(images):
+    """Computes 64-bit perceptual hashes of square grayscale images.
+
+    The DCT of all images is computed at once as a batched matrix product.
+    Each bit tells whether a low frequency coefficient is above the median.
+
+    Args:
+        images (numpy.ndarray): (count, 32, 32) array of gray values.
+
+    Returns:
+        numpy.ndarray: uint64 hash per image.
+    """
+    dct_matrix = get_dct_matrix(images.shape[-1])
+    coefficients = dct_matrix @ images @ dct_matrix.T
+    low = coefficients[:, :HASH_DCT_SIZE, :HASH_DCT_SIZE].reshape(len(images), -1)
+    # The DC term is left out of the median, it only holds overall brightness
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = np.packbits(low > median, axis=1)
+    return bits.view(">u8").ravel().astype(np.uint64)
+
+
+def hamming_distances(hashes_a, hashes_b):
+    """Returns bitwise Hamming distances between two arrays of uint64 hashes.
+
+    Args:
+        hashes_a (numpy.ndarray): uint64 hashes.
+        hashes_b (numpy.ndarray): uint64 hashes, broadcastable against hashes_a.
+
+    Returns:
+        numpy.ndarray: Number of differing bits.
+    """
+    xor = np.bitwise_xor(hashes_a, hashes_b)
+    as_bytes = xor.astype(">u8").view(np.uint8).reshape(xor.shape + (8,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1)
+
+
+def compute_document_hashes(document, password=None):
+    """Renders a PDF file and hashes each page.
+
+    Runs in worker processes.
+
+    Args:
+        document (string): Path of PDF file.
+        password (string, optional): Password of an encrypted source. Defaults to None.
+
+    Returns:
+        list: (hash int, is flat page) tuples, one per page.
+    """
+    from engine.pageRaster import render_pages_gray
+
+    images = render_pages_gray(document, size=HASH_IMAGE_SIZE, password=password)
+    if not images:
+        return []
+    stack = np.stack(images)
+    hashes = compute_phashes(stack)
+    flat = stack.reshape(len(images), -1).std(axis=1) < FLAT_PAGE_DEVIATION
+    return [(int(page_hash), bool(is_flat)) for page_hash, is_flat in zip(hashes, flat)]
+
+
+class PageSimilarity():
+    """Groups pages of scanned batches into proposed output documents.
+
+    Pages are hashed with a DCT perceptual hash of a small thumbnail. Hashes
+    are computed per source in a process pool and cached per page.
+    """
+    CACHE_KIND = "phash"
+
+    def __init__(self, page_cache=None):
+        """Initialize the page similarity grouping.
+
+        Args:
+            page_cache (PageCache, optional): Cache of page hashes. Defaults to None,
+                using the default page cache.
+        """
+        self.page_cache = page_cache or PageCache()
+
+    def close(self):
+        """Closes the page cache."""
+        self.page_cache.close()
+
+    def get_page_hashes(self, documents, max_workers=None, progress_callback=None, passwords=None):
+        """Returns the hash of every page of the documents, in document order.
+
+        Args:
+            documents (list): List of PDF files.
+            max_workers (int, optional): Number of worker processes. Defaults to None, one per CPU.
+            progress_callback (callable, optional): Called with (done, total) after each source.
+            passwords (dict, optional): Passwords of encrypted sources, keyed by document. Defaults to None.
+
+        Returns:
+            list: (document, page number, hash int, is flat page) tuples.
+        """
+        document_values = self.page_cache.get_document_values(
+            documents, self.CACHE_KIND, compute_document_hashes,
+            encode=lambda value: "{0:016x}:{1}".format(value[0], int(value[1])),
+            max_workers=max_workers, progress_callback=progress_callback, passwords=passwords)
+
+        pages = []
+        for document in documents:
+            for page_index, value in enumerate(document_values.get(document, [])):
+                page_hash, is_flat = value.split(":")
+                pages.append((document, page_index + 1, int(page_hash, 16), is_flat == "1"))
+        return pages
+
+    def find_separators(self, hashes, flat, separator_threshold):
+        """Finds separator sheets, the largest group of recurring near-identical pages.
+
+        Flat pages are never separators. A group must be sparse: at most
+        MAX_SEPARATOR_SHARE of the non-flat pages, with a non-flat page between
+        any two of its pages, so every document it delimits has content. This
+        rules out runs of similar pages and similar pages alternating with
+        blank backs, e.g. text pages of a duplex scan or a repeated form.
+
+        Args:
+            hashes (numpy.ndarray): uint64 page hashes in order.
+            flat (numpy.ndarray): Flat page flags.
+            separator_threshold (int): Maximum distance between separator pages.
+
+        Returns:
+            numpy.ndarray: Separator page flags.
+        """
+        separators = np.zeros(len(hashes), dtype=bool)
+        candidates = np.flatnonzero(~flat)
+        if len(candidates) < 2:
+            return separators
+
+        # Count near-identical pages of every candidate, in blocks to bound memory
+        candidate_hashes = hashes[candidates]
+        neighbor_counts = np.zeros(len(candidates), dtype=np.int64)
+        for start in range(0, len(candidates), 1024):
+            block = candidate_hashes[start:start + 1024, None]
+            neighbor_counts[start:start + 1024] = (
+                hamming_distances(block, candidate_hashes[None, :]) <= separator_threshold).sum(axis=1)
+
+        # Try the groups from largest to smallest, each page is tried in one group only
+        tried = np.zeros(len(candidates), dtype=bool)
+        for seed in np.argsort(-neighbor_counts, kind="stable"):
+            if neighbor_counts[seed] < 2:
+                break
+            if tried[seed]:
+                continue
+            in_group = hamming_distances(candidate_hashes, candidate_hashes[seed]) <= separator_threshold
+            tried |= in_group
+            group = candidates[in_group]
+            if len(group) > MAX_SEPARATOR_SHARE * len(candidates):
+                continue
+            # Non-flat pages between two pages of the group, the group pages included
+            content_between = np.diff(np.searchsorted(candidates, group))
+            if np.all(content_between > 1):
+                separators[group] = True
+                break
+        return separators
+
+    def propose_setup(self, documents, output_folder, split_threshold=22, separator_threshold=4,
+                      max_workers=None, progress_callback=None, passwords=None):
+        """Proposes a PDF Setup dict splitting scanned batches into documents.
+
+        If the batch contains separator sheets, each separator starts a new
+        document. Otherwise a page starts a new document when it differs from
+        both the previous page and the first page of the current document.
+        Flat (blank) pages always stay with the current document.
+
+        Args:
+            documents (list): List of PDF files, in scan order.
+            output_folder (string): Path of output file.
+            split_threshold (int, optional): Minimum hash distance of a new document. Defaults to 22.
+            separator_threshold (int, optional): Maximum hash distance between separator pages. Defaults to 4.
+            max_workers (int, optional): Number of worker processes. Defaults to None.
+            progress_callback (callable, optional): Called with (done, total) after each hashed source.
+            passwords (dict, optional): Passwords of encrypted sources, keyed by document. Defaults to None.
+
+        Returns:
+            tuple: (PDF Setup dict, list of (document, page number) separator pages not in the setup).
+        """
+        pages = self.get_page_hashes(documents, max_workers, progress_callback, passwords)
+        setup_dict = {"output_dir": output_folder}
+        if not pages:
+            return setup_dict, []
+
+        hashes = np.array([page[2] for page in pages], dtype=np.uint64)
+        flat = np.array([page[3] for page in pages], dtype=bool)
+        separators = self.find_separators(hashes, flat, separator_threshold)
+        use_separators = bool(separators.any())
+
+        groups = []
+        group = []
+        group_first = None
+        previous = None
+        separator_pages = []
+        for page_index, (document, page_number, page_hash, is_flat) in enumerate(pages):
+            if separators[page_index]:
+                separator_pages.append((document, page_number))
+                if group:
+                    groups.append(group)
+                group, group_first, previous = [], None, None
+                continue
+
+            if not is_flat and not use_separators and group_first is not None:
+                distances = hamming_distances(
+                    hashes[page_index], np.array([hashes[previous], hashes[group_first]], dtype=np.uint64))
+                if distances.min() > split_threshold:
+                    groups.append(group)
+                    group, group_first = [], None
+
+            group.append((document, page_number))
+            if not is_flat:
+                previous = page_index
+                if group_first is None:
+                    group_first = page_index
+        if group:
+            groups.append(group)
+
+        for group_index, group in enumerate(groups):
+            doc_base = os.path.basename(group[0][0]).split(".")[0]
+            setup_dict["{0}_{1}".format(doc_base, group_index + 1)] = {
+                str(page_index + 1): {str(page_number): document}
+                for page_index, (document, page_number) in enumerate(group)
+            }
+        return setup_dict, separator_pages
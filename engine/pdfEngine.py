@@ -1,13 +1,76 @@
 import os
 import json
+import itertools
 import pypdf
 from pprint import pprint
 
+from engine.jobLog import JobLog
+from engine.navigation import NavigationMap
+from engine.credentials import CredentialCache
+from engine.outputFormat import write_pdf
+from engine.repairIndex import RepairIndex
+from engine.instrumentation import Instrumentation
+from engine.readerCache import ReaderCache, open_pdf_reader
+from engine.sizeEstimator import SizeEstimator
+
+# Optional per-page transform keys of a setup page, next to its
+# {source_page: source_path} entry.
+PAGE_TRANSFORM_KEYS = ("rotate", "crop", "scale")
+
+# Key of the optional per-document output options in a setup document.
+DOC_OPTIONS_KEY = "options"
+
+# Imposition layouts as (pages per sheet, sheet orientation swapped from page).
+IMPOSITION_LAYOUTS = {
+    "2-up": (2, True),
+    "4-up": (4, False),
+    "booklet": (2, True),
+}
+
+# Target page sizes not covered by pypdf.PaperSize, in points.
+PAGE_SIZES = {
+    "LETTER": (612, 792),
+    "LEGAL": (612, 1008),
+}
+
 class PdfEngine():
     """PDF Class object to manage and generate PDF Setup files and PDF files.
     """
-    def __init__(self):
-        pass
+    def __init__(self, use_mmap=False, instrumentation=None, credentials=None, output_format="classic",
+                 repair_index=None, staging=None):
+        """Initialize the engine.
+
+        Args:
+            use_mmap (bool, optional): Read local sources through memory mappings
+                instead of whole in-memory copies. Defaults to False.
+            instrumentation (Instrumentation, optional): Stage timers and profiling.
+                Defaults to None, creating one.
+            credentials (CredentialCache, optional): Passwords of encrypted sources.
+                Defaults to None, creating one without a password provider.
+            output_format (string, optional): Output format of documents without a "format"
+                option, one of outputFormat.OUTPUT_FORMATS. Defaults to "classic".
+            repair_index (RepairIndex, optional): Stored object indexes of damaged sources.
+                Defaults to None, using one in the cache directory.
+            staging (StagingCache, optional): Local copies of sources on slow or network
+                storage, read instead of the sources. Defaults to None, reading in place.
+        """
+        self.use_mmap = use_mmap
+        self.instrumentation = instrumentation or Instrumentation()
+        self.credentials = credentials or CredentialCache()
+        self.output_format = output_format
+        self.repair_index = repair_index or RepairIndex()
+        self.staging = staging
+
+
+    def new_reader_cache(self):
+        """Returns a reader cache using the engine's reading mode, instrumentation, credentials, repair index
+        and staging.
+
+        Returns:
+            ReaderCache: Empty reader cache.
+        """
+        return ReaderCache(use_mmap=self.use_mmap, instrumentation=self.instrumentation,
+                           credentials=self.credentials, repair_index=self.repair_index, staging=self.staging)
 
     def get_doc_basename(self, document):
         """Returns basename of document.
@@ -21,6 +84,36 @@ class PdfEngine():
         return os.path.basename(document).split(".")[0]
 
     
+    def get_pdf_reader(self, document):
+        """Returns Reader of the document, decrypted if it is encrypted.
+
+        Args:
+            document (string): Path of PDF file.
+
+        Raises:
+            FileNotDecryptedError: If the document is encrypted and no password is valid.
+
+        Returns:
+            pypdf.PdfReader: Reader of the PDF file.
+        """
+        return open_pdf_reader(document, self.use_mmap, self.instrumentation, self.credentials, self.repair_index,
+                               self.staging)
+
+
+    def get_local_path(self, document):
+        """Returns the path to read a source from, its staged copy if staging is used.
+
+        Args:
+            document (string): Path of PDF file.
+
+        Returns:
+            string: Path of the local copy, else the document path.
+        """
+        if self.staging is None:
+            return document
+        return self.staging.get(document)
+
+
     def get_pdf_pages(self, document):
         """Returns Pages of the document.
 
@@ -30,10 +123,7 @@ class PdfEngine():
         Returns:
             list: Returns list of PageObjects.
         """
-        pdf_read_obj = pypdf.PdfReader(document)
-        if pdf_read_obj.is_encrypted:
-            pdf_read_obj.decrypt("AES-256")
-        pages = pdf_read_obj.pages
+        pages = self.get_pdf_reader(document).pages
         return pages
 
 
@@ -78,6 +168,86 @@ class PdfEngine():
             json.dump(data, f, indent=4)
 
 
+    def get_page_count(self, document, reader_cache=None):
+        """Returns the number of pages of a document.
+
+        Args:
+            document (string): Path of PDF file.
+            reader_cache (ReaderCache, optional): Cache to open the reader from, so a
+                later generate_doc with the same cache does not parse the file again.
+                Defaults to None.
+
+        Returns:
+            int: Number of pages.
+        """
+        if reader_cache is not None:
+            return len(reader_cache.get(document).pages)
+        return len(self.get_pdf_pages(document))
+
+
+    def iter_dict(self, document_list, reader_cache=None):
+        """Lazily yields one setup document per input document.
+
+        Inputs are only opened when the next document is requested, so
+        outputs can be written while later inputs are still being scanned.
+
+        Args:
+            document_list (iterable): PDF files, may be a generator.
+            reader_cache (ReaderCache, optional): Cache to open inputs from. Defaults to None.
+
+        Yields:
+            tuple: (doc_name, page dict)
+        """
+        for document in document_list:
+            page_total = self.get_page_count(document, reader_cache)
+            yield self.get_doc_basename(document), {
+                str(page_num + 1): {str(page_num + 1): document} for page_num in range(page_total)}
+
+
+    def iter_merged_dict(self, document_list, reader_cache=None):
+        """Lazily yields the single merged setup document of the inputs.
+
+        The page entries are a generator, inputs are opened while the
+        merged document is being written.
+
+        Args:
+            document_list (iterable): PDF files, may be a generator.
+            reader_cache (ReaderCache, optional): Cache to open inputs from. Defaults to None.
+
+        Yields:
+            tuple: (merged doc_name, generator of (page_key, page_val) tuples)
+        """
+        documents = iter(document_list)
+        first_document = next(documents, None)
+        if first_document is None:
+            return
+
+        def iter_pages():
+            output_page_number = 1
+            for document in itertools.chain([first_document], documents):
+                for page_num in range(self.get_page_count(document, reader_cache)):
+                    yield str(output_page_number), {str(page_num + 1): document}
+                    output_page_number += 1
+
+        yield self.get_doc_basename(first_document) + "_MERGED", iter_pages()
+
+
+    def iter_split_dict(self, document_list, reader_cache=None):
+        """Lazily yields one single page setup document per input page.
+
+        Args:
+            document_list (iterable): PDF files, may be a generator.
+            reader_cache (ReaderCache, optional): Cache to open inputs from. Defaults to None.
+
+        Yields:
+            tuple: (doc_name, page dict)
+        """
+        for document in document_list:
+            for page_num in range(self.get_page_count(document, reader_cache)):
+                split_doc_name = self.get_doc_basename(document) + "_" + str(page_num + 1)
+                yield split_doc_name, {"1": {str(page_num + 1): document}}
+
+
     def generate_dict(self, document_list, output_folder):
         """Generate current PDF Setup dictionary from the document list.
 
@@ -91,13 +261,7 @@ class PdfEngine():
         def_dict = {
             "output_dir": output_folder,
         }
-
-        for document in document_list:
-            doc_name = self.get_doc_basename(document)
-            def_dict[doc_name] = {}
-            pages = self.get_pdf_pages(document)
-            for page_num in range(len(pages)):
-                def_dict[doc_name][str(page_num + 1)] = {str(page_num + 1): document}
+        def_dict.update(self.iter_dict(document_list))
         return def_dict
     
 
@@ -111,17 +275,11 @@ class PdfEngine():
         Returns:
             dict: Merged PDF Setup dictionary.
         """
-        merged_doc_name = self.get_doc_basename(document_list[0]) + "_MERGED"
         merge_dict = {
             "output_dir": output_folder,
-            merged_doc_name: {}
         }
-        output_page_number = 1
-        for document in document_list:
-            pages = self.get_pdf_pages(document)
-            for page_num in range(len(pages)):
-                merge_dict[merged_doc_name][str(output_page_number)] = {str(page_num + 1): document}
-                output_page_number += 1
+        for merged_doc_name, page_entries in self.iter_merged_dict(document_list):
+            merge_dict[merged_doc_name] = dict(page_entries)
 
         return merge_dict
     
@@ -139,15 +297,262 @@ class PdfEngine():
         split_dict = {
             "output_dir": output_folder,
         }
-        for document in document_list:
-            pages = self.get_pdf_pages(document)
-            for page_num in range(len(pages)):
-                split_doc_name = self.get_doc_basename(document) + "_" + str(page_num + 1)
-                split_dict[split_doc_name] = {"1": {str(page_num + 1): document}}
+        split_dict.update(self.iter_split_dict(document_list))
 
         return split_dict
 
 
+    def generate_ranges_dict(self, document_ranges, output_folder):
+        """Generate PDF Setup dictionary from page ranges of source documents.
+
+        Args:
+            document_ranges (list): (output doc name, source document, list of 0-based page indices) tuples.
+            output_folder (string): Path of output file.
+
+        Returns:
+            dict: PDF Setup dictionary.
+        """
+        ranges_dict = {
+            "output_dir": output_folder,
+        }
+        for doc_name, document, page_indices in document_ranges:
+            unique_name = doc_name
+            index = 1
+            while unique_name in ranges_dict:
+                index += 1
+                unique_name = "{0}_{1}".format(doc_name, index)
+
+            ranges_dict[unique_name] = {
+                str(output_page + 1): {str(page_index + 1): document}
+                for output_page, page_index in enumerate(page_indices)
+            }
+        return ranges_dict
+
+
+    def generate_page_count_split_dict(self, document_list, output_folder, page_count):
+        """Generate PDF Setup dictionary splitting each document every n pages.
+
+        Args:
+            document_list (list): List of PDF files.
+            output_folder (string): Path of output file.
+            page_count (int): Number of pages per output document.
+
+        Returns:
+            dict: Split PDF Setup dictionary.
+        """
+        document_ranges = []
+        for document in document_list:
+            page_indices = list(range(len(self.get_pdf_pages(document))))
+            for chunk_index, start in enumerate(range(0, len(page_indices), page_count)):
+                doc_name = self.get_doc_basename(document) + "_" + str(chunk_index + 1)
+                document_ranges.append((doc_name, document, page_indices[start:start + page_count]))
+
+        return self.generate_ranges_dict(document_ranges, output_folder)
+
+
+    def generate_size_split_dict(self, document_list, output_folder, max_bytes):
+        """Generate PDF Setup dictionary splitting each document under a size budget.
+
+        Output sizes are estimated from the stream lengths of the objects
+        each page needs, so no trial files are written.
+
+        Args:
+            document_list (list): List of PDF files.
+            output_folder (string): Path of output file.
+            max_bytes (int): Maximum estimated size of an output document.
+
+        Returns:
+            dict: Split PDF Setup dictionary.
+        """
+        document_ranges = []
+        for document in document_list:
+            estimator = SizeEstimator(self.get_pdf_reader(document))
+            for chunk_index, page_indices in enumerate(estimator.plan_chunks(max_bytes)):
+                doc_name = self.get_doc_basename(document) + "_" + str(chunk_index + 1)
+                document_ranges.append((doc_name, document, page_indices))
+
+        return self.generate_ranges_dict(document_ranges, output_folder)
+
+
+    def generate_bookmark_split_dict(self, document_list, output_folder):
+        """Generate PDF Setup dictionary with one document per top-level bookmark.
+
+        Pages before the first bookmark go with the first section. A
+        document without bookmarks is kept whole.
+
+        Args:
+            document_list (list): List of PDF files.
+            output_folder (string): Path of output file.
+
+        Returns:
+            dict: Split PDF Setup dictionary.
+        """
+        document_ranges = []
+        for document in document_list:
+            pdf_read_obj = self.get_pdf_reader(document)
+            page_total = len(pdf_read_obj.pages)
+            doc_base = self.get_doc_basename(document)
+
+            sections = []
+            for outline_item in pdf_read_obj.outline:
+                # Nested lists hold the children of the previous entry.
+                if isinstance(outline_item, list):
+                    continue
+                start = pdf_read_obj.get_destination_page_number(outline_item)
+                if start is None or start < 0:
+                    continue
+                if sections and start <= sections[-1][1]:
+                    continue
+                sections.append((outline_item.title, start))
+
+            if not sections:
+                document_ranges.append((doc_base, document, list(range(page_total))))
+                continue
+
+            sections[0] = (sections[0][0], 0)
+            for section_index, (title, start) in enumerate(sections):
+                end = sections[section_index + 1][1] if section_index + 1 < len(sections) else page_total
+                safe_title = "".join(
+                    char if char.isalnum() or char in " -_" else "_" for char in str(title)).strip()
+                doc_name = doc_base + "_" + (safe_title or str(section_index + 1))
+                document_ranges.append((doc_name, document, list(range(start, end))))
+
+        return self.generate_ranges_dict(document_ranges, output_folder)
+
+
+    def get_doc_pages(self, doc_val):
+        """Returns the pages of a setup document, without its options.
+
+        Args:
+            doc_val (dict): Setup document, or an iterable of (page_key, page_val)
+                tuples as yielded by the streaming builders.
+
+        Returns:
+            iterable: (page_key, page_val) tuples in setup order.
+        """
+        if not isinstance(doc_val, dict):
+            return doc_val
+        return [(key, value) for key, value in doc_val.items() if key != DOC_OPTIONS_KEY]
+
+
+    def get_doc_options(self, doc_val):
+        """Returns the output options of a setup document.
+
+        Args:
+            doc_val (dict): Setup document, or an iterable of page entries without options.
+
+        Returns:
+            dict: Output options, e.g. {"imposition": "booklet", "signature": 16}.
+        """
+        if not isinstance(doc_val, dict):
+            return {}
+        return doc_val.get(DOC_OPTIONS_KEY, {})
+
+
+    def get_page_source(self, page_val):
+        """Returns source page number and source document of a setup page.
+
+        Args:
+            page_val (dict): Setup page, {source_page: source_path} with
+                optional transform keys.
+
+        Returns:
+            tuple: (source page number string, source document path).
+        """
+        for key, value in page_val.items():
+            if key not in PAGE_TRANSFORM_KEYS:
+                return key, value
+        raise ValueError("Setup page has no source: {0}".format(page_val))
+
+
+    def get_page_transforms(self, page_val):
+        """Returns the transforms of a setup page.
+
+        Args:
+            page_val (dict): Setup page.
+
+        Returns:
+            dict: Transform keys present on the page.
+        """
+        return {key: page_val[key] for key in PAGE_TRANSFORM_KEYS if key in page_val}
+
+
+    def get_page_size(self, size):
+        """Returns width and height of a target page size.
+
+        Args:
+            size (string|list): Paper name like "A4" or "LETTER", or [width, height] in points.
+
+        Returns:
+            tuple: (width, height) in points.
+        """
+        if isinstance(size, str):
+            name = size.upper()
+            if name in PAGE_SIZES:
+                return PAGE_SIZES[name]
+            dimensions = getattr(pypdf.PaperSize, name, None)
+            if dimensions is None:
+                raise ValueError("Unknown page size: {0}".format(size))
+            return dimensions.width, dimensions.height
+
+        width, height = size
+        return float(width), float(height)
+
+
+    def apply_page_transforms(self, page, transforms):
+        """Applies setup page transforms to an output page.
+
+        The crop box is given in source page coordinates and applied first,
+        then the rotation. Scaling fits the page into the target size,
+        keeping its aspect ratio and centering it.
+
+        Args:
+            page (pypdf.PageObject): Output page owned by the writer.
+            transforms (dict): Transforms from get_page_transforms.
+        """
+        crop = transforms.get("crop")
+        if crop:
+            box = pypdf.generic.RectangleObject([float(value) for value in crop])
+            page.mediabox = box
+            page.cropbox = box
+
+        rotate = int(transforms.get("rotate", 0))
+        if rotate % 90:
+            raise ValueError("Page rotation must be a multiple of 90: {0}".format(rotate))
+        if rotate:
+            page.rotate(rotate)
+
+        scale = transforms.get("scale")
+        if not scale:
+            return
+
+        if page.rotation:
+            page.transfer_rotation_to_content()
+        width, height = self.get_page_size(scale)
+        box = page.cropbox
+        factor = min(width / float(box.width), height / float(box.height))
+        ctm = pypdf.Transformation().translate(
+            -float(box.left), -float(box.bottom)
+        ).scale(factor, factor).translate(
+            (width - float(box.width) * factor) / 2,
+            (height - float(box.height) * factor) / 2
+        )
+        page.add_transformation(ctm)
+        for annot in page.get("/Annots", []):
+            annot = annot.get_object()
+            if "/Rect" not in annot:
+                continue
+            rect = annot["/Rect"]
+            x1, y1 = ctm.apply_on((float(rect[0]), float(rect[1])))
+            x2, y2 = ctm.apply_on((float(rect[2]), float(rect[3])))
+            annot[pypdf.generic.NameObject("/Rect")] = pypdf.generic.RectangleObject(
+                [min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)])
+
+        page_box = pypdf.generic.RectangleObject([0, 0, width, height])
+        page.mediabox = page_box
+        page.cropbox = page_box
+
+
     def extract_input_files(self, pdf_dict):
         """Extract Input files from PDF Setup dict.
 
@@ -162,45 +567,304 @@ class PdfEngine():
             if doc_key == "output_dir":
                 continue
             
-            for page_key in doc_val.keys():
-                page_val = doc_val[page_key]
-                input_page = next(iter(page_val))
-                input_doc = page_val[input_page]
+            for page_key, page_val in self.get_doc_pages(doc_val):
+                input_page, input_doc = self.get_page_source(page_val)
                 if input_doc not in files:
                     files.append(input_doc)
 
         return files
 
     
-    def generate_docs(self, pdf_dict):
-        """Method to generate PDF files based on PDF Setup dict.
+    def can_resume(self, pdf_dict):
+        """Checks if an interrupted generation of this PDF Setup can be resumed.
 
         Args:
             pdf_dict (dict): PDF Setup dict.
 
         Returns:
-            list: list of output paths.
+            bool: True if a job log of the same setup exists in the output dir.
         """
-        output_dir = pdf_dict["output_dir"]
-        out_paths = []
-        for doc_key, doc_val in pdf_dict.items():
-            pdf_write_obj = pypdf.PdfWriter()
-            if doc_key == "output_dir":
-                continue
-            
-            for page_key, page_val in doc_val.items():
-                input_page = next(iter(page_val))
-                input_doc = open(page_val[input_page], "rb")
-                pdf_write_obj.append(
-                    fileobj=input_doc, pages=(int(input_page)-1, int(input_page)))
-            
-            out_path = os.path.join(output_dir, doc_key + ".pdf")
-            output = open(out_path, "wb")
-            pdf_write_obj.write(output)
-            pdf_write_obj.close()
-            output.close()
-            out_paths.append(out_path)
-        
-        return out_paths
+        output_dir = pdf_dict.get("output_dir", "")
+        return JobLog(output_dir, pdf_dict).load()
+
+
+    def write_atomic(self, pdf_write_obj, out_path, output_format="classic"):
+        """Writes a PDF to a temp file and renames it over the output path.
+
+        The temp file is fsynced before the rename, so the output path only
+        ever holds a previous file or the complete new one.
+
+        Args:
+            pdf_write_obj (pypdf.PdfWriter): Writer holding the output pages.
+            out_path (string): Final output path.
+            output_format (string, optional): One of outputFormat.OUTPUT_FORMATS.
+                Defaults to "classic".
+        """
+        out_dir, out_name = os.path.split(out_path)
+        temp_path = os.path.join(out_dir, "." + out_name + ".part")
+        try:
+            with open(temp_path, "wb") as output:
+                with self.instrumentation.stage("serialize", document=out_path):
+                    write_pdf(pdf_write_obj, output, output_format)
+                with self.instrumentation.stage("fsync", document=out_path):
+                    output.flush()
+                    os.fsync(output.fileno())
+            os.replace(temp_path, out_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        # Persist the rename itself, not supported on every platform.
+        try:
+            dir_fd = os.open(out_dir or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            with self.instrumentation.stage("fsync", document=out_dir):
+                os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+
+    def get_imposition_order(self, page_count, imposition, signature=0):
+        """Returns the page order of each imposed sheet.
+
+        N-up sheets take pages in reading order. Booklets fold each
+        signature in half, so a sheet side holds a page from the end and one
+        from the start of the signature. Signatures are padded with blanks
+        to a multiple of 4 pages.
+
+        Args:
+            page_count (int): Number of pages to impose.
+            imposition (string): Imposition layout, one of IMPOSITION_LAYOUTS.
+            signature (int, optional): Pages per booklet signature. Defaults to 0,
+                folding all pages into one signature.
+
+        Returns:
+            list: List of sheets, each a list of page indices or None for blank slots.
+        """
+        if imposition not in IMPOSITION_LAYOUTS:
+            raise ValueError("Unknown imposition: {0}".format(imposition))
 
+        if imposition != "booklet":
+            per_sheet = IMPOSITION_LAYOUTS[imposition][0]
+            return [
+                [index if index < page_count else None for index in range(start, start + per_sheet)]
+                for start in range(0, page_count, per_sheet)
+            ]
 
+        signature = int(signature) or page_count + (-page_count % 4)
+        if signature % 4:
+            raise ValueError("Booklet signature must be a multiple of 4: {0}".format(signature))
+
+        sheets = []
+        for start in range(0, page_count, signature):
+            remaining = page_count - start
+            count = min(signature, remaining + (-remaining % 4))
+            for fold in range(count // 4):
+                front = [start + count - 1 - 2 * fold, start + 2 * fold]
+                back = [start + 2 * fold + 1, start + count - 2 - 2 * fold]
+                sheets.append(front)
+                sheets.append(back)
+
+        return [[index if index < page_count else None for index in sheet] for sheet in sheets]
+
+
+    def impose_pages(self, pdf_write_obj, pages, options):
+        """Places pages onto imposed sheets added to the writer.
+
+        The sheet has the size of the first page, turned to the other
+        orientation for 2-up and booklet layouts. Each page is scaled to fit
+        its cell, keeping its aspect ratio.
+
+        Args:
+            pdf_write_obj (pypdf.PdfWriter): Output writer.
+            pages (list): Prepared page objects in output order.
+            options (dict): Document output options.
+        """
+        if not pages:
+            return
+
+        imposition = options["imposition"]
+        per_sheet, swap = IMPOSITION_LAYOUTS[imposition]
+        for page in pages:
+            if page.rotation:
+                page.transfer_rotation_to_content()
+
+        first_box = pages[0].cropbox
+        sheet_width, sheet_height = float(first_box.width), float(first_box.height)
+        if swap:
+            sheet_width, sheet_height = sheet_height, sheet_width
+
+        if per_sheet == 4:
+            columns, rows = 2, 2
+        elif sheet_width >= sheet_height:
+            columns, rows = 2, 1
+        else:
+            columns, rows = 1, 2
+        cell_width, cell_height = sheet_width / columns, sheet_height / rows
+
+        order = self.get_imposition_order(len(pages), imposition, options.get("signature", 0))
+        for sheet_pages in order:
+            sheet = pdf_write_obj.add_blank_page(sheet_width, sheet_height)
+            for slot, page_index in enumerate(sheet_pages):
+                if page_index is None:
+                    continue
+                page = pages[page_index]
+                box = page.cropbox
+                factor = min(cell_width / float(box.width), cell_height / float(box.height))
+                column, row = slot % columns, slot // columns
+                cell_x = column * cell_width + (cell_width - float(box.width) * factor) / 2
+                cell_y = sheet_height - (row + 1) * cell_height + (cell_height - float(box.height) * factor) / 2
+                ctm = pypdf.Transformation().translate(
+                    -float(box.left), -float(box.bottom)
+                ).scale(factor, factor).translate(cell_x, cell_y)
+                sheet.merge_transformed_page(page, ctm)
+
+
+    def generate_doc(self, doc_key, doc_val, output_dir, reader_cache=None):
+        """Generates a single PDF file from its PDF Setup pages.
+
+        With an imposition output option, pages are prepared in a scratch
+        writer and placed onto sheets in the same pass. The format option
+        selects how the file is written, see outputFormat.write_pdf.
+
+        Outlines, named destinations and internal links of the sources are
+        remapped to the output pages in the same pass, see
+        navigation.NavigationMap. On imposed sheets they lead to the sheet
+        holding the page, internal links on the pages themselves are dropped.
+
+        Args:
+            doc_key (string): Output document name.
+            doc_val (dict): Page dict of the output document.
+            output_dir (string): Output directory.
+            reader_cache (ReaderCache, optional): Readers shared between documents.
+                Defaults to None, using a new cache.
+
+        Returns:
+            string: Output path.
+        """
+        if reader_cache is None:
+            reader_cache = self.new_reader_cache()
+
+        options = self.get_doc_options(doc_val)
+        pdf_write_obj = pypdf.PdfWriter()
+        page_write_obj = pypdf.PdfWriter() if options.get("imposition") else pdf_write_obj
+        navigation_map = NavigationMap()
+        placed = []
+        for page_key, page_val in self.get_doc_pages(doc_val):
+            input_page, input_doc = self.get_page_source(page_val)
+            reader = reader_cache.get(input_doc)
+            page_index = int(input_page) - 1
+            with self.instrumentation.stage("append", document=input_doc, page=input_page):
+                source_page = reader.pages[page_index]
+                # Annotations are copied once every page has its output position
+                page = page_write_obj.add_page(source_page, excluded_keys=("/Annots",))
+            if input_doc not in navigation_map.sources:
+                # Read while the reader is at hand, it may be evicted before the outline is written
+                with self.instrumentation.stage("navigate", document=input_doc):
+                    reader_cache.get_navigation(input_doc)
+            navigation_map.add_page(input_doc, page_index, len(placed))
+            placed.append((page, source_page, input_doc, page_val))
+            self.instrumentation.count("pages")
+
+        imposed = page_write_obj is not pdf_write_obj
+        targets = [page.indirect_reference for page, source_page, input_doc, page_val in placed]
+        with self.instrumentation.stage("navigate", document=doc_key):
+            for page, source_page, input_doc, page_val in placed:
+                navigation_map.copy_annotations(page_write_obj, page, source_page, input_doc,
+                                                reader_cache.get_navigation(input_doc),
+                                                None if imposed else targets)
+
+        for page, source_page, input_doc, page_val in placed:
+            transforms = self.get_page_transforms(page_val)
+            if transforms:
+                with self.instrumentation.stage("append", document=input_doc):
+                    self.apply_page_transforms(page, transforms)
+
+        if imposed:
+            self.impose_pages(pdf_write_obj, [page for page, source_page, input_doc, page_val in placed], options)
+            page_write_obj.close()
+            sheets = self.get_imposition_order(len(placed), options["imposition"], options.get("signature", 0))
+            for sheet, page_indices in enumerate(sheets):
+                for page_index in page_indices:
+                    if page_index is not None:
+                        targets[page_index] = pdf_write_obj.pages[sheet].indirect_reference
+
+        with self.instrumentation.stage("navigate", document=doc_key):
+            navigation_map.write(pdf_write_obj, {document: reader_cache.get_navigation(document)
+                                                 for document in navigation_map.sources}, targets)
+
+        out_path = os.path.join(output_dir, doc_key + ".pdf")
+        self.write_atomic(pdf_write_obj, out_path, options.get("format", self.output_format))
+        pdf_write_obj.close()
+        self.instrumentation.count("documents")
+        return out_path
+
+
+    def iter_generate_docs(self, output_dir, doc_items, job_key, resume=False, reader_cache=None):
+        """Generates PDF files from a stream of setup documents, yielding each output path.
+
+        Progress is recorded in a job log in the output dir. If the job is
+        interrupted, calling again with the same job_key and resume=True
+        skips the documents that were already completed.
+
+        Args:
+            output_dir (string): Output directory.
+            doc_items (iterable): (doc_key, doc_val) tuples, e.g. from iter_dict.
+            job_key (object): JSON serializable description identifying the job,
+                e.g. the PDF Setup dict or the builder and its inputs.
+            resume (bool, optional): Resume an interrupted job. Defaults to False.
+            reader_cache (ReaderCache, optional): Readers shared with the builder
+                of doc_items. Defaults to None, using a new cache.
+
+        Yields:
+            string: Output path of each document once it is on disk.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        job_log = JobLog(output_dir, job_key)
+        job_log.start(resume=resume)
+        if reader_cache is None:
+            reader_cache = self.new_reader_cache()
+        try:
+            with self.instrumentation.job("job_" + job_log.setup_hash[:12]):
+                for doc_key, doc_val in doc_items:
+                    if job_log.is_complete(doc_key):
+                        yield job_log.completed[doc_key]["path"]
+                        continue
+
+                    out_path = self.generate_doc(doc_key, doc_val, output_dir, reader_cache)
+                    job_log.mark_complete(doc_key, out_path)
+                    yield out_path
+        except BaseException:
+            job_log.close()
+            raise
+        finally:
+            reader_cache.clear()
+
+        job_log.finish()
+
+
+    def generate_docs(self, pdf_dict, resume=False):
+        """Method to generate PDF files based on PDF Setup dict.
+
+        Progress is recorded in a job log in the output dir. If the job is
+        interrupted, calling again with resume=True skips the documents that
+        were already completed.
+
+        Args:
+            pdf_dict (dict): PDF Setup dict.
+            resume (bool, optional): Resume an interrupted job. Defaults to False.
+
+        Returns:
+            list: list of output paths.
+        """
+        # Open (and unlock) the sources in parallel before the first page is copied
+        reader_cache = self.new_reader_cache()
+        reader_cache.prefetch(self.extract_input_files(pdf_dict))
+        doc_items = ((doc_key, doc_val) for doc_key, doc_val in pdf_dict.items() if doc_key != "output_dir")
+        return list(self.iter_generate_docs(pdf_dict["output_dir"], doc_items, pdf_dict, resume=resume,
+                                            reader_cache=reader_cache))
@@ -0,0 +1,225 @@
+import io
+import os
+import mmap
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+from engine.navigation import SourceNavigation
+from engine.repairIndex import RepairingPdfReader
+
+
+def open_mapped_file(document):
+    """Maps a local file read-only into memory.
+
+    pypdf reads a mapping like any stream, but only the parts it seeks to
+    are paged in, and no copy of the file is kept in process memory. The
+    file descriptor is closed right away, the mapping keeps its own.
+    A file truncated while mapped raises SIGBUS on access, so only map
+    files that are no longer being written.
+
+    Args:
+        document (string): Path of PDF file.
+
+    Returns:
+        mmap.mmap: Read-only mapping, None if the file cannot be mapped (e.g. empty).
+    """
+    with open(document, "rb") as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            return None
+
+
+def read_ahead(document, chunk_size=1048576):
+    """Reads a file into the OS page cache without keeping its content.
+
+    Args:
+        document (string): Path of file.
+        chunk_size (int, optional): Read size. Defaults to 1 MB.
+    """
+    with open(document, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            return
+        while f.read(chunk_size):
+            pass
+
+
+def open_pdf_reader(document, use_mmap=False, instrumentation=None, credentials=None, repair_index=None,
+                    staging=None, path=None):
+    """Opens a PdfReader on a source, reading it whole or through a memory mapping.
+
+    Args:
+        document (string): Path of PDF file.
+        use_mmap (bool, optional): Read through a memory mapping. Defaults to False.
+        instrumentation (Instrumentation, optional): Times the open, parse and decrypt stages.
+            Defaults to None.
+        credentials (CredentialCache, optional): Unlocks encrypted sources. Defaults to None,
+            leaving them as pypdf opened them.
+        repair_index (RepairIndex, optional): Stored object indexes of damaged sources.
+            Defaults to None, scanning damaged sources on every open.
+        staging (StagingCache, optional): Local copies of the sources, read instead
+            of the sources. Defaults to None, reading the sources in place.
+        path (string, optional): Local path already returned by staging for the source,
+            so the read is not counted twice. Defaults to None, asking staging.
+
+    Returns:
+        RepairingPdfReader: Reader of the source.
+    """
+    def stage(name):
+        return instrumentation.stage(name, document=document) if instrumentation else nullcontext()
+
+    with stage("open"):
+        # The copy may have been evicted since, by other sources staged in parallel
+        if path is None or not os.path.exists(path):
+            path = staging.get(document) if staging is not None else document
+        stream = open_mapped_file(path) if use_mmap else None
+        if stream is None:
+            # What pypdf does itself for a path
+            with open(path, "rb") as f:
+                stream = io.BytesIO(f.read())
+    with stage("parse"):
+        # A staged copy has the fingerprint of its source
+        reader = RepairingPdfReader(stream, document=path, repair_index=repair_index)
+    if reader.repaired:
+        logger.info("Damaged xref of %s, %s the object index", document,
+                    "loaded" if reader.repaired == "cached" else "rebuilt")
+        if instrumentation:
+            instrumentation.count("repaired")
+    if credentials is not None and reader.is_encrypted:
+        with stage("decrypt"):
+            credentials.unlock(reader, document)
+    return reader
+
+
+class ReaderCache():
+    """Bounded LRU cache of open PdfReader objects keyed by source path.
+
+    Every page of a source shares one parsed reader for the duration of a
+    job, instead of re-opening and re-parsing the file for each page. With
+    use_mmap, every reader reads its source through one shared memory
+    mapping instead of a private in-memory copy. With credentials, the
+    cached readers of encrypted sources are decrypted once when opened.
+    With a repair index, damaged sources are only scanned once. With
+    staging, sources are read from their local copies.
+    """
+    def __init__(self, max_readers=32, use_mmap=False, instrumentation=None, credentials=None,
+                 repair_index=None, staging=None):
+        """Initialize the reader cache.
+
+        Args:
+            max_readers (int, optional): Maximum number of readers kept open.
+                Defaults to 32.
+            use_mmap (bool, optional): Read sources through memory mappings. Defaults to False.
+            instrumentation (Instrumentation, optional): Times opening and parsing sources.
+                Defaults to None.
+            credentials (CredentialCache, optional): Unlocks encrypted sources. Defaults to None.
+            repair_index (RepairIndex, optional): Stored object indexes of damaged sources.
+                Defaults to None.
+            staging (StagingCache, optional): Local copies of the sources. Defaults to None.
+        """
+        self.max_readers = max_readers
+        self.use_mmap = use_mmap
+        self.instrumentation = instrumentation
+        self.credentials = credentials
+        self.repair_index = repair_index
+        self.staging = staging
+        self._readers = OrderedDict()
+        self._navigations = {}
+
+    def get(self, document):
+        """Returns the cached reader of a source, opening it if needed.
+
+        Args:
+            document (string): Path of PDF file.
+
+        Returns:
+            pypdf.PdfReader: Reader of the source.
+        """
+        reader = self._readers.get(document)
+        if reader is not None:
+            self._readers.move_to_end(document)
+            return reader
+
+        reader = self.open_reader(document)
+        self._add(document, reader)
+        return reader
+
+    def _add(self, document, reader):
+        self._readers[document] = reader
+        while len(self._readers) > self.max_readers:
+            self._readers.popitem(last=False)
+
+    def get_navigation(self, document):
+        """Returns the outline, named destinations and page numbers of a source, read once.
+
+        Navigations are small and outlive the eviction of their reader, so
+        get them while the reader is in use to avoid reopening the source.
+
+        Args:
+            document (string): Path of PDF file.
+
+        Returns:
+            SourceNavigation: Navigation of the source.
+        """
+        navigation = self._navigations.get(document)
+        if navigation is None:
+            navigation = SourceNavigation(self.get(document))
+            self._navigations[document] = navigation
+        return navigation
+
+    def prefetch(self, documents, max_workers=4):
+        """Opens the readers of several sources ahead of a job.
+
+        The files are read ahead into the OS page cache by parallel threads
+        while the readers are parsed and unlocked one after the other, so
+        reading cold or remote sources overlaps with parsing, which holds
+        the GIL. With staging, the threads copy the sources to their local
+        copies instead. Password prompts all happen before the job writes anything.
+        Only the first max_readers new sources are opened, so none are
+        evicted again before being used.
+
+        Args:
+            documents (iterable): Paths of PDF files, in order of use.
+            max_workers (int, optional): Number of read ahead threads. Defaults to 4.
+
+        Returns:
+            int: Number of readers opened.
+        """
+        missing = []
+        for document in documents:
+            if document not in self._readers and document not in missing:
+                missing.append(document)
+        missing = missing[:self.max_readers]
+        if not missing:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetch = self.staging.get if self.staging is not None else read_ahead
+            read_aheads = [executor.submit(fetch, document) for document in missing]
+            for document, read_ahead_future in zip(missing, read_aheads):
+                path = read_ahead_future.result()
+                self._add(document, self.open_reader(document, path if self.staging is not None else None))
+        return len(missing)
+
+    def open_reader(self, document, path=None):
+        """Opens a new reader for a source.
+
+        Args:
+            document (string): Path of PDF file.
+            path (string, optional): Staged path of the source, already fetched. Defaults to None.
+
+        Returns:
+            pypdf.PdfReader: Reader of the source.
+        """
+        return open_pdf_reader(document, self.use_mmap, self.instrumentation, self.credentials, self.repair_index,
+                               self.staging, path)
+
+    def clear(self):
+        """Drops all cached readers."""
+        self._readers.clear()
+        self._navigations.clear()
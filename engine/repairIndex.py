@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import sqlite3
+import logging
+
+import pypdf
+from pypdf.generic import DictionaryObject, IndirectObject, NameObject, read_object
+
+logger = logging.getLogger(__name__)
+
+from engine.cache import get_cache_dir, get_file_fingerprint
+
+# Start of a trailer dictionary, as pypdf finds them when rebuilding an xref table.
+TRAILER_PATTERN = re.compile(rb"[\r\n \t][ \t]*trailer[\r\n \t]*(<<)")
+
+
+class RepairIndex():
+    """Local SQLite cache of the object indexes of damaged source files.
+
+    When the xref table of a source is broken, pypdf rebuilds it by
+    reading the whole file and parsing every object to find the object
+    streams. The rebuilt index is stored keyed by the fingerprint of the
+    file, so later opens of the same content skip the scan. Files with
+    cross-reference streams have no trailer pypdf can find, their trailer
+    entries are recovered from the xref streams or the catalog. Damaged files
+    are rare, so every call opens its own short connection, which makes
+    the index safe to share between threads.
+    """
+    def __init__(self, db_path=None):
+        """Initialize the repair index. The database is created on first use.
+
+        Args:
+            db_path (string, optional): SQLite database path. Defaults to None,
+                using repair_index.sqlite in the cache directory.
+        """
+        self.db_path = db_path
+
+    def connect(self):
+        """Opens a connection to the database, creating its table if needed.
+
+        Returns:
+            sqlite3.Connection: Database connection.
+        """
+        connection = sqlite3.connect(self.db_path or os.path.join(get_cache_dir(), "repair_index.sqlite"))
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS repaired_xrefs (fingerprint TEXT PRIMARY KEY, xref TEXT)")
+        return connection
+
+    def get(self, fingerprint):
+        """Returns the stored object index of a file.
+
+        Args:
+            fingerprint (string): Fingerprint of the source file.
+
+        Returns:
+            dict: Object index as built by RepairingPdfReader, None if not stored.
+        """
+        connection = self.connect()
+        try:
+            row = connection.execute(
+                "SELECT xref FROM repaired_xrefs WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        finally:
+            connection.close()
+        return json.loads(row[0]) if row else None
+
+    def set(self, fingerprint, index):
+        """Stores the object index of a file.
+
+        Args:
+            fingerprint (string): Fingerprint of the source file.
+            index (dict): Object index as built by RepairingPdfReader.
+        """
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO repaired_xrefs (fingerprint, xref) VALUES (?, ?)",
+                    (fingerprint, json.dumps(index)))
+        finally:
+            connection.close()
+
+
+class RepairingPdfReader(pypdf.PdfReader):
+    """PdfReader reusing stored object indexes of damaged files.
+
+    Hooks the xref rebuild of pypdf: a stored index of the same file
+    content is loaded instead of scanning the file, and a new scan is
+    stored for the next open. repaired tells whether and how the xref
+    was rebuilt.
+
+    Attributes:
+        repaired (string): None if the xref table was intact, "scanned" if it
+            was rebuilt by scanning the file, "cached" if it was loaded.
+    """
+    def __init__(self, stream, document=None, repair_index=None, **kwargs):
+        """Initialize and read the reader.
+
+        Args:
+            stream (file): Stream of the PDF file.
+            document (string, optional): Path of the PDF file, to fingerprint it.
+                Defaults to None, not caching its index.
+            repair_index (RepairIndex, optional): Stored indexes. Defaults to None.
+            **kwargs: Arguments of pypdf.PdfReader.
+        """
+        # Set before reading, the constructor reads the xref
+        self.document = document
+        self.repair_index = repair_index
+        self.repaired = None
+        self.fingerprint = None
+        super().__init__(stream, **kwargs)
+
+        if self.repaired == "scanned":
+            # Objects can only be read once the reader is set up
+            if "/Root" not in self.trailer:
+                self.recover_trailer()
+            if self.fingerprint is not None:
+                self.repair_index.set(self.fingerprint, self.get_index(self.stream))
+
+    def _rebuild_xref_table(self, stream):
+        if self.repair_index is not None and self.document:
+            self.fingerprint = get_file_fingerprint(self.document)
+            index = self.repair_index.get(self.fingerprint)
+            if index is not None:
+                self.load_index(stream, index)
+                self.repaired = "cached"
+                return
+
+        super()._rebuild_xref_table(stream)
+        self.repaired = "scanned"
+
+    def recover_trailer(self):
+        """Recovers the trailer entries of a file without trailer dictionary.
+
+        Uses the last cross-reference stream found, which holds the trailer
+        entries of files written with xref streams, else the document catalog.
+        """
+        catalog = None
+        for generation, entries in sorted(self.xref.items()):
+            for idnum, offset in sorted(entries.items(), key=lambda entry: entry[1]):
+                try:
+                    obj = self.get_object(IndirectObject(idnum, generation, self))
+                except Exception:
+                    continue
+                if not isinstance(obj, DictionaryObject):
+                    continue
+                if obj.get("/Type") == "/XRef" and "/Root" in obj:
+                    for key in ("/Root", "/Info", "/ID"):
+                        if key in obj:
+                            self.trailer[NameObject(key)] = obj.raw_get(key)
+                elif obj.get("/Type") == "/Catalog":
+                    catalog = IndirectObject(idnum, generation, self)
+        for idnum in self.xref_objStm:
+            if "/Root" in self.trailer or catalog is not None:
+                break
+            try:
+                obj = self.get_object(IndirectObject(idnum, 0, self))
+            except Exception:
+                continue
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Catalog":
+                catalog = IndirectObject(idnum, 0, self)
+        if "/Root" not in self.trailer and catalog is not None:
+            self.trailer[NameObject("/Root")] = catalog
+
+    def get_index(self, stream):
+        """Returns the rebuilt object index in a JSON serializable form.
+
+        Args:
+            stream (file): Stream of the PDF file.
+
+        Returns:
+            dict: "xref" {generation: {idnum: offset}}, "objstm" {idnum: [object stream, index]},
+                "trailers" list of trailer offsets and "references" {trailer key: [idnum, generation]}
+                of the trailer entries recovered without trailer.
+        """
+        stream.seek(0, 0)
+        trailers = [match.start(1) for match in TRAILER_PATTERN.finditer(stream.read(-1))]
+        references = {key: [value.idnum, value.generation] for key, value in self.trailer.items()
+                      if isinstance(value, IndirectObject)} if not trailers else {}
+        return {
+            "xref": {generation: dict(entries) for generation, entries in self.xref.items()},
+            "objstm": {idnum: list(location) for idnum, location in self.xref_objStm.items()},
+            "trailers": trailers,
+            "references": references,
+        }
+
+    def load_index(self, stream, index):
+        """Installs a stored object index instead of scanning the file.
+
+        Args:
+            stream (file): Stream of the PDF file.
+            index (dict): Index as returned by get_index.
+        """
+        self.xref = {int(generation): {int(idnum): offset for idnum, offset in entries.items()}
+                     for generation, entries in index["xref"].items()}
+        self.xref_objStm = {int(idnum): tuple(location) for idnum, location in index["objstm"].items()}
+        for offset in index["trailers"]:
+            stream.seek(offset, 0)
+            for key, value in read_object(stream, self).items():
+                self.trailer[key] = value
+        for key, (idnum, generation) in index.get("references", {}).items():
+            self.trailer[NameObject(key)] = IndirectObject(idnum, generation, self)
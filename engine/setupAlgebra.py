@@ -0,0 +1,333 @@
+import json
+
+import numpy as np
+
+from engine.pdfEngine import DOC_OPTIONS_KEY, PAGE_TRANSFORM_KEYS
+
+# Operations of apply_operation. Interleave and concatenate combine several
+# documents into one, the others reorder each document on its own.
+OPERATIONS = ("interleave", "concatenate", "reverse", "select", "rotate_order")
+COMBINING_OPERATIONS = ("interleave", "concatenate")
+
+
+def parse_page_ranges(text, page_count):
+    """Parses page ranges of a document into page indices.
+
+    Ranges are separated by commas and use 1-based page positions:
+    "3" a page, "2-5" pages 2 to 5, "5-2" the same backwards, "7-" up to
+    the last page, "-3" from the first page.
+
+    Args:
+        text (string): Page ranges, e.g. "1-4,8,10-".
+        page_count (int): Pages of the document.
+
+    Raises:
+        ValueError: If a range is not readable or outside of the document.
+
+    Returns:
+        numpy.ndarray: 0-based page indices in range order, pages may repeat.
+    """
+    def get_position(value, default):
+        value = value.strip()
+        if not value:
+            return default
+        position = int(value)
+        if not 1 <= position <= page_count:
+            raise ValueError("Page {0} is outside of 1-{1}".format(value, page_count))
+        return position
+
+    parts = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        start, separator, end = part.partition("-")
+        try:
+            start = get_position(start, 1)
+            end = get_position(end, page_count) if separator else start
+        except ValueError as exception:
+            raise ValueError("Invalid page range {0!r}: {1}".format(part.strip(), exception)) from None
+        step = 1 if end >= start else -1
+        parts.append(np.arange(start - 1, end - 1 + step, step, dtype=np.int64))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+
+def get_interleave_order(lengths):
+    """Returns the order taking one page of each document in turn.
+
+    Documents that run out of pages are skipped, the remaining pages of
+    the longer documents follow in turn.
+
+    Args:
+        lengths (list): Page counts of the documents.
+
+    Returns:
+        numpy.ndarray: Indices into the concatenated pages of the documents.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    documents = np.repeat(np.arange(len(lengths)), lengths)
+    # Page p of a document goes to round p, documents in order within a round
+    offsets = np.cumsum(lengths) - lengths
+    rounds = np.arange(len(documents)) - offsets[documents]
+    return np.lexsort((documents, rounds))
+
+
+def get_rotate_order(page_count, steps):
+    """Returns the order moving the pages of a document by steps, cyclically.
+
+    Args:
+        page_count (int): Pages of the document.
+        steps (int): Positions to move the pages forward, negative to move them back.
+
+    Returns:
+        numpy.ndarray: Page indices.
+    """
+    return np.roll(np.arange(page_count), steps)
+
+
+def get_reverse_order(page_count):
+    """Returns the order of the pages of a document backwards.
+
+    Args:
+        page_count (int): Pages of the document.
+
+    Returns:
+        numpy.ndarray: Page indices.
+    """
+    return np.arange(page_count - 1, -1, -1)
+
+
+def get_operation_order(operation, lengths, ranges=None, steps=0, reverse_last=False):
+    """Returns the page order of an operation on documents of given page counts.
+
+    Args:
+        operation (string): One of OPERATIONS.
+        lengths (list): Page counts of the documents, one for the operations
+            that do not combine documents.
+        ranges (string, optional): Page ranges of "select". Defaults to None.
+        steps (int, optional): Positions of "rotate_order". Defaults to 0.
+        reverse_last (bool, optional): Take the pages of the last document backwards
+            when combining, as the backs of a duplex scan. Defaults to False.
+
+    Raises:
+        ValueError: If the operation is unknown or its arguments are invalid.
+
+    Returns:
+        numpy.ndarray: Indices into the concatenated pages of the documents.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError("Unknown setup operation {0!r}, expected one of {1}".format(operation, OPERATIONS))
+    if operation not in COMBINING_OPERATIONS and len(lengths) != 1:
+        raise ValueError("{0} takes one document".format(operation))
+    total = int(sum(lengths))
+
+    source_order = np.arange(total)
+    if reverse_last and operation in COMBINING_OPERATIONS and lengths:
+        source_order[total - lengths[-1]:] = source_order[total - lengths[-1]:][::-1]
+
+    if operation == "interleave":
+        return source_order[get_interleave_order(lengths)]
+    if operation == "concatenate":
+        return source_order
+    if operation == "reverse":
+        return get_reverse_order(total)
+    if operation == "select":
+        if ranges is None:
+            raise ValueError("select needs page ranges")
+        return parse_page_ranges(ranges, total)
+    return get_rotate_order(total, steps)
+
+
+class PageSequence():
+    """Pages of a setup document as compact integer arrays.
+
+    Each page is a source index, a source page number and a transform
+    index, so reordering 100k pages is a few array operations instead of
+    rebuilding a dict per page. Sources and transforms are stored once in
+    lists the arrays index into, transform 0 being no transform.
+
+    Attributes:
+        sources (list): Source document paths.
+        source_ids (numpy.ndarray): Source index of each page.
+        page_numbers (numpy.ndarray): 1-based source page number of each page.
+        transforms (list): Transform dicts, the first one empty.
+        transform_ids (numpy.ndarray): Transform index of each page.
+    """
+    def __init__(self, sources, source_ids, page_numbers, transforms, transform_ids):
+        """Initialize a sequence from its arrays, see the class attributes."""
+        self.sources = sources
+        self.source_ids = source_ids
+        self.page_numbers = page_numbers
+        self.transforms = transforms
+        self.transform_ids = transform_ids
+
+    def __len__(self):
+        return len(self.page_numbers)
+
+    @classmethod
+    def from_setup_doc(cls, doc_val):
+        """Reads the pages of a setup document.
+
+        Args:
+            doc_val (dict): Setup document, {page_key: {source_page: source_path}} with
+                optional transform keys on the pages and options.
+
+        Returns:
+            PageSequence: Pages in page key order.
+        """
+        source_index = {}
+        transform_index = {"{}": 0}
+        sources = []
+        transforms = [{}]
+        page_items = sorted(((int(page_key), page_val) for page_key, page_val in doc_val.items()
+                             if page_key != DOC_OPTIONS_KEY), key=lambda page: page[0])
+        source_ids = np.empty(len(page_items), dtype=np.int32)
+        page_numbers = np.empty(len(page_items), dtype=np.int32)
+        transform_ids = np.zeros(len(page_items), dtype=np.int32)
+        for position, (page_key, page_val) in enumerate(page_items):
+            page_transforms = None
+            for key, value in page_val.items():
+                if key in PAGE_TRANSFORM_KEYS:
+                    page_transforms = page_transforms or {}
+                    page_transforms[key] = value
+                else:
+                    page_numbers[position] = int(key)
+                    source_id = source_index.get(value)
+                    if source_id is None:
+                        source_id = source_index[value] = len(sources)
+                        sources.append(value)
+                    source_ids[position] = source_id
+            if page_transforms:
+                transform_key = json.dumps(page_transforms, sort_keys=True)
+                transform_id = transform_index.get(transform_key)
+                if transform_id is None:
+                    transform_id = transform_index[transform_key] = len(transforms)
+                    transforms.append(page_transforms)
+                transform_ids[position] = transform_id
+        return cls(sources, source_ids, page_numbers, transforms, transform_ids)
+
+    @classmethod
+    def concatenate(cls, sequences):
+        """Joins sequences one after the other, merging their source and transform lists.
+
+        Args:
+            sequences (list): PageSequence objects.
+
+        Returns:
+            PageSequence: Pages of all sequences in order.
+        """
+        sources, transforms = [], [{}]
+        source_index, transform_index = {}, {"{}": 0}
+        source_ids, transform_ids = [], []
+        for sequence in sequences:
+            source_map = np.empty(len(sequence.sources), dtype=np.int32)
+            for source_id, source in enumerate(sequence.sources):
+                if source not in source_index:
+                    source_index[source] = len(sources)
+                    sources.append(source)
+                source_map[source_id] = source_index[source]
+            transform_map = np.empty(len(sequence.transforms), dtype=np.int32)
+            for transform_id, page_transforms in enumerate(sequence.transforms):
+                transform_key = json.dumps(page_transforms, sort_keys=True)
+                if transform_key not in transform_index:
+                    transform_index[transform_key] = len(transforms)
+                    transforms.append(page_transforms)
+                transform_map[transform_id] = transform_index[transform_key]
+            source_ids.append(source_map[sequence.source_ids])
+            transform_ids.append(transform_map[sequence.transform_ids])
+
+        def join(arrays):
+            return np.concatenate(arrays).astype(np.int32) if arrays else np.zeros(0, dtype=np.int32)
+
+        return cls(sources, join(source_ids), join([sequence.page_numbers for sequence in sequences]),
+                   transforms, join(transform_ids))
+
+    def take(self, order):
+        """Returns the pages at the given positions.
+
+        Args:
+            order (numpy.ndarray): 0-based page positions, e.g. from get_operation_order.
+
+        Returns:
+            PageSequence: Pages in the given order, sharing the source and transform lists.
+        """
+        return PageSequence(self.sources, self.source_ids[order], self.page_numbers[order],
+                            self.transforms, self.transform_ids[order])
+
+    def to_setup_doc(self, options=None):
+        """Writes the pages as a setup document.
+
+        Args:
+            options (dict, optional): Output options of the document. Defaults to None.
+
+        Returns:
+            dict: Setup document with page keys from 1.
+        """
+        doc_val = {}
+        page_keys = [str(number) for number in self.page_numbers.tolist()]
+        for position, (source_id, page_key, transform_id) in enumerate(
+                zip(self.source_ids.tolist(), page_keys, self.transform_ids.tolist())):
+            page_val = {page_key: self.sources[source_id]}
+            if transform_id:
+                page_val.update(self.transforms[transform_id])
+            doc_val[str(position + 1)] = page_val
+        if options:
+            doc_val[DOC_OPTIONS_KEY] = options
+        return doc_val
+
+
+def apply_operation(pdf_dict, operation, doc_keys, doc_name=None, ranges=None, steps=0, reverse_last=False):
+    """Applies a page order operation to documents of a setup.
+
+    Interleave and concatenate replace the documents with one document at
+    the place of the first, keeping its options. The other operations are
+    applied to each document on its own. Other documents are left as they
+    are.
+
+    Args:
+        pdf_dict (dict): PDF Setup dict.
+        operation (string): One of OPERATIONS.
+        doc_keys (list): Documents to operate on, in order.
+        doc_name (string, optional): Name of a combined document. Defaults to None,
+            using the first document's name.
+        ranges (string, optional): Page ranges of "select", see parse_page_ranges. Defaults to None.
+        steps (int, optional): Positions of "rotate_order". Defaults to 0.
+        reverse_last (bool, optional): Take the last document backwards when combining,
+            e.g. interleaving fronts with the reversed backs of a duplex scan. Defaults to False.
+
+    Raises:
+        KeyError: If a document is not in the setup.
+        ValueError: If the operation or its arguments are invalid.
+
+    Returns:
+        dict: New PDF Setup dict.
+    """
+    for doc_key in doc_keys:
+        if doc_key not in pdf_dict or doc_key == "output_dir":
+            raise KeyError("No document {0!r} in the setup".format(doc_key))
+    if not doc_keys:
+        raise ValueError("{0} needs at least one document".format(operation))
+
+    if operation in COMBINING_OPERATIONS:
+        sequences = [PageSequence.from_setup_doc(pdf_dict[doc_key]) for doc_key in doc_keys]
+        order = get_operation_order(operation, [len(sequence) for sequence in sequences],
+                                    reverse_last=reverse_last)
+        combined = PageSequence.concatenate(sequences).take(order)
+        options = pdf_dict[doc_keys[0]].get(DOC_OPTIONS_KEY)
+        doc_name = doc_name or doc_keys[0]
+        if doc_name in pdf_dict and doc_name not in doc_keys:
+            raise ValueError("The setup already has a document {0!r}".format(doc_name))
+
+        new_dict = {}
+        for doc_key, doc_val in pdf_dict.items():
+            if doc_key == doc_keys[0]:
+                new_dict[doc_name] = combined.to_setup_doc(options)
+            elif doc_key not in doc_keys:
+                new_dict[doc_key] = doc_val
+        return new_dict
+
+    new_dict = dict(pdf_dict)
+    for doc_key in doc_keys:
+        sequence = PageSequence.from_setup_doc(pdf_dict[doc_key])
+        order = get_operation_order(operation, [len(sequence)], ranges=ranges, steps=steps)
+        new_dict[doc_key] = sequence.take(order).to_setup_doc(pdf_dict[doc_key].get(DOC_OPTIONS_KEY))
+    return new_dict
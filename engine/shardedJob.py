@@ -0,0 +1,550 @@
+import os
+import json
+import time
+import socket
+import logging
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+from engine.jobLog import JobLog
+
+# Seconds a claimed shard may go without progress before its worker is presumed dead.
+LEASE_SECONDS = 600.0
+
+# Seconds between two looks at the job directory of idle workers and the coordinator.
+POLL_SECONDS = 2.0
+
+
+def write_json_atomic(path, data):
+    """Writes a JSON file through a temp file renamed over it, so readers never see a partial file.
+
+    Args:
+        path (string): File path.
+        data (object): JSON serializable data.
+    """
+    temp_path = "{0}.{1}.{2}.tmp".format(path, socket.gethostname(), os.getpid())
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def read_json(path):
+    """Reads a JSON file.
+
+    Args:
+        path (string): File path.
+
+    Returns:
+        object: Data, None if the file does not exist.
+    """
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def get_worker_id():
+    """Returns an id of the calling process unique across hosts.
+
+    Returns:
+        string: "host:pid".
+    """
+    return "{0}:{1}".format(socket.gethostname(), os.getpid())
+
+
+class ShardedJob():
+    """Generation job split into shards in a directory shared by several hosts.
+
+    The job directory holds job.json and, per shard, a manifest with its
+    documents. Workers claim a shard by creating its lock file exclusively,
+    which is atomic on local filesystems and NFSv3 or later, and write a
+    done or failed record when the shard ends:
+
+        job.json                      setup hash, output dir, shard names
+        shards/00000.json             manifest: {doc_key: doc_val}
+        shards/00000.lock             claim: worker, attempt, time; touched on progress
+        shards/00000.joblog           JobLog of the documents written, kept across attempts
+        shards/00000.done             result: worker, output paths, seconds
+        shards/00000.failed           last error, the document that raised it and number of attempts
+        results.json                  merged result, written by the coordinator when finished
+
+    Every record is written to a temp file and renamed into place, so a
+    reader on another host sees a record whole or not at all.
+    """
+    def __init__(self, job_dir):
+        """Initialize the job of a job directory.
+
+        Args:
+            job_dir (string): Job directory, on a filesystem shared by the workers.
+        """
+        self.job_dir = job_dir
+        self.shard_dir = os.path.join(job_dir, "shards")
+        self._info = None
+
+    @property
+    def info(self):
+        """The job.json record, read once."""
+        if self._info is None:
+            self._info = read_json(os.path.join(self.job_dir, "job.json"))
+            if self._info is None:
+                raise FileNotFoundError("No sharded job in {0}".format(self.job_dir))
+        return self._info
+
+    def create(self, pdf_dict, shard_size=1000):
+        """Splits a setup into shard manifests.
+
+        Documents are cut into runs of shard_size in setup order, which keeps
+        the documents built from the same sources in the same shard. Creating
+        the job of the same setup again keeps the shards already done.
+
+        Args:
+            pdf_dict (dict): PDF Setup dict.
+            shard_size (int, optional): Documents per shard. Defaults to 1000.
+
+        Raises:
+            ValueError: If the directory holds the job of another setup.
+
+        Returns:
+            int: Number of shards.
+        """
+        setup_hash = JobLog.get_setup_hash(pdf_dict)
+        existing = read_json(os.path.join(self.job_dir, "job.json"))
+        if existing is not None:
+            if existing["setup"] != setup_hash:
+                raise ValueError("{0} holds the job of another setup".format(self.job_dir))
+            self._info = existing
+            return len(existing["shards"])
+
+        os.makedirs(self.shard_dir, exist_ok=True)
+        doc_items = [(doc_key, doc_val) for doc_key, doc_val in pdf_dict.items() if doc_key != "output_dir"]
+        shards = []
+        for start in range(0, len(doc_items), shard_size):
+            shard = "{0:05d}".format(len(shards))
+            write_json_atomic(self.get_path(shard, "json"), dict(doc_items[start:start + shard_size]))
+            shards.append(shard)
+
+        # Written last, workers only start once every manifest exists
+        self._info = {"setup": setup_hash, "output_dir": pdf_dict["output_dir"], "shards": shards,
+                      "documents": len(doc_items), "created_time": time.time()}
+        write_json_atomic(os.path.join(self.job_dir, "job.json"), self._info)
+        return len(shards)
+
+    def get_path(self, shard, kind):
+        """Returns the path of a shard file.
+
+        Args:
+            shard (string): Shard name.
+            kind (string): "json", "lock", "joblog", "done" or "failed".
+
+        Returns:
+            string: File path.
+        """
+        return os.path.join(self.shard_dir, "{0}.{1}".format(shard, kind))
+
+    def get_manifest(self, shard):
+        """Returns the documents of a shard.
+
+        Args:
+            shard (string): Shard name.
+
+        Returns:
+            dict: {doc_key: doc_val} in setup order.
+        """
+        return read_json(self.get_path(shard, "json"))
+
+    def get_attempts(self, shard):
+        """Returns the number of failed attempts of a shard.
+
+        Args:
+            shard (string): Shard name.
+
+        Returns:
+            int: Failed attempts.
+        """
+        failed = read_json(self.get_path(shard, "failed"))
+        return failed["attempts"] if failed else 0
+
+    def claim(self, shard, worker_id):
+        """Claims a shard for a worker.
+
+        Args:
+            shard (string): Shard name.
+            worker_id (string): Id of the claiming worker.
+
+        Returns:
+            bool: True if the worker got the shard.
+        """
+        if os.path.exists(self.get_path(shard, "done")):
+            return False
+        try:
+            fd = os.open(self.get_path(shard, "lock"), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump({"worker": worker_id, "attempt": self.get_attempts(shard) + 1, "time": time.time()}, f)
+        # Done by a worker whose lock was released between the two checks
+        if os.path.exists(self.get_path(shard, "done")):
+            self.release(shard, worker_id)
+            return False
+        return True
+
+    def is_claimed_by(self, shard, worker_id):
+        """Checks if a shard is claimed by a worker.
+
+        A worker whose lease expired while it was still running no longer
+        holds the shard once another worker claimed it.
+
+        Args:
+            shard (string): Shard name.
+            worker_id (string): Id of the worker.
+
+        Returns:
+            bool: True if the lock of the shard is the worker's.
+        """
+        try:
+            lock = read_json(self.get_path(shard, "lock"))
+        except ValueError:
+            # Lock being written by a worker claiming the shard right now
+            return False
+        return lock is not None and lock["worker"] == worker_id
+
+    def touch(self, shard, worker_id):
+        """Renews the lease of a shard claimed by a worker.
+
+        Args:
+            shard (string): Shard name.
+            worker_id (string): Id of the worker.
+        """
+        if not self.is_claimed_by(shard, worker_id):
+            return
+        try:
+            os.utime(self.get_path(shard, "lock"), None)
+        except FileNotFoundError:
+            pass
+
+    def release(self, shard, worker_id=None):
+        """Removes the claim of a shard, making it claimable again.
+
+        Args:
+            shard (string): Shard name.
+            worker_id (string, optional): Only remove the claim of this worker. Defaults to None,
+                removing any claim, as the coordinator does to retry a shard.
+        """
+        if worker_id is not None and not self.is_claimed_by(shard, worker_id):
+            return
+        try:
+            os.remove(self.get_path(shard, "lock"))
+        except FileNotFoundError:
+            pass
+
+    def mark_done(self, shard, worker_id, out_paths, seconds):
+        """Records a shard as done and releases the claim of the worker.
+
+        Args:
+            shard (string): Shard name.
+            worker_id (string): Id of the worker.
+            out_paths (list): Output paths of the shard documents.
+            seconds (float): Time the shard took.
+        """
+        write_json_atomic(self.get_path(shard, "done"), {
+            "worker": worker_id, "out_paths": out_paths, "seconds": round(seconds, 3), "time": time.time()})
+        self.release(shard, worker_id)
+
+    def mark_failed(self, shard, worker_id, error, document=None):
+        """Records a failed attempt of a shard. The claim is kept until the coordinator retries the shard.
+
+        Args:
+            shard (string): Shard name.
+            worker_id (string): Id of the worker, or of the coordinator for expired leases.
+            error (string): Error message.
+            document (string, optional): Document being generated when the error was raised.
+                Defaults to None.
+        """
+        write_json_atomic(self.get_path(shard, "failed"), {
+            "worker": worker_id, "error": error, "document": document,
+            "attempts": self.get_attempts(shard) + 1, "time": time.time()})
+
+    def get_status(self, max_attempts=3, lease_seconds=LEASE_SECONDS):
+        """Returns the state of every shard.
+
+        Args:
+            max_attempts (int, optional): Attempts before a shard fails for good. Defaults to 3.
+            lease_seconds (float, optional): Seconds without progress before a claimed
+                shard counts as expired. Defaults to LEASE_SECONDS.
+
+        Returns:
+            dict: {shard: state}, state one of "pending", "running", "expired",
+                "failed" (to retry), "given_up" or "done".
+        """
+        now = time.time()
+        status = {}
+        for shard in self.info["shards"]:
+            if os.path.exists(self.get_path(shard, "done")):
+                status[shard] = "done"
+                continue
+            attempts = self.get_attempts(shard)
+            try:
+                lock_time = os.stat(self.get_path(shard, "lock")).st_mtime
+            except FileNotFoundError:
+                lock_time = None
+            if attempts >= max_attempts:
+                status[shard] = "given_up"
+            elif lock_time is None:
+                status[shard] = "pending"
+            elif os.path.exists(self.get_path(shard, "failed")) and \
+                    os.stat(self.get_path(shard, "failed")).st_mtime >= lock_time:
+                status[shard] = "failed"
+            elif now - lock_time > lease_seconds:
+                status[shard] = "expired"
+            else:
+                status[shard] = "running"
+        return status
+
+    def is_finished(self, max_attempts=3):
+        """Checks if the coordinator merged the results or every shard is done or failed for good.
+
+        Args:
+            max_attempts (int, optional): Attempts before a shard fails for good. Defaults to 3.
+
+        Returns:
+            bool: True if no shard is left to run.
+        """
+        if os.path.exists(os.path.join(self.job_dir, "results.json")):
+            return True
+        return all(state in ("done", "given_up")
+                   for state in self.get_status(max_attempts, lease_seconds=float("inf")).values())
+
+
+class ShardWorker():
+    """Worker process claiming and generating the shards of a sharded job.
+
+    Run one per core on every host sharing the job directory. Each shard
+    is generated with one reader cache, so its sources are opened once.
+    The documents written are recorded in a job log per shard, so a retry
+    of a failed or abandoned shard only generates the documents left.
+    Workers stop when every shard is done or failed for good.
+    """
+    def __init__(self, job, pdf_engine=None, worker_id=None, poll_seconds=POLL_SECONDS, max_attempts=3):
+        """Initialize the worker.
+
+        Args:
+            job (ShardedJob): Job to work on.
+            pdf_engine (PdfEngine, optional): Engine generating the documents. Defaults to None.
+            worker_id (string, optional): Worker id. Defaults to None, using host and pid.
+            poll_seconds (float, optional): Seconds between looks for claimable shards. Defaults to POLL_SECONDS.
+            max_attempts (int, optional): Attempts before a shard fails for good. Defaults to 3.
+        """
+        if pdf_engine is None:
+            from engine.pdfEngine import PdfEngine
+            pdf_engine = PdfEngine()
+        self.job = job
+        self.pdf_engine = pdf_engine
+        self.worker_id = worker_id or get_worker_id()
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.completed = []
+
+    def run(self, exit_when_idle=False):
+        """Claims and generates shards until the job is finished.
+
+        Args:
+            exit_when_idle (bool, optional): Return as soon as no shard can be claimed,
+                instead of waiting for retries. Defaults to False.
+
+        Returns:
+            list: Names of the shards this worker completed.
+        """
+        while not self.job.is_finished(self.max_attempts):
+            claimed = False
+            for shard in self.job.info["shards"]:
+                if self.job.get_attempts(shard) >= self.max_attempts or not self.job.claim(shard, self.worker_id):
+                    continue
+                claimed = True
+                self.run_shard(shard)
+            if not claimed:
+                if exit_when_idle:
+                    break
+                time.sleep(self.poll_seconds)
+        return self.completed
+
+    def run_shard(self, shard):
+        """Generates the documents of a claimed shard and records the result.
+
+        Args:
+            shard (string): Shard name.
+
+        Returns:
+            bool: True if the shard is done.
+        """
+        start = time.time()
+        output_dir = self.job.info["output_dir"]
+        logger.info("Worker %s runs shard %s", self.worker_id, shard)
+        doc_key = None
+        try:
+            documents = self.job.get_manifest(shard)
+            os.makedirs(output_dir, exist_ok=True)
+            job_log = JobLog(output_dir, documents, self.job.get_path(shard, "joblog"))
+            job_log.start(resume=True)
+            reader_cache = self.pdf_engine.new_reader_cache()
+            out_paths = []
+            try:
+                with self.pdf_engine.instrumentation.job("shard_" + shard):
+                    # Only the sources of the documents left by an earlier attempt
+                    pending = {key: value for key, value in documents.items() if not job_log.is_complete(key)}
+                    try:
+                        reader_cache.prefetch(self.pdf_engine.extract_input_files(pending))
+                    except Exception:
+                        # Raised again by the first document of the source, after the ones before it are written
+                        logger.warning("Prefetching the sources of shard %s failed", shard, exc_info=True)
+                    for doc_key, doc_val in documents.items():
+                        if job_log.is_complete(doc_key):
+                            out_paths.append(job_log.completed[doc_key]["path"])
+                            continue
+                        out_path = self.pdf_engine.generate_doc(doc_key, doc_val, output_dir, reader_cache)
+                        job_log.mark_complete(doc_key, out_path)
+                        out_paths.append(out_path)
+                        self.job.touch(shard, self.worker_id)
+                    doc_key = None
+            finally:
+                job_log.close()
+                reader_cache.clear()
+        except Exception as e:
+            logger.exception("Shard %s failed on %s at %s", shard, self.worker_id, doc_key)
+            self.job.mark_failed(shard, self.worker_id, "{0}: {1}".format(type(e).__name__, e), doc_key)
+            return False
+
+        self.job.mark_done(shard, self.worker_id, out_paths, time.time() - start)
+        job_log.finish()
+        self.completed.append(shard)
+        return True
+
+
+def run_local_worker(job_dir, engine_options, max_attempts):
+    """Runs a worker in a child process, see ShardCoordinator.start_local_workers.
+
+    Args:
+        job_dir (string): Job directory.
+        engine_options (dict): PdfEngine arguments.
+        max_attempts (int): Attempts before a shard fails for good.
+    """
+    from engine.pdfEngine import PdfEngine
+
+    ShardWorker(ShardedJob(job_dir), PdfEngine(**engine_options), max_attempts=max_attempts).run()
+
+
+class ShardCoordinator():
+    """Retries failed and abandoned shards of a sharded job and merges their results.
+
+    Only one coordinator runs per job. It never generates documents
+    itself: it releases the claims of failed shards and of shards whose
+    worker stopped renewing its lease, so other workers pick them up, and
+    gives up on a shard after max_attempts.
+    """
+    def __init__(self, job, max_attempts=3, lease_seconds=LEASE_SECONDS, poll_seconds=POLL_SECONDS):
+        """Initialize the coordinator.
+
+        Args:
+            job (ShardedJob): Job to coordinate.
+            max_attempts (int, optional): Attempts before a shard fails for good. Defaults to 3.
+            lease_seconds (float, optional): Seconds without progress before a claimed shard
+                is taken from its worker. Defaults to LEASE_SECONDS.
+            poll_seconds (float, optional): Seconds between two checks. Defaults to POLL_SECONDS.
+        """
+        self.job = job
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.processes = []
+
+    def start_local_workers(self, count, engine_options=None):
+        """Starts worker processes on this host, e.g. to run or test a job on one machine.
+
+        Args:
+            count (int): Number of worker processes.
+            engine_options (dict, optional): PdfEngine arguments of the workers, e.g.
+                {"use_mmap": True}. Defaults to None.
+        """
+        for index in range(count):
+            process = multiprocessing.Process(
+                target=run_local_worker, args=(self.job.job_dir, engine_options or {}, self.max_attempts),
+                name="ShardWorker-{0}".format(index), daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def check(self):
+        """Retries failed and expired shards once.
+
+        Returns:
+            dict: Number of shards per state, see ShardedJob.get_status.
+        """
+        status = self.job.get_status(self.max_attempts, self.lease_seconds)
+        for shard, state in status.items():
+            if state == "expired":
+                logger.warning("Shard %s lease expired, retrying it", shard)
+                self.job.mark_failed(shard, get_worker_id(), "Lease expired")
+                if self.job.get_attempts(shard) < self.max_attempts:
+                    self.job.release(shard)
+            elif state == "failed":
+                logger.warning("Shard %s failed, retrying it", shard)
+                self.job.release(shard)
+
+        counts = {}
+        for state in status.values():
+            counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    def wait(self, progress_callback=None):
+        """Coordinates the job until every shard is done or failed for good, then merges the results.
+
+        Args:
+            progress_callback (callable, optional): Called with the state counts after every check.
+                Defaults to None.
+
+        Returns:
+            dict: Merged results, see merge.
+        """
+        while True:
+            counts = self.check()
+            if progress_callback:
+                progress_callback(counts)
+            if set(counts) <= {"done", "given_up"}:
+                break
+            if self.processes and not any(process.is_alive() for process in self.processes):
+                # Local workers gone, e.g. killed, nothing would run the remaining shards
+                logger.error("All local workers exited with shards left: %s", counts)
+                break
+            time.sleep(self.poll_seconds)
+
+        for process in self.processes:
+            process.join()
+        return self.merge()
+
+    def merge(self):
+        """Merges the shard results into results.json.
+
+        Returns:
+            dict: "out_paths" of the shards done in setup order, "failed" {shard: last error}
+                of the shards not done, and "workers" {worker: {"shards", "seconds"}}.
+        """
+        out_paths = []
+        failed = {}
+        workers = {}
+        for shard in self.job.info["shards"]:
+            done = read_json(self.job.get_path(shard, "done"))
+            if done is None:
+                failed_record = read_json(self.job.get_path(shard, "failed"))
+                failed[shard] = failed_record["error"] if failed_record else "Not run"
+                continue
+            out_paths.extend(done["out_paths"])
+            worker = workers.setdefault(done["worker"], {"shards": 0, "seconds": 0.0})
+            worker["shards"] += 1
+            worker["seconds"] = round(worker["seconds"] + done["seconds"], 3)
+
+        results = {"out_paths": out_paths, "failed": failed, "workers": workers}
+        # Also tells the workers still waiting for retries to exit
+        write_json_atomic(os.path.join(self.job.job_dir, "results.json"), results)
+        return results
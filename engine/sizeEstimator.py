@@ -0,0 +1,125 @@
+from io import BytesIO
+
+import pypdf
+
+# Bytes added per indirect object: "n 0 obj" header, "endobj" and xref entry.
+OBJECT_OVERHEAD = 40
+
+# Bytes added per stream: /Length entry and "stream" and "endstream" keywords.
+STREAM_OVERHEAD = 40
+
+# Bytes of header, catalog, page tree and trailer of every output file.
+FILE_OVERHEAD = 1024
+
+# Keys never followed while collecting page objects: back references to
+# the page tree and links to other pages would pull in the whole document.
+SKIPPED_KEYS = ("/Parent", "/P", "/Dest", "/A", "/B", "/StructParents")
+
+
+class SizeEstimator():
+    """Estimates output PDF sizes of page groups without writing them.
+
+    Every page is resolved to the set of indirect objects it needs in an
+    output file (content streams, images, fonts, ...). Streams are measured
+    by their encoded data, other objects by their serialized size. Objects shared
+    by several pages, like fonts, are only counted once per output.
+    """
+    def __init__(self, reader):
+        """Initialize the estimator for a source.
+
+        Args:
+            reader (pypdf.PdfReader): Reader of the source PDF.
+        """
+        self.reader = reader
+        self._object_sizes = {}
+
+    def get_page_objects(self, page_index):
+        """Returns the sizes of all indirect objects a page needs.
+
+        Args:
+            page_index (int): 0-based page index.
+
+        Returns:
+            dict: Estimated size in bytes keyed by object number.
+        """
+        page = self.reader.pages[page_index]
+        objects = {}
+        if page.indirect_reference is not None:
+            objects[page.indirect_reference.idnum] = self._get_direct_size(page)
+
+        pending = [page]
+        while pending:
+            obj = pending.pop()
+            if isinstance(obj, pypdf.generic.DictionaryObject):
+                values = [value for key, value in obj.items() if key not in SKIPPED_KEYS]
+            elif isinstance(obj, pypdf.generic.ArrayObject):
+                values = list(obj)
+            else:
+                continue
+
+            for value in values:
+                if isinstance(value, pypdf.generic.IndirectObject):
+                    if value.idnum in objects:
+                        continue
+                    resolved = value.get_object()
+                    if isinstance(resolved, pypdf.generic.DictionaryObject) and resolved.get("/Type") == "/Page":
+                        continue
+                    objects[value.idnum] = self._get_object_size(value.idnum, resolved)
+                    pending.append(resolved)
+                else:
+                    pending.append(value)
+        return objects
+
+    def _get_object_size(self, idnum, obj):
+        size = self._object_sizes.get(idnum)
+        if size is None:
+            size = self._get_direct_size(obj)
+            self._object_sizes[idnum] = size
+        return size
+
+    def _get_direct_size(self, obj):
+        if isinstance(obj, pypdf.generic.StreamObject):
+            # pypdf drops /Length when reading a stream, its encoded data is what gets written
+            header = pypdf.generic.DictionaryObject(
+                {key: value for key, value in obj.items() if key != "/Length"})
+            return len(obj._data) + STREAM_OVERHEAD + self._get_direct_size(header)
+
+        stream = BytesIO()
+        try:
+            obj.write_to_stream(stream)
+        except Exception:
+            return OBJECT_OVERHEAD
+        return len(stream.getvalue()) + OBJECT_OVERHEAD
+
+    def plan_chunks(self, max_bytes):
+        """Groups consecutive pages into chunks under a size budget.
+
+        A page that alone exceeds the budget gets a chunk of its own.
+
+        Args:
+            max_bytes (int): Maximum estimated size of a chunk.
+
+        Returns:
+            list: List of chunks, each a list of 0-based page indices.
+        """
+        chunks = []
+        chunk_pages = []
+        chunk_objects = set()
+        chunk_size = FILE_OVERHEAD
+        for page_index in range(len(self.reader.pages)):
+            page_objects = self.get_page_objects(page_index)
+            added_size = sum(size for idnum, size in page_objects.items() if idnum not in chunk_objects)
+            if chunk_pages and chunk_size + added_size > max_bytes:
+                chunks.append(chunk_pages)
+                chunk_pages = []
+                chunk_objects = set()
+                chunk_size = FILE_OVERHEAD
+                added_size = sum(page_objects.values())
+
+            chunk_pages.append(page_index)
+            chunk_objects.update(page_objects)
+            chunk_size += added_size
+
+        if chunk_pages:
+            chunks.append(chunk_pages)
+        return chunks
@@ -0,0 +1,178 @@
+import os
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+from engine.cache import get_cache_dir, get_file_fingerprint
+
+# Default size limit of the staged copies, in bytes.
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+class StagingCache():
+    """Local copies of sources on slow or network storage.
+
+    Each source is copied once to a local staging directory and read from
+    there by generation and previews. A copy is named after the fingerprint
+    of its source, so it is reused across sessions and a changed source is
+    fetched again. Within a session a source is only checked by its size
+    and modification time, which is a single stat over the network. Least
+    recently used copies are deleted once the directory exceeds its size
+    limit; sources larger than the limit are read in place.
+
+    Copies keep the modification time of their source, so they have the
+    same fingerprint and share the page, text and repair caches with it.
+
+    Attributes:
+        stats (dict): "fetched" copies and bytes read from the sources, "served"
+            requests and bytes answered by a staged copy without fetching, "evicted" copies.
+    """
+    def __init__(self, stage_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        """Initialize the staging cache, indexing the copies left by earlier sessions.
+
+        Args:
+            stage_dir (string, optional): Staging directory. Defaults to None,
+                using staging in the cache directory.
+            max_bytes (int, optional): Size limit of the staged copies. Defaults to 2 GB.
+        """
+        self.stage_dir = stage_dir or os.path.join(get_cache_dir(), "staging")
+        self.max_bytes = max_bytes
+        os.makedirs(self.stage_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._document_locks = {}
+        # source path -> (size, mtime_ns, staged path), validated this session
+        self._sources = {}
+        # staged path -> size, least recently used first
+        self._staged = OrderedDict()
+        self.stats = dict.fromkeys(("fetched", "fetched_bytes", "served", "served_bytes", "evicted"), 0)
+
+        entries = []
+        for entry in os.scandir(self.stage_dir):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_atime, entry.path, stat.st_size))
+            elif entry.is_file() and entry.name.endswith(".part"):
+                # Copy interrupted by an earlier session
+                os.remove(entry.path)
+        for atime, path, size in sorted(entries):
+            self._staged[path] = size
+
+    def _get_document_lock(self, document):
+        with self._lock:
+            return self._document_locks.setdefault(document, threading.Lock())
+
+    def get_staged_bytes(self):
+        """Returns the size of the staged copies.
+
+        Returns:
+            int: Bytes in the staging directory.
+        """
+        with self._lock:
+            return sum(self._staged.values())
+
+    def get(self, document):
+        """Returns the local path to read a source from, copying the source if needed.
+
+        Safe to call from several threads, a source is copied once even when
+        asked for in parallel.
+
+        Args:
+            document (string): Path of the source.
+
+        Returns:
+            string: Path of the staged copy, or the source path if it is too
+                large to stage.
+        """
+        stat = os.stat(document)
+        with self._get_document_lock(document):
+            with self._lock:
+                known = self._sources.get(document)
+                if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns) and known[2] in self._staged:
+                    self._use(known[2], stat.st_size)
+                    return known[2]
+
+            if stat.st_size > self.max_bytes:
+                return document
+
+            fingerprint = get_file_fingerprint(document)
+            name = hashlib.sha1(fingerprint.encode()).hexdigest() + ".pdf"
+            staged_path = os.path.join(self.stage_dir, name)
+            with self._lock:
+                # A copy of another size was cut short or is another file
+                staged = self._staged.get(staged_path) == stat.st_size
+                if staged:
+                    self._use(staged_path, stat.st_size)
+            if not staged:
+                self._fetch(document, staged_path, stat.st_size)
+
+            with self._lock:
+                self._sources[document] = (stat.st_size, stat.st_mtime_ns, staged_path)
+            return staged_path
+
+    def _use(self, staged_path, size):
+        """Marks a staged copy as recently used and counts it as served. Called with the lock held."""
+        self._staged.move_to_end(staged_path)
+        self.stats["served"] += 1
+        self.stats["served_bytes"] += size
+        try:
+            # Access time orders the copies for the next session, the modification time is the source's
+            os.utime(staged_path, ns=(time.time_ns(), os.stat(staged_path).st_mtime_ns))
+        except OSError:
+            pass
+
+    def _fetch(self, document, staged_path, size):
+        """Copies a source to the staging directory, then evicts copies over the size limit."""
+        temp_path = staged_path[:-len(".pdf")] + ".{0}.part".format(threading.get_ident())
+        try:
+            shutil.copy2(document, temp_path)
+            os.replace(temp_path, staged_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        logger.debug("Staged %s (%d bytes)", document, size)
+
+        with self._lock:
+            self._staged[staged_path] = size
+            self.stats["fetched"] += 1
+            self.stats["fetched_bytes"] += size
+            total = sum(self._staged.values())
+            while total > self.max_bytes and len(self._staged) > 1:
+                evicted_path, evicted_size = next(iter(self._staged.items()))
+                if evicted_path == staged_path:
+                    break
+                del self._staged[evicted_path]
+                total -= evicted_size
+                self.stats["evicted"] += 1
+                try:
+                    os.remove(evicted_path)
+                except OSError as exception:
+                    logger.warning("Could not remove staged copy %s: %s", evicted_path, exception)
+
+    def clear(self):
+        """Deletes every staged copy."""
+        with self._lock:
+            for staged_path in self._staged:
+                try:
+                    os.remove(staged_path)
+                except OSError:
+                    pass
+            self._staged.clear()
+            self._sources.clear()
+
+    def format_stats(self):
+        """Returns a one line summary of the bytes fetched and served from the staged copies.
+
+        Returns:
+            string: e.g. "staging: fetched 3 (12.0 MB), served 10 (40.0 MB), evicted 0"
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        return "staging: fetched {0} ({1:.1f} MB), served {2} ({3:.1f} MB), evicted {4}".format(
+            stats["fetched"], stats["fetched_bytes"] / 1024 ** 2,
+            stats["served"], stats["served_bytes"] / 1024 ** 2, stats["evicted"])
@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+from engine.cache import get_cache_dir, get_file_fingerprint
+
+
+def extract_pages_text(document, password=None):
+    """Extracts the text of every page of a PDF file.
+
+    Runs in worker processes, so it opens its own reader.
+
+    Args:
+        document (string): Path of PDF file.
+        password (string, optional): Password of an encrypted source. Defaults to None.
+
+    Returns:
+        list: Text of each page.
+    """
+    from engine.credentials import CredentialCache
+    from engine.pdfEngine import PdfEngine
+
+    credentials = CredentialCache()
+    if password is not None:
+        credentials.set_password(document, password)
+    pages = PdfEngine(credentials=credentials).get_pdf_pages(document)
+    texts = []
+    for page in pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            logger.warning("Could not extract text of page %s of %s", len(texts) + 1, document)
+            texts.append("")
+    return texts
+
+
+class TextIndex():
+    """Full-text index of source pages in a local SQLite FTS5 database.
+
+    Page text is cached by file fingerprint, so a source is only extracted
+    again when its content changes. Extraction runs in a process pool.
+    """
+    def __init__(self, db_path=None):
+        """Initialize and open the text index.
+
+        Args:
+            db_path (string, optional): SQLite database path. Defaults to None,
+                using text_index.sqlite in the cache directory.
+        """
+        self.db_path = db_path or os.path.join(get_cache_dir(), "text_index.sqlite")
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, fingerprint TEXT)")
+        self.connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(path UNINDEXED, page UNINDEXED, text)")
+        self.connection.commit()
+
+    def close(self):
+        """Closes the database connection."""
+        self.connection.close()
+
+    def is_indexed(self, document, fingerprint):
+        """Checks if a source is indexed with its current content.
+
+        Args:
+            document (string): Path of PDF file.
+            fingerprint (string): Current fingerprint of the file.
+
+        Returns:
+            bool: True if the index is up to date for the source.
+        """
+        row = self.connection.execute(
+            "SELECT fingerprint FROM sources WHERE path = ?", (document,)).fetchone()
+        return bool(row) and row[0] == fingerprint
+
+    def store(self, document, fingerprint, texts):
+        """Replaces the indexed page text of a source.
+
+        Args:
+            document (string): Path of PDF file.
+            fingerprint (string): Fingerprint of the indexed content.
+            texts (list): Text of each page.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM pages WHERE path = ?", (document,))
+            self.connection.executemany(
+                "INSERT INTO pages (path, page, text) VALUES (?, ?, ?)",
+                [(document, page_index + 1, text) for page_index, text in enumerate(texts)])
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sources (path, fingerprint) VALUES (?, ?)", (document, fingerprint))
+
+    def index_documents(self, documents, max_workers=None, progress_callback=None, passwords=None):
+        """Extracts and indexes the text of all sources not indexed yet.
+
+        Args:
+            documents (list): List of PDF files.
+            max_workers (int, optional): Number of worker processes. Defaults to None, one per CPU.
+            progress_callback (callable, optional): Called with (done, total) after each source.
+            passwords (dict, optional): Passwords of encrypted sources, keyed by document. Defaults to None.
+
+        Returns:
+            int: Number of sources extracted.
+        """
+        stale = {}
+        for document in documents:
+            fingerprint = get_file_fingerprint(document)
+            if not self.is_indexed(document, fingerprint):
+                stale[document] = fingerprint
+        if not stale:
+            return 0
+
+        # Spawn workers, forking a process running Qt threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        # Never more processes than sources, each one starts a Python interpreter
+        max_workers = min(max_workers or os.cpu_count() or 1, len(stale))
+        passwords = passwords or {}
+        done = 0
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            futures = {pool.submit(extract_pages_text, document, passwords.get(document)): document
+                       for document in stale}
+            for future in as_completed(futures):
+                document = futures[future]
+                try:
+                    self.store(document, stale[document], future.result())
+                except Exception:
+                    logger.exception("Text extraction failed for %s", document)
+                done += 1
+                if progress_callback:
+                    progress_callback(done, len(stale))
+        return done
+
+    def search(self, text, documents=None, limit=500):
+        """Searches indexed pages for words or phrases.
+
+        Every whitespace separated word must appear on the page, words in
+        double quotes are matched as a phrase.
+
+        Args:
+            text (string): Search text.
+            documents (list, optional): Restrict results to these sources. Defaults to None.
+            limit (int, optional): Maximum number of results. Defaults to 500.
+
+        Returns:
+            list: (source document, page number, snippet) tuples, best matches first.
+        """
+        match = self.get_match_expression(text)
+        if not match:
+            return []
+
+        query = "SELECT path, page, snippet(pages, 2, '[', ']', '...', 12) FROM pages WHERE pages MATCH ?"
+        params = [match]
+        if documents is not None:
+            documents = list(documents)
+            query += " AND path IN ({0})".format(", ".join("?" * len(documents)))
+            params.extend(documents)
+        query += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        rows = self.connection.execute(query, params).fetchall()
+        return [(path, int(page), snippet) for path, page, snippet in rows]
+
+    def get_match_expression(self, text):
+        """Converts search text into an FTS5 match expression.
+
+        Args:
+            text (string): Search text.
+
+        Returns:
+            string: Match expression with every term quoted.
+        """
+        terms = []
+        for index, part in enumerate(text.split('"')):
+            # Odd parts were inside double quotes
+            words = [part] if index % 2 else part.split()
+            terms.extend('"{0}"'.format(word.replace('"', "")) for word in words if word.strip())
+        return " ".join(terms)
@@ -0,0 +1,455 @@
+import os
+import time
+import json
+import queue
+import select
+import shutil
+import struct
+import fnmatch
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+from engine.jobQueue import JobQueue
+from engine.pdfEngine import PdfEngine
+
+# inotify event masks, see <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# Setup builders of the rule modes, called with (engine, documents, output dir, rule).
+RULE_MODES = {
+    "merge": lambda engine, documents, output_dir, rule: engine.generate_merged_dict(documents, output_dir),
+    "split": lambda engine, documents, output_dir, rule: engine.generate_split_dict(documents, output_dir),
+    "page_count": lambda engine, documents, output_dir, rule: engine.generate_page_count_split_dict(
+        documents, output_dir, int(rule["page_count"])),
+    "size": lambda engine, documents, output_dir, rule: engine.generate_size_split_dict(
+        documents, output_dir, int(rule["max_bytes"])),
+    "bookmarks": lambda engine, documents, output_dir, rule: engine.generate_bookmark_split_dict(
+        documents, output_dir),
+}
+
+DEFAULT_SETTINGS = {
+    "settle_seconds": 5.0,
+    "poll_interval": 2.0,
+    "max_workers": 2,
+    "max_pending": 16,
+}
+
+
+def load_rules(rules_file):
+    """Reads and validates a watch rule file.
+
+    The rule file is JSON:
+        {
+            "settle_seconds": 5, "poll_interval": 2, "max_workers": 2, "max_pending": 16,
+            "rules": [
+                {"watch": "in/merge", "output_dir": "out", "mode": "merge",
+                 "pattern": "*.pdf", "archive_dir": "in/done"},
+                {"watch": "in/chunks", "output_dir": "out", "mode": "page_count", "page_count": 10}
+            ]
+        }
+    Relative paths are relative to the rule file.
+
+    Args:
+        rules_file (string): Path of the rule file.
+
+    Raises:
+        ValueError: If a rule is invalid.
+
+    Returns:
+        dict: Settings with defaults applied and a "rules" list.
+    """
+    with open(rules_file, "r") as f:
+        config = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(rules_file))
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({key: value for key, value in config.items() if key != "rules"})
+    settings["rules"] = []
+    for rule in config.get("rules", []):
+        rule = dict(rule)
+        if rule.get("mode") not in RULE_MODES:
+            raise ValueError("Unknown watch rule mode {0!r}, expected one of {1}".format(
+                rule.get("mode"), ", ".join(RULE_MODES)))
+        if rule["mode"] == "page_count" and "page_count" not in rule:
+            raise ValueError("Watch rule mode page_count needs page_count")
+        if rule["mode"] == "size" and "max_bytes" not in rule:
+            raise ValueError("Watch rule mode size needs max_bytes")
+        for key in ("watch", "output_dir", "archive_dir"):
+            if rule.get(key):
+                rule[key] = os.path.join(base_dir, os.path.expanduser(rule[key]))
+        if not rule.get("watch") or not rule.get("output_dir"):
+            raise ValueError("Watch rules need watch and output_dir")
+        rule.setdefault("pattern", "*.pdf")
+        settings["rules"].append(rule)
+    return settings
+
+
+def is_pdf_complete(path):
+    """Checks if a PDF file looks completely written.
+
+    A PDF ends with an %%EOF marker, which a partial copy is missing.
+
+    Args:
+        path (string): Path of PDF file.
+
+    Returns:
+        bool: True if the file ends with an %%EOF marker.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+class Inotify():
+    """Minimal inotify binding over ctypes, reporting changed file paths."""
+    def __init__(self):
+        """Initialize an inotify instance.
+
+        Raises:
+            OSError: If inotify is not available.
+        """
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watch_dirs = {}
+
+    def add_watch(self, directory):
+        """Watches a directory for written and moved in files.
+
+        Args:
+            directory (string): Directory path.
+        """
+        import ctypes
+
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed for {0}".format(directory))
+        self._watch_dirs[wd] = directory
+
+    def read_paths(self, timeout):
+        """Waits for events and returns the changed paths.
+
+        Args:
+            timeout (float): Seconds to wait for events.
+
+        Returns:
+            set: Changed file paths, or None if the kernel queue overflowed
+                and events were lost.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        paths = set()
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, cookie, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + name_length].rstrip(b"\0")
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if wd in self._watch_dirs and name:
+                paths.add(os.path.join(self._watch_dirs[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        """Closes the inotify instance."""
+        os.close(self.fd)
+
+
+class WatchService():
+    """Headless service generating PDFs from files dropped into watched folders.
+
+    New files of a rule are collected until none of them has changed for
+    settle_seconds and each ends with an %%EOF marker, then the batch is
+    turned into a setup by the rule mode and queued on a bounded JobQueue.
+    Changes are picked up with inotify where available and by polling the
+    folders otherwise. Files present at start are left alone.
+    """
+    def __init__(self, settings, pdf_engine=None, use_inotify=True):
+        """Initialize the watch service.
+
+        Args:
+            settings (dict): Settings as returned by load_rules.
+            pdf_engine (PdfEngine, optional): Engine building setups and generating documents. Defaults to None.
+            use_inotify (bool, optional): Use inotify if available. Defaults to True.
+        """
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings)
+        self.rules = self.settings["rules"]
+        self.pdf_engine = pdf_engine or PdfEngine()
+        self.job_queue = JobQueue(
+            max_workers=int(self.settings["max_workers"]), max_pending=int(self.settings["max_pending"]),
+            pdf_engine=self.pdf_engine)
+        self.job_queue.add_listener(self._job_finished)
+        self.use_inotify = use_inotify
+        self.inotify = None
+        # Path -> (size, mtime_ns, monotonic time of last change) of files not processed yet
+        self.pending = {}
+        # Path -> (size, mtime_ns) of files already handled
+        self.seen = {}
+        # Ready batches waiting for room in the job queue, as (rule, documents)
+        self.ready_batches = []
+        self._last_scan = 0.0
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._counts = {"files_seen": 0, "batches_queued": 0, "setup_errors": 0, "archived": 0}
+
+    def start(self):
+        """Creates missing folders, records existing files and sets up inotify."""
+        for rule in self.rules:
+            for key in ("watch", "output_dir", "archive_dir"):
+                if rule.get(key):
+                    os.makedirs(rule[key], exist_ok=True)
+            for path in self.list_rule_files(rule):
+                self.seen[path] = self.get_file_state(path)
+
+        if self.use_inotify:
+            try:
+                self.inotify = Inotify()
+                for rule in self.rules:
+                    self.inotify.add_watch(rule["watch"])
+            except (OSError, AttributeError) as e:
+                logger.info("inotify unavailable, polling watched folders: %s", e)
+                if self.inotify:
+                    self.inotify.close()
+                self.inotify = None
+
+    def stop(self):
+        """Asks a running serve_forever loop to stop."""
+        self._stop_event.set()
+
+    def close(self):
+        """Stops the workers once queued jobs are finished and closes inotify."""
+        self.job_queue.shutdown()
+        if self.inotify:
+            self.inotify.close()
+            self.inotify = None
+
+    def serve_forever(self, metrics_callback=None, metrics_interval=60.0):
+        """Runs the watch loop until stop is called.
+
+        Args:
+            metrics_callback (callable, optional): Called with get_metrics() every metrics_interval seconds.
+            metrics_interval (float, optional): Seconds between metrics callbacks. Defaults to 60.
+        """
+        self.start()
+        last_metrics = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                self.poll(timeout=min(0.5, float(self.settings["poll_interval"])))
+                if metrics_callback and time.monotonic() - last_metrics >= metrics_interval:
+                    last_metrics = time.monotonic()
+                    metrics_callback(self.get_metrics())
+        finally:
+            self.close()
+
+    def poll(self, timeout=0.0):
+        """Runs one iteration of the watch loop.
+
+        Args:
+            timeout (float, optional): Seconds to wait for file events. Defaults to 0.
+        """
+        now = time.monotonic()
+        changed = set()
+        full_scan = now - self._last_scan >= float(self.settings["poll_interval"])
+        if self.inotify:
+            paths = self.inotify.read_paths(timeout)
+            if paths is None:
+                full_scan = True
+            else:
+                changed = paths
+                # inotify reports changes, a slow rescan only catches what it may miss
+                full_scan = full_scan and now - self._last_scan >= 30 * float(self.settings["poll_interval"])
+        elif timeout:
+            self._stop_event.wait(timeout)
+
+        if full_scan:
+            self._last_scan = time.monotonic()
+            for rule in self.rules:
+                changed.update(self.list_rule_files(rule))
+        changed.update(self.pending)
+
+        now = time.monotonic()
+        for path in changed:
+            self.update_file(path, now)
+        self.collect_ready(now)
+        self.submit_ready()
+
+    def list_rule_files(self, rule):
+        """Lists the files in a rule's watch folder matching its pattern.
+
+        Args:
+            rule (dict): Watch rule.
+
+        Returns:
+            list: File paths.
+        """
+        try:
+            entries = list(os.scandir(rule["watch"]))
+        except OSError:
+            return []
+        return [entry.path for entry in entries
+                if entry.is_file() and fnmatch.fnmatch(entry.name, rule["pattern"])]
+
+    def get_rule(self, path):
+        """Returns the rule a file belongs to.
+
+        Args:
+            path (string): File path.
+
+        Returns:
+            dict: Watch rule, None if no rule matches.
+        """
+        directory, name = os.path.split(path)
+        for rule in self.rules:
+            if os.path.samefile(directory, rule["watch"]) and fnmatch.fnmatch(name, rule["pattern"]):
+                return rule
+        return None
+
+    def get_file_state(self, path):
+        """Returns the size and modification time of a file.
+
+        Args:
+            path (string): File path.
+
+        Returns:
+            tuple: (size, mtime_ns), None if the file is gone.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def update_file(self, path, now):
+        """Records the current state of a new or changed file.
+
+        Args:
+            path (string): File path.
+            now (float): Monotonic time.
+        """
+        state = self.get_file_state(path)
+        if state is None:
+            self.pending.pop(path, None)
+            self.seen.pop(path, None)
+            return
+        if self.seen.get(path) == state:
+            return
+        previous = self.pending.get(path)
+        if previous is None:
+            if self.get_rule(path) is None:
+                return
+            with self._lock:
+                self._counts["files_seen"] += 1
+            self.pending[path] = state + (now,)
+        elif previous[:2] != state:
+            self.pending[path] = state + (now,)
+
+    def collect_ready(self, now):
+        """Moves settled files into ready batches, one batch per rule.
+
+        Args:
+            now (float): Monotonic time.
+        """
+        settle_seconds = float(self.settings["settle_seconds"])
+        batches = {}
+        for path, (size, mtime_ns, changed_time) in list(self.pending.items()):
+            if now - changed_time < settle_seconds:
+                continue
+            if not is_pdf_complete(path):
+                # Restart the clock, the writer may still be busy
+                self.pending[path] = (size, mtime_ns, now)
+                continue
+            rule = self.get_rule(path)
+            del self.pending[path]
+            self.seen[path] = (size, mtime_ns)
+            batches.setdefault(id(rule), (rule, []))[1].append(path)
+
+        for rule, documents in batches.values():
+            self.ready_batches.append((rule, sorted(documents)))
+
+    def submit_ready(self):
+        """Builds setups of ready batches and queues them while the job queue has room."""
+        while self.ready_batches:
+            rule, documents = self.ready_batches[0]
+            try:
+                pdf_dict = RULE_MODES[rule["mode"]](self.pdf_engine, documents, rule["output_dir"], rule)
+            except Exception:
+                logger.exception("Could not build %s setup for %s", rule["mode"], documents)
+                with self._lock:
+                    self._counts["setup_errors"] += 1
+                self.ready_batches.pop(0)
+                continue
+
+            try:
+                job = self.job_queue.submit(pdf_dict, source=(rule, documents))
+            except queue.Full:
+                # Backpressure, try again on the next poll
+                return
+            self.ready_batches.pop(0)
+            with self._lock:
+                self._counts["batches_queued"] += 1
+            logger.info("Queued job %s: %s %s files from %s",
+                        job.job_id, rule["mode"], len(documents), rule["watch"])
+
+    def _job_finished(self, job):
+        """Archives the inputs of a successful job if its rule asks for it.
+
+        Args:
+            job (Job): Finished job.
+        """
+        if not job.source:
+            return
+        rule, documents = job.source
+        if job.status != "done" or not rule.get("archive_dir"):
+            return
+        for document in documents:
+            try:
+                shutil.move(document, os.path.join(rule["archive_dir"], os.path.basename(document)))
+            except OSError:
+                logger.exception("Could not archive %s", document)
+                continue
+            with self._lock:
+                self._counts["archived"] += 1
+
+    def get_metrics(self):
+        """Returns watch and job queue metrics.
+
+        Returns:
+            dict: Job queue metrics plus pending files and ready batches.
+        """
+        metrics = self.job_queue.get_metrics()
+        with self._lock:
+            metrics.update(self._counts)
+        metrics.update({
+            "pending_files": len(self.pending),
+            "ready_batches": len(self.ready_batches),
+            "watch_mode": "inotify" if self.inotify else "polling",
+        })
+        return metrics
@@ -1,4 +1,5 @@
 import sys
+import multiprocessing
 from PySide6 import QtWidgets
 from ui.main import PyPdfPageManager
 
@@ -9,4 +10,6 @@ def launch():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Required for worker processes of the frozen PyInstaller build
+    multiprocessing.freeze_support()
     launch()
@@ -12,8 +12,10 @@ logger = logging.getLogger()
 from PySide6 import QtCore, QtGui, QtWidgets
 
 from ui.widgets.documentOutputTreeWidget import DocumentOutputTreeWidget
-from ui.widgets.documentViewerWidget import DocumentViewerWidget
-from engine.pdfEngine import PdfEngine
+from ui.widgets.taskThread import TaskThread
+from ui.widgets.passwordPrompt import PasswordPrompt
+# pypdf, numpy, QtPdf and the text index are imported on first use, see
+# benchmarks/startupBenchmark.py for their share of the start up time.
 
 github_url = "https://github.com/shobhitk/pyPdfPageManager"
 
@@ -39,11 +41,17 @@ class PyPdfPageManager(QtWidgets.QMainWindow):
         """
         super().__init__(parent=parent)
         self.document_list = []
+        self.text_index_thread = None
+        self.text_index_pending = False
+        self.text_search_pending = False
+        self.task_thread = None
+        self._pdf_engine = None
+        self._doc_view = None
+        self.password_prompt = PasswordPrompt(parent_widget=self)
         self.setObjectName("PyPdfPageManager")
         self.setEnabled(True)
         self.resize(882, 882)
         self.setAutoFillBackground(False)
-        self.pdf_engine = PdfEngine()
         self.setWindowTitle("PDF Page Manager")
 
         main_frame = QtWidgets.QFrame()
@@ -67,6 +75,15 @@ class PyPdfPageManager(QtWidgets.QMainWindow):
         input_output_frame.layout().setContentsMargins(0,0,0,0)
         input_output_frame.layout().setSpacing(3)
 
+        output_frame = QtWidgets.QFrame()
+        output_frame.setLayout(QtWidgets.QVBoxLayout())
+        output_frame.layout().setContentsMargins(0,0,0,0)
+        output_frame.layout().setSpacing(3)
+        self.filter_line_edit = QtWidgets.QLineEdit()
+        self.filter_line_edit.setPlaceholderText("Filter pages, e.g. source:invoice_2024 page:12-40")
+        self.filter_line_edit.setClearButtonEnabled(True)
+        output_frame.layout().addWidget(self.filter_line_edit)
+
         self.document_output_tree_widget = DocumentOutputTreeWidget(parent_widget=self)
         self.document_output_tree_widget.setStyleSheet("""
 QTreeWidget::item{
@@ -88,7 +105,8 @@ QMenuBar {
     padding-bottom:1px;
 }
             """)
-        input_output_frame.layout().addWidget(self.document_output_tree_widget)
+        output_frame.layout().addWidget(self.document_output_tree_widget)
+        input_output_frame.layout().addWidget(output_frame)
 
         button_frame = QtWidgets.QFrame()
         button_frame.setLayout(QtWidgets.QHBoxLayout())
@@ -108,23 +126,118 @@ QMenuBar {
         main_frame.layout().setStretchFactor(main_splitter, 1)
         main_frame.layout().setStretchFactor(button_frame, 0)
 
-        doc_view_frame = QtWidgets.QFrame()
-        doc_view_frame.setLayout(QtWidgets.QVBoxLayout())
-        doc_view_frame.layout().setContentsMargins(0,0,0,0)
-        doc_view_frame.layout().setSpacing(3)
+        # The document viewer is created in it on first use, see doc_view
+        self.doc_view_frame = QtWidgets.QFrame()
+        self.doc_view_frame.setLayout(QtWidgets.QVBoxLayout())
+        self.doc_view_frame.layout().setContentsMargins(0,0,0,0)
+        self.doc_view_frame.layout().setSpacing(3)
         main_frame.layout().addWidget(button_frame)
         main_splitter.addWidget(input_output_frame)
-        self.doc_view = DocumentViewerWidget()
-        doc_view_frame.layout().addWidget(self.doc_view)
-        doc_view_frame.setMinimumWidth(500)
+        self.doc_view_frame.setMinimumWidth(500)
         self.output_line_edit.setText(os.path.expanduser("~/Documents/"))
-        main_splitter.addWidget(doc_view_frame)
+        main_splitter.addWidget(self.doc_view_frame)
         self.setup_actions()
         self.setup_context_menus()
         self.setup_menu_bar()
         self.make_connections()
 
 
+    @property
+    def pdf_engine(self):
+        """
+        The PDF engine, created on first use so pypdf is not imported at start up.
+        Passwords of encrypted sources are asked once and kept for the session.
+
+        Returns:
+            PdfEngine: The PDF engine of the window.
+        """
+        if self._pdf_engine is None:
+            from engine.pdfEngine import PdfEngine
+            from engine.credentials import CredentialCache
+            self._pdf_engine = PdfEngine(credentials=CredentialCache(self.password_prompt))
+        return self._pdf_engine
+
+
+    @property
+    def doc_view(self):
+        """
+        The document viewer, created on first use so QtPdf is not loaded at start up.
+
+        Returns:
+            DocumentViewerWidget: The document viewer of the window.
+        """
+        if self._doc_view is None:
+            from ui.widgets.documentViewerWidget import DocumentViewerWidget
+            self._doc_view = DocumentViewerWidget(get_password=self.get_document_password,
+                                                  get_local_path=self.get_document_local_path)
+            self.doc_view_frame.layout().addWidget(self._doc_view)
+        return self._doc_view
+
+
+    def get_document_password(self, document_path: str):
+        """
+        Returns the password of an encrypted source entered in this session.
+
+        Args:
+            document_path (str): The file path of the PDF document.
+
+        Returns:
+            str: The password, None if unknown.
+        """
+        if self._pdf_engine is None:
+            return None
+        return self._pdf_engine.credentials.get_password(document_path)
+
+
+    def get_document_passwords(self, documents):
+        """
+        Returns the passwords of the encrypted sources entered in this session,
+        for the background workers that open the sources on their own.
+
+        Args:
+            documents (list): List of PDF files.
+
+        Returns:
+            dict: Known passwords, keyed by document.
+        """
+        passwords = {}
+        for document in documents:
+            password = self.get_document_password(document)
+            if password is not None:
+                passwords[document] = password
+        return passwords
+
+
+    def get_document_local_path(self, document_path: str):
+        """
+        Returns the path the viewer reads a source from, its local copy if sources are staged.
+
+        Args:
+            document_path (str): The file path of the PDF document.
+
+        Returns:
+            str: The path to load.
+        """
+        if self._pdf_engine is None:
+            return document_path
+        return self._pdf_engine.get_local_path(document_path)
+
+
+    def set_staging(self, enabled: bool):
+        """
+        Turns copying sources to a local staging folder on or off, for sources on network storage.
+        Generation and the viewer then read the local copies.
+
+        Args:
+            enabled (bool): Stage the sources.
+        """
+        if enabled:
+            from engine.stagingCache import StagingCache
+            self.pdf_engine.staging = StagingCache()
+        else:
+            self.pdf_engine.staging = None
+
+
     def setup_actions(self):
         """
         Sets up QAction objects for various menu and context menu operations.
@@ -136,9 +249,32 @@ QMenuBar {
         self.action_add_docs = QtGui.QAction("Add PDFs")
         self.action_merge_docs = QtGui.QAction("Merge PDFs")
         self.action_split_docs = QtGui.QAction("Split PDFs")
+        self.action_split_page_count = QtGui.QAction("Split PDFs Every N Pages")
+        self.action_split_size = QtGui.QAction("Split PDFs By Size")
+        self.action_split_bookmarks = QtGui.QAction("Split PDFs By Bookmarks")
+        self.action_propose_scans = QtGui.QAction("Propose Documents From Scans")
+        self.action_stage_sources = QtGui.QAction("Stage Sources Locally")
+        self.action_stage_sources.setCheckable(True)
         self.action_close = QtGui.QAction("Close")
         self.action_new_document = QtGui.QAction("Create New Document")
         self.action_remove_document = QtGui.QAction("Remove Document")
+        self.action_set_imposition = QtGui.QAction("Set Imposition")
+        self.action_set_output_format = QtGui.QAction("Set Output Format")
+        self.action_search_text = QtGui.QAction("Search Text")
+        self.action_remove_blank_pages = QtGui.QAction("Move Blank Pages To Undocumented")
+        self.action_interleave_docs = QtGui.QAction("Interleave With Document")
+        self.action_interleave_duplex = QtGui.QAction("Interleave With Reversed Document (Duplex)")
+        self.action_append_doc = QtGui.QAction("Append Document")
+        self.action_reverse_pages = QtGui.QAction("Reverse Pages")
+        self.action_select_pages = QtGui.QAction("Select Page Ranges")
+        self.action_rotate_order = QtGui.QAction("Rotate Page Order")
+        self.page_order_menu = QtWidgets.QMenu("Page Order")
+        self.page_order_menu.addAction(self.action_interleave_docs)
+        self.page_order_menu.addAction(self.action_interleave_duplex)
+        self.page_order_menu.addAction(self.action_append_doc)
+        self.page_order_menu.addAction(self.action_reverse_pages)
+        self.page_order_menu.addAction(self.action_select_pages)
+        self.page_order_menu.addAction(self.action_rotate_order)
 
 
     def setup_menu_bar(self):
@@ -150,6 +286,11 @@ QMenuBar {
         self.file_menu.addAction(self.action_add_docs)
         self.file_menu.addAction(self.action_merge_docs)
         self.file_menu.addAction(self.action_split_docs)
+        self.file_menu.addAction(self.action_split_page_count)
+        self.file_menu.addAction(self.action_split_size)
+        self.file_menu.addAction(self.action_split_bookmarks)
+        self.file_menu.addAction(self.action_propose_scans)
+        self.file_menu.addAction(self.action_stage_sources)
         self.file_menu.addAction(self.action_close)
         self.menu_bar.addMenu(self.file_menu)
 
@@ -157,6 +298,11 @@ QMenuBar {
         self.menu_bar.addMenu(self.edit_menu)
         self.edit_menu.addAction(self.action_new_document)
         self.edit_menu.addAction(self.action_remove_document)
+        self.edit_menu.addAction(self.action_set_imposition)
+        self.edit_menu.addAction(self.action_set_output_format)
+        self.edit_menu.addAction(self.action_search_text)
+        self.edit_menu.addAction(self.action_remove_blank_pages)
+        self.edit_menu.addMenu(self.page_order_menu)
 
 
     def setup_context_menus(self):
@@ -171,8 +317,17 @@ QMenuBar {
         self.output_menu.addAction(self.action_add_docs)
         self.output_menu.addAction(self.action_merge_docs)
         self.output_menu.addAction(self.action_split_docs)
+        self.output_menu.addAction(self.action_split_page_count)
+        self.output_menu.addAction(self.action_split_size)
+        self.output_menu.addAction(self.action_split_bookmarks)
+        self.output_menu.addAction(self.action_propose_scans)
         self.output_menu.addAction(self.action_new_document)
         self.output_menu.addAction(self.action_remove_document)
+        self.output_menu.addAction(self.action_set_imposition)
+        self.output_menu.addAction(self.action_set_output_format)
+        self.output_menu.addAction(self.action_search_text)
+        self.output_menu.addAction(self.action_remove_blank_pages)
+        self.output_menu.addMenu(self.page_order_menu)
 
 
     def show_output_context_menu(self, pos: QtCore.QPoint):
@@ -198,12 +353,30 @@ QMenuBar {
 
         self.action_merge_docs.triggered.connect(self.merge_docs)
         self.action_split_docs.triggered.connect(self.split_docs)
+        self.action_split_page_count.triggered.connect(self.split_docs_by_page_count)
+        self.action_split_size.triggered.connect(self.split_docs_by_size)
+        self.action_split_bookmarks.triggered.connect(self.split_docs_by_bookmarks)
+        self.action_propose_scans.triggered.connect(self.propose_docs_from_scans)
+        self.action_stage_sources.toggled.connect(self.set_staging)
         self.action_close.triggered.connect(self.close)
 
         self.action_new_document.triggered.connect(self.document_output_tree_widget.add_new_document)
         self.action_remove_document.triggered.connect(self.document_output_tree_widget.remove)
+        self.action_set_imposition.triggered.connect(self.document_output_tree_widget.set_imposition)
+        self.action_set_output_format.triggered.connect(self.document_output_tree_widget.set_output_format)
+        self.action_search_text.triggered.connect(self.search_text)
+        self.action_remove_blank_pages.triggered.connect(self.remove_blank_pages)
+        tree_widget = self.document_output_tree_widget
+        self.action_interleave_docs.triggered.connect(lambda: tree_widget.combine_documents("interleave"))
+        self.action_interleave_duplex.triggered.connect(
+            lambda: tree_widget.combine_documents("interleave", reverse_last=True))
+        self.action_append_doc.triggered.connect(lambda: tree_widget.combine_documents("concatenate"))
+        self.action_reverse_pages.triggered.connect(lambda: tree_widget.reorder_pages("reverse"))
+        self.action_select_pages.triggered.connect(lambda: tree_widget.reorder_pages("select"))
+        self.action_rotate_order.triggered.connect(lambda: tree_widget.reorder_pages("rotate_order"))
 
         self.document_output_tree_widget.page_selected.connect(self.show_page)
+        self.filter_line_edit.textChanged.connect(self.document_output_tree_widget.apply_filter)
         self.browse_button.clicked.connect(self.set_output_folder)
         self.generate_button.clicked.connect(self.generate_documents)
         self.close_button.clicked.connect(self.close)
@@ -253,6 +426,75 @@ QMenuBar {
             self.status_bar.showMessage("Files Added.")
 
 
+    def start_text_indexing(self):
+        """
+        Starts extracting the text of the input documents not indexed yet into
+        the text index in the background. If indexing is already running, it
+        is restarted once the current run finishes.
+        """
+        if self.text_index_thread and self.text_index_thread.isRunning():
+            self.text_index_pending = True
+            return
+
+        from ui.widgets.textSearchDialog import TextIndexThread
+
+        self.text_index_pending = False
+        self.text_index_thread = TextIndexThread(
+            self.document_list, self.get_document_passwords(self.document_list), parent=self)
+        self.text_index_thread.progress.connect(self.show_text_index_progress)
+        self.text_index_thread.finished.connect(self.text_indexing_finished)
+        self.text_index_thread.start()
+
+
+    def show_text_index_progress(self, done: int, total: int):
+        """
+        Shows text indexing progress in the status bar.
+
+        Args:
+            done (int): Number of documents indexed.
+            total (int): Number of documents to index.
+        """
+        self.status_bar.showMessage("Indexing text {0}/{1}...".format(done, total))
+
+
+    def text_indexing_finished(self):
+        """
+        Restarts text indexing if documents were added while it was running,
+        else opens the search dialog if it is waiting for the index.
+        """
+        if self.text_index_pending:
+            self.start_text_indexing()
+        elif self.text_search_pending:
+            self.text_search_pending = False
+            self.status_bar.showMessage("Text indexed.")
+            self.open_text_search()
+
+
+    def search_text(self):
+        """
+        Opens the text search dialog over all input documents.
+
+        Text is only extracted when it is first searched, so adding documents
+        stays fast. Documents not indexed yet are indexed in the background
+        first, the dialog opens once they are done.
+        """
+        if not self.document_list:
+            self.status_bar.showMessage("No PDFs to search. Add documents to the input list first.")
+            return
+        self.text_search_pending = True
+        self.start_text_indexing()
+
+
+    def open_text_search(self):
+        """
+        Opens the text search dialog over all input documents.
+        """
+        from ui.widgets.textSearchDialog import TextSearchDialog
+
+        dialog = TextSearchDialog(self.document_output_tree_widget, self.document_list, parent=self)
+        dialog.exec()
+
+
     def merge_docs(self):
         """
         Generates a merge setup based on all documents currently in the input list.
@@ -280,6 +522,166 @@ QMenuBar {
         self.document_output_tree_widget.load_setup(split_dict)
         self.status_bar.showMessage("Split setup created.")
 
+
+    def split_docs_by_page_count(self):
+        """
+        Generates a setup splitting each document in the input list every N pages.
+        Clears the current output tree setup and loads the new split setup.
+        """
+        if not self.document_list:
+            self.status_bar.showMessage("No PDFs to split. Add documents to the input list first.")
+            return
+
+        page_count, ok = QtWidgets.QInputDialog.getInt(
+            self, "Split PDFs Every N Pages", "Pages per document:", 50, 1)
+        if not ok:
+            return
+
+        output_folder = self.get_output_folder()
+        split_dict = self.pdf_engine.generate_page_count_split_dict(self.document_list, output_folder, page_count)
+        self.document_output_tree_widget.clear_setup()
+        self.document_output_tree_widget.load_setup(split_dict)
+        self.status_bar.showMessage("Split setup created.")
+
+    def split_docs_by_size(self):
+        """
+        Generates a setup splitting each document in the input list into chunks
+        under a size budget. Clears the current output tree setup and loads the new split setup.
+        """
+        if not self.document_list:
+            self.status_bar.showMessage("No PDFs to split. Add documents to the input list first.")
+            return
+
+        max_mb, ok = QtWidgets.QInputDialog.getDouble(
+            self, "Split PDFs By Size", "Maximum size per document (MB):", 10.0, 0.1, 100000.0, 1)
+        if not ok:
+            return
+
+        output_folder = self.get_output_folder()
+        split_dict = self.pdf_engine.generate_size_split_dict(
+            self.document_list, output_folder, int(max_mb * 1024 * 1024))
+        self.document_output_tree_widget.clear_setup()
+        self.document_output_tree_widget.load_setup(split_dict)
+        self.status_bar.showMessage("Split setup created.")
+
+    def split_docs_by_bookmarks(self):
+        """
+        Generates a setup with one document per top-level bookmark of each document
+        in the input list. Clears the current output tree setup and loads the new split setup.
+        """
+        if not self.document_list:
+            self.status_bar.showMessage("No PDFs to split. Add documents to the input list first.")
+            return
+
+        output_folder = self.get_output_folder()
+        split_dict = self.pdf_engine.generate_bookmark_split_dict(self.document_list, output_folder)
+        self.document_output_tree_widget.clear_setup()
+        self.document_output_tree_widget.load_setup(split_dict)
+        self.status_bar.showMessage("Split setup created.")
+
+
+    def start_task(self, function, result_slot, *args, **kwargs):
+        """
+        Runs a long engine call in a background thread, reporting progress in the status bar.
+
+        Args:
+            function (callable): Function accepting a progress_callback keyword argument
+            result_slot (callable): Called with the return value of the function
+            *args: Positional arguments of the function
+            **kwargs: Keyword arguments of the function
+
+        Returns:
+            bool: False if another task is still running
+        """
+        if self.task_thread and self.task_thread.isRunning():
+            self.status_bar.showMessage("Another task is still running.")
+            return False
+
+        self.task_thread = TaskThread(function, *args, parent=self, **kwargs)
+        self.task_thread.progress.connect(
+            lambda done, total: self.status_bar.showMessage("Processing {0}/{1}...".format(done, total)))
+        self.task_thread.result.connect(result_slot)
+        self.task_thread.error.connect(self.show_error_dialog)
+        self.task_thread.start()
+        return True
+
+    def propose_docs_from_scans(self):
+        """
+        Groups the pages of all input documents by visual similarity in the background
+        and loads the proposed setup once done.
+        """
+        if not self.document_list:
+            self.status_bar.showMessage("No PDFs to group. Add documents to the input list first.")
+            return
+
+        def propose_setup(documents, output_folder, passwords, progress_callback=None):
+            from engine.pageSimilarity import PageSimilarity
+
+            # The page cache connection must be opened in the worker thread
+            page_similarity = PageSimilarity()
+            try:
+                return page_similarity.propose_setup(
+                    documents, output_folder, progress_callback=progress_callback, passwords=passwords)
+            finally:
+                page_similarity.close()
+
+        documents = list(self.document_list)
+        if self.start_task(propose_setup, self.load_proposed_setup, documents, self.get_output_folder(),
+                           self.get_document_passwords(documents)):
+            self.status_bar.showMessage("Grouping scanned pages...")
+
+    def load_proposed_setup(self, proposal):
+        """
+        Loads a proposed setup, moving separator pages to the undocumented container.
+
+        Args:
+            proposal (tuple): (PDF Setup dict, list of (document, page number) separator pages)
+        """
+        setup_dict, separator_pages = proposal
+        self.document_output_tree_widget.clear_setup()
+        self.document_output_tree_widget.load_setup(setup_dict)
+        self.document_output_tree_widget.add_undocumented_pages(separator_pages)
+        self.status_bar.showMessage("Proposed {0} documents, {1} separator pages.".format(
+            len(setup_dict) - 1, len(separator_pages)))
+
+    def remove_blank_pages(self):
+        """
+        Detects blank pages of all input documents in the background and moves
+        all their output pages to the undocumented container once done.
+        """
+        if not self.document_list:
+            self.status_bar.showMessage("No PDFs to check. Add documents to the input list first.")
+            return
+
+        def find_blank_pages(documents, passwords, progress_callback=None):
+            from engine.blankPages import BlankPageDetector
+
+            # The page cache connection must be opened in the worker thread
+            blank_page_detector = BlankPageDetector()
+            try:
+                return blank_page_detector.find_blank_pages(
+                    documents, progress_callback=progress_callback, passwords=passwords)
+            finally:
+                blank_page_detector.close()
+
+        documents = list(self.document_list)
+        if self.start_task(find_blank_pages, self.move_blank_pages, documents, self.get_document_passwords(documents)):
+            self.status_bar.showMessage("Detecting blank pages...")
+
+    def move_blank_pages(self, blank_pages):
+        """
+        Moves the output pages of detected blank source pages to the undocumented container.
+
+        Args:
+            blank_pages (list): (document, page number) tuples of blank source pages
+        """
+        tree_widget = self.document_output_tree_widget
+        page_ids = set()
+        for source_document, page_number in blank_pages:
+            page_ids |= tree_widget.page_index.find_pages(source_document, page_number)
+        moved = tree_widget.move_pages(page_ids, tree_widget.undocumented_item)
+        self.status_bar.showMessage("Moved {0} blank pages to __UNDOCUMENTED__.".format(moved))
+
     
     def open_about(self):
         """
@@ -292,7 +694,8 @@ QMenuBar {
         """
         Unloads any currently displayed PDF from the document viewer.
         """
-        self.doc_view.unload_pdf()
+        if self._doc_view is not None:
+            self._doc_view.unload_pdf()
 
     
     def show_document(self, document_path: str):
@@ -434,12 +837,24 @@ QMenuBar {
         if not confirm:
             return
 
+        resume = False
+        if self.pdf_engine.can_resume(output_dict):
+            resume = self.show_confirm_dialog(
+                "Resume Generation?",
+                "A previous generation of this setup was interrupted.\n"
+                "Do you want to resume it and skip the documents already generated?"
+            )
+
         self.status_bar.showMessage("Generating PDFs...")
+        self.pdf_engine.instrumentation.reset()
         try:
-            result = self.pdf_engine.generate_docs(output_dict)
+            result = self.pdf_engine.generate_docs(output_dict, resume=resume)
             if result:
                 self.show_success_dialog(result)
-                self.status_bar.showMessage("PDFs generated successfully.")
+                summary = self.pdf_engine.instrumentation.format_summary()
+                if self.pdf_engine.staging is not None:
+                    summary += " | " + self.pdf_engine.staging.format_stats()
+                self.status_bar.showMessage("PDFs generated successfully. " + summary)
             else:
                 self.show_error_dialog("PDF generation completed with no output files. Check your setup.")
                 self.status_bar.showMessage("PDF generation completed.")
@@ -14,6 +14,7 @@ Classes:
 
 import os
 import sys
+from collections import defaultdict
 from pathlib import Path
 
 import logging
@@ -21,10 +22,15 @@ logger = logging.getLogger(__name__)
 
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from engine.pageIndex import PageIndex
+
 
 class PageDropOverlay(QtWidgets.QWidget):
     """
     Visual overlay for drag-and-drop feedback with semi-transparent blue rectangle.
+    
+    Only the regions covered by the previous and the new overlay are
+    repainted, and nothing is repainted when the overlay does not change.
     """
     
     def __init__(self, parent=None):
@@ -36,36 +42,52 @@ class PageDropOverlay(QtWidgets.QWidget):
         self.setAcceptDrops(True)
         self.current_item_rect = QtCore.QRect()
         self.display_text = ""
+        self.customFont = QtGui.QFont('Arial', 15)
+        self.font_metrics = QtGui.QFontMetrics(self.customFont)
+        self.border_pen = QtGui.QPen(QtCore.Qt.darkGray, 3)
+        self.fill_brush = QtGui.QBrush(QtGui.QColor(64, 150, 254, 75))
+        self.text_color = QtGui.QColor(255, 255, 255, 255)
 
     def set_overlay_rect(self, rect, display_text=''):
-        """Set the overlay rectangle and display text, then update the display."""
+        """Set the overlay rectangle and display text, then update the changed region."""
+        if rect == self.current_item_rect and display_text == self.display_text and self.isVisible():
+            return
+
+        old_region = self._get_paint_rect(self.current_item_rect, self.display_text)
         self.current_item_rect = rect
         self.display_text = display_text
         self.setVisible(True)
-        self.update()
+        self.update(old_region.united(self._get_paint_rect(rect, display_text)))
+
+    def _get_text_position(self, rect):
+        """Get the baseline position of the display text inside the overlay rectangle."""
+        return QtCore.QPoint(rect.x() + rect.width() // 2, rect.y() + rect.height() // 4)
+
+    def _get_paint_rect(self, rect, display_text):
+        """Get the widget region painted for an overlay rectangle and its text."""
+        if not rect.isValid():
+            return QtCore.QRect()
+        text_rect = self.font_metrics.boundingRect(display_text).translated(self._get_text_position(rect))
+        # Account for the border pen width
+        return rect.united(text_rect).adjusted(-2, -2, 2, 2)
 
     def paintEvent(self, event):
         """Draw the overlay rectangle and text."""
-        painter = QtGui.QPainter()
-        painter.begin(self)
-        painter.setPen(QtGui.QPen(QtCore.Qt.darkGray, 3))
-        
         if not self.current_item_rect.isValid():
             return
 
+        painter = QtGui.QPainter(self)
+        painter.setPen(self.border_pen)
+
         # Draw semi-transparent blue rectangle
-        painter.setBrush(QtGui.QColor(64, 150, 254, 75))
+        painter.setBrush(self.fill_brush)
         painter.drawRect(self.current_item_rect)
         
         # Draw white text centered
-        painter.setPen(QtGui.QColor(255, 255, 255, 255))
-        self.customFont = QtGui.QFont('Arial', 15)
+        painter.setPen(self.text_color)
         painter.setFont(self.customFont)
-        painter.drawText(
-            self.current_item_rect.x() + (self.current_item_rect.width() / 2), 
-            self.current_item_rect.y() + (self.current_item_rect.height() / 4), 
-            self.display_text
-        )
+        painter.drawText(self._get_text_position(self.current_item_rect), self.display_text)
+        painter.end()
 
 
 class PageSpinBox(QtWidgets.QSpinBox):
@@ -107,17 +129,23 @@ class DocumentItem(PageDocumentBaseItem):
     
     Document items can contain multiple page items and support drag-and-drop
     operations. They are not draggable themselves but can accept dropped pages.
+    Pages loaded from a setup are kept as pending page data and only turned
+    into page items when the document is first expanded.
     
     Attributes:
         document (str): Name or identifier of the document
+        options (dict): Output options of the document, e.g. imposition
+        pending_pages (list): (source_page_num, source_document, transforms, page_id) tuples
+            not yet created as page items, None once populated
     """
     
-    def __init__(self, document="", *args):
+    def __init__(self, document="", options=None, *args):
         """
         Initialize a document item.
         
         Args:
             document (str, optional): Document name or identifier. Defaults to "".
+            options (dict, optional): Output options from the setup. Defaults to None.
             *args: Additional arguments passed to parent constructor
         """
         super().__init__(*args)
@@ -130,7 +158,122 @@ class DocumentItem(PageDocumentBaseItem):
         )
         
         self.document = document
+        self.pending_pages = None
         self.setText(0, self.document)
+        self.set_options(options or {})
+
+    def set_options(self, options):
+        """
+        Set the output options of this document.
+        
+        Args:
+            options (dict): Output options
+        """
+        self.options = options
+        tool_tips = []
+        if self.options.get("imposition"):
+            tool_tips.append("Imposition: {0}".format(self.options["imposition"]))
+        if self.options.get("format"):
+            tool_tips.append("Format: {0}".format(self.options["format"]))
+        self.setToolTip(0, "\n".join(tool_tips))
+
+    def set_pending_pages(self, pages):
+        """
+        Set pages to be created as page items on first expansion.
+        
+        Args:
+            pages (list): (source_page_num, source_document, transforms, page_id) tuples in page order
+        """
+        self.pending_pages = list(pages)
+        if self.pending_pages:
+            self.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.ShowIndicator)
+        else:
+            self.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.DontShowIndicatorWhenChildless)
+        self.update_page_count()
+
+    def is_populated(self):
+        """
+        Check whether the page items of this document have been created.
+        
+        Returns:
+            bool: True if there are no pending pages
+        """
+        return self.pending_pages is None
+
+    def populate(self):
+        """
+        Create page items for all pending pages.
+        """
+        if self.pending_pages is None:
+            return
+
+        pages = self.pending_pages
+        self.pending_pages = None
+        self.setChildIndicatorPolicy(QtWidgets.QTreeWidgetItem.DontShowIndicatorWhenChildless)
+        self.add_page_items(pages)
+        self.update_page_count()
+
+    def add_page_items(self, pages):
+        """
+        Create page items from page data and append them to this document.
+        
+        Args:
+            pages (list): (source_page_num, source_document, transforms, page_id) tuples in page order
+            
+        Returns:
+            list: The created PageItem objects
+        """
+        first_page_number = self.childCount() + 1
+        page_items = [
+            PageItem(
+                source_page_number=source_page_num,
+                page_number=first_page_number + page_index,
+                source_document=source_document,
+                transforms=transforms,
+                page_id=page_id
+            )
+            for page_index, (source_page_num, source_document, transforms, page_id) in enumerate(pages)
+        ]
+        self.addChildren(page_items)
+        for page_item in page_items:
+            if self.document == "__UNDOCUMENTED__":
+                page_item.setForeground(1, QtGui.QColor("#333333"))
+                page_item.setForeground(2, QtGui.QColor("#333333"))
+            else:
+                page_item.set_page_widget(update_siblings=False)
+        return page_items
+
+    def get_page_count(self):
+        """
+        Get the number of pages in this document, including pending pages.
+        
+        Returns:
+            int: Number of pages
+        """
+        if self.pending_pages is not None:
+            return len(self.pending_pages)
+        return self.childCount()
+
+    def update_page_count(self):
+        """
+        Show the number of pages on the document row.
+        """
+        page_count = self.get_page_count()
+        self.setText(1, "{0} page{1}".format(page_count, "" if page_count == 1 else "s"))
+
+    def get_pages_data(self):
+        """
+        Get the page data of this document without creating page items.
+        
+        Returns:
+            list: (source_page_num, source_document, transforms, page_id) tuples in page order
+        """
+        if self.pending_pages is not None:
+            return list(self.pending_pages)
+        return [
+            (child.get_source_page_num(), child.get_source_document(), child.get_transforms(), child.page_id)
+            for child in self.get_children()
+        ]
 
     def get_children(self):
         """
@@ -145,10 +288,21 @@ class DocumentItem(PageDocumentBaseItem):
 
 
     def update_pages(self):
-        index = 1
-        for child in self.get_children():
-            child.set_page_widget()
+        """
+        Renumber the pages after a page was moved out of this document.
+        
+        Existing spinboxes are updated in place instead of being recreated.
+        """
+        page_count = self.childCount()
+        for index, child in enumerate(self.get_children()):
             child.setSelected(False)
+            if not child.page_number_spin:
+                continue
+            child.set_page_number(index + 1)
+            child.page_number_spin.blockSignals(True)
+            child.page_number_spin.setRange(1, page_count)
+            child.page_number_spin.setValue(index + 1)
+            child.page_number_spin.blockSignals(False)
 
 
 class PageItem(PageDocumentBaseItem):
@@ -164,9 +318,11 @@ class PageItem(PageDocumentBaseItem):
         source_document (str): Name of the source document
         page_number (int): Current page number in the target document
         page_number_spin (PageSpinBox): Spinbox widget for page number adjustment
+        transforms (dict): Page transforms (rotate, crop, scale) applied on generation
+        page_id (int): Id of the page in the tree's page index
     """
     
-    def __init__(self, source_page_number, page_number=0, source_document="", *args):
+    def __init__(self, source_page_number, page_number=0, source_document="", transforms=None, page_id=None, *args):
         """
         Initialize a page item.
         
@@ -174,6 +330,8 @@ class PageItem(PageDocumentBaseItem):
             source_page_number (str): Original page number from source document
             page_number (int, optional): Current page number in target document. Defaults to 0.
             source_document (str, optional): Name of source document. Defaults to "".
+            transforms (dict, optional): Page transforms from the setup. Defaults to None.
+            page_id (int, optional): Id of the page in the page index. Defaults to None.
             *args: Additional arguments passed to parent constructor
         """
         super().__init__(*args)
@@ -190,10 +348,16 @@ class PageItem(PageDocumentBaseItem):
         self.source_document = source_document
         self.page_number = page_number
         self.page_number_spin = None
+        self.transforms = transforms or {}
+        self.page_id = page_id
         
         # Set display text for tree columns
         self.setText(1, str(self.source_page_number))
         self.setText(2, self.source_document)
+        if self.transforms:
+            tooltip = ", ".join("{0}: {1}".format(key, value) for key, value in self.transforms.items())
+            self.setToolTip(1, tooltip)
+            self.setToolTip(2, tooltip)
 
     def set_page_number(self, page_number):
         """
@@ -248,12 +412,26 @@ class PageItem(PageDocumentBaseItem):
         """
         return self.source_page_number
 
-    def set_page_widget(self, block_signals=False):
+    def get_transforms(self):
+        """
+        Get the page transforms.
+        
+        Returns:
+            dict: Page transforms
+        """
+        return self.transforms
+
+    def set_page_widget(self, block_signals=False, update_siblings=True):
         """
         Create and configure the spinbox widget for page number adjustment.
         
         Sets up the spinbox with appropriate range and connects it to the
         page reordering functionality.
+        
+        Args:
+            block_signals (bool, optional): Set the value without emitting valueChanged. Defaults to False.
+            update_siblings (bool, optional): Update the range of sibling spinboxes,
+                not needed when all pages are added at once. Defaults to True.
         """
         self.page_number_spin = PageSpinBox()
         
@@ -262,8 +440,9 @@ class PageItem(PageDocumentBaseItem):
         self.page_number_spin.setRange(1, parent_child_count)
         
         # Update range for all sibling spinboxes
-        for sibling in self._get_siblings():
-            sibling.page_number_spin.setRange(1, parent_child_count)
+        if update_siblings:
+            for sibling in self._get_siblings():
+                sibling.page_number_spin.setRange(1, parent_child_count)
 
         # Set current value and connect change handler
         if block_signals:
@@ -343,6 +522,8 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         parent_widget: Reference to parent widget for accessing related functionality
         page_drop_overlay (PageDropOverlay): Visual overlay for drag-and-drop feedback
         undocumented_item (DocumentItem): Special container for orphaned pages
+        page_index (PageIndex): Search index over all pages, updated on every move
+        filter_ids (set): Page ids matching the current filter, None when not filtering
         
     Signals:
         page_selected (str, int): Emitted when a page is selected (document_name, page_number)
@@ -363,6 +544,9 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         self.item_height = 20
         self.parent_widget = parent_widget
         self.page_drop_overlay = PageDropOverlay(self)
+        self.page_index = PageIndex()
+        self.filter_text = ""
+        self.filter_ids = None
         
         # Configure tree widget
         self.setColumnCount(3)
@@ -399,6 +583,8 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         
         # Connect signals
         self.itemClicked.connect(self.emit_page_selected)
+        self.itemExpanded.connect(self.populate_item)
+        self.itemChanged.connect(self.update_document_name)
         
         # Ensure overlay is on top
         self.page_drop_overlay.raise_()
@@ -438,6 +624,7 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         Clear all items from the tree and reinitialize with undocumented container.
         """
         self.clear()
+        self.page_index.clear()
         self.add_undocumented()
 
 
@@ -460,6 +647,32 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         self.load_setup(current_pdf_dict)
 
 
+    def populate_item(self, item):
+        """
+        Create the page items of a document when it is expanded.
+        
+        Args:
+            item (QtWidgets.QTreeWidgetItem): The expanded tree item
+        """
+        if isinstance(item, DocumentItem) and not item.is_populated():
+            item.populate()
+            self._apply_filter_to_document(item)
+
+
+    def update_document_name(self, item, column):
+        """
+        Keep the page index in sync when a document is renamed.
+        
+        Args:
+            item (QtWidgets.QTreeWidgetItem): The changed tree item
+            column (int): The changed column
+        """
+        if column != 0 or not isinstance(item, DocumentItem):
+            return
+        item.document = item.text(0)
+        self.page_index.set_doc_name(item, item.document)
+
+
     def emit_page_selected(self, item):
         """
         Emit page selection signal when a page item is clicked.
@@ -473,28 +686,28 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         self.page_selected.emit((item.source_document, int(item.source_page_number)))
 
 
-    def _get_total_item_height(self, item, item_height):
+    def _get_document_height(self, document_item):
         """
-        Calculate the total height of a tree item including all its children.
+        Calculate the height of a document row and its visible page rows.
+        
+        Uses the child count Qt keeps up to date on every move instead of
+        walking the pages. While filtering, only the pages matching the filter
+        are shown, counted from the page index; the intersection iterates the
+        smaller of the two sets.
         
         Args:
-            item (QtWidgets.QTreeWidgetItem): Tree item to measure
-            item_height (int): Height of individual items
+            document_item (DocumentItem): Document item to measure
             
         Returns:
             int: Total height in pixels
         """
-        if not item:
-            return 0
-            
-        total_height = item_height
-        
-        # Add height of all children recursively
-        for i in range(item.childCount()):
-            child_height = self._get_total_item_height(item.child(i), item_height)
-            total_height += child_height
-            
-        return total_height
+        row_count = 1
+        if document_item.isExpanded():
+            if self.filter_ids is None:
+                row_count += document_item.childCount()
+            else:
+                row_count += len(self.filter_ids.intersection(self.page_index.get_doc_pages(document_item)))
+        return row_count * self.item_height
 
 
     def _reparent_item(self, item, new_parent):
@@ -509,8 +722,16 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         old_parent = item.parent()
         item = old_parent.takeChild(old_parent.indexOfChild(item))
         
-        # Add to new parent
+        # Add to new parent, filtering its pages if they are created now
+        self.populate_item(new_parent)
         new_parent.addChild(item)
+        self.page_index.move_page(item.page_id, new_parent)
+        if self.filter_ids is not None:
+            item.setHidden(item.page_id not in self.filter_ids)
+            if item.page_id in self.filter_ids:
+                new_parent.setHidden(False)
+        old_parent.update_page_count()
+        new_parent.update_page_count()
         # Update page number and widget
         if new_parent.text(0) == "__UNDOCUMENTED__":
             item.setForeground(1, QtGui.QColor("#333333"))
@@ -569,7 +790,7 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
 
         # Calculate overlay rectangle
         item_rect = self.visualItemRect(drag_pos_item)
-        overlay_height = self._get_total_item_height(drag_pos_item, self.item_height)
+        overlay_height = self._get_document_height(drag_pos_item)
         rect = QtCore.QRect(
             item_rect.x(), 
             item_rect.y() + self.header().height(), 
@@ -627,7 +848,10 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         # Perform the move operation
         old_parent = dropped_item.parent()
         dropped_item = old_parent.takeChild(old_parent.indexOfChild(dropped_item))
+        # Filters the target's pages if they are created now
+        self.populate_item(drop_target_item)
         drop_target_item.addChild(dropped_item)
+        self.page_index.move_page(dropped_item.page_id, drop_target_item)
         
         # Update page number and widget
         if drop_target_item.text(0) != "__UNDOCUMENTED__":
@@ -640,9 +864,11 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
 
 
         old_parent.update_pages()
+        old_parent.update_page_count()
+        drop_target_item.update_page_count()
 
-        # Expand all items to show changes
-        self.expandAll()
+        # Expand the target document to show the change
+        drop_target_item.setExpanded(True)
         event.accept()
 
 
@@ -653,8 +879,32 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         self.undocumented_item = DocumentItem(document="__UNDOCUMENTED__")
 
         self.undocumented_item.setForeground(0, QtGui.QColor("#333333"))
+        self.undocumented_item.set_pending_pages([])
 
         self.insertTopLevelItem(0, self.undocumented_item)
+        self.page_index.set_doc_name(self.undocumented_item, self.undocumented_item.document)
+
+
+    def add_undocumented_pages(self, pages):
+        """
+        Add source pages to the undocumented container.
+        
+        Args:
+            pages (list): (source document, source page number) tuples
+        """
+        page_data = []
+        for source_document, source_page_num in pages:
+            page_id = self.page_index.add_page(self.undocumented_item, source_document, source_page_num)
+            page_data.append((source_page_num, source_document, {}, page_id))
+
+        if self.undocumented_item.is_populated():
+            self.undocumented_item.add_page_items(page_data)
+            self.undocumented_item.update_pages()
+        else:
+            self.undocumented_item.set_pending_pages(self.undocumented_item.get_pages_data() + page_data)
+        self.undocumented_item.update_page_count()
+        if self.filter_ids is not None:
+            self._apply_filter_to_document(self.undocumented_item)
 
 
     def load_setup(self, pdf_dict):
@@ -668,7 +918,9 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
                         page_number: {source_page_num: source_document}
                     }
                 }
+                Pages may carry optional "rotate", "crop" and "scale" keys.
         """
+        pdf_engine = self.parent_widget.pdf_engine
         for doc_key in pdf_dict.keys():
             # Skip metadata entries
             if doc_key in ["output_dir"]:
@@ -676,34 +928,70 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
                 
             doc_val = pdf_dict[doc_key]
             doc_base = os.path.basename(doc_key).split(".")[0]
-            document_item = DocumentItem(doc_base)
+            document_item = DocumentItem(doc_base, pdf_engine.get_doc_options(doc_val))
             self.addTopLevelItem(document_item)
+            self.page_index.set_doc_name(document_item, doc_base)
             
-            # Add pages to document
-            for page_key in sorted([int(key) for key in doc_val.keys()]):
-                page_val = doc_val[str(page_key)]
-                source_page_num = next(iter(page_val))
-                page_item = PageItem(
-                    source_page_number=source_page_num,
-                    page_number=int(page_key),
-                    source_document=page_val[source_page_num]
-                )
-                document_item.addChild(page_item)
-                page_item.set_page_widget()
-        
-        # Expand all items to show structure
-        self.expandAll()
+            # Keep pages as pending data, page items are created on expansion
+            pages = []
+            for page_key, page_val in sorted(pdf_engine.get_doc_pages(doc_val), key=lambda page: int(page[0])):
+                source_page_num, source_document = pdf_engine.get_page_source(page_val)
+                page_id = self.page_index.add_page(document_item, source_document, source_page_num)
+                pages.append((source_page_num, source_document, pdf_engine.get_page_transforms(page_val), page_id))
+            document_item.set_pending_pages(pages)
+
+        if self.filter_ids is not None:
+            self.apply_filter(self.filter_text)
 
 
     def find_doc_items(self, path):
         """
-        Find document items matching a given path.
+        Find document items holding pages of a given source path.
         
         Args:
             path (str): Path to search for
+            
+        Returns:
+            list: Document items in tree order
         """
-        root = self.invisibleRootItem()
-        # TODO: Implement path-based document search
+        doc_items = self.page_index.get_source_docs(path)
+        return [item for item in self.get_items() if item in doc_items]
+
+
+    def apply_filter(self, text):
+        """
+        Filter the tree to pages matching a search query.
+        
+        Items are hidden rather than recreated, and unexpanded documents are
+        matched through the page index without creating their page items.
+        See PageIndex for the query syntax, e.g. "source:invoice_2024 page:12-40".
+        
+        Args:
+            text (str): Query text, an empty query shows all pages
+        """
+        self.filter_text = text
+        self.filter_ids = self.page_index.query(text)
+        for document_item in self.get_items():
+            self._apply_filter_to_document(document_item)
+
+
+    def _apply_filter_to_document(self, document_item):
+        """
+        Show or hide a document and its page items for the current filter.
+        
+        Args:
+            document_item (DocumentItem): Document item to filter
+        """
+        if self.filter_ids is None:
+            document_item.setHidden(False)
+            for child in document_item.get_children():
+                child.setHidden(False)
+            return
+
+        doc_ids = self.page_index.get_doc_pages(document_item)
+        document_item.setHidden(self.filter_ids.isdisjoint(doc_ids))
+        for child in document_item.get_children():
+            child.setHidden(child.page_id not in self.filter_ids)
 
 
 
@@ -732,22 +1020,73 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
             if document_item.text(0) == "__UNDOCUMENTED__":
                 continue
                 
-            page_count = document_item.childCount()
-            if not page_count:
+            # Unexpanded documents are read from their pending page data
+            pages = document_item.get_pages_data()
+            if not pages:
                 continue
                 
             # Build page dictionary for this document
             page_dict = {}
-            for page_index in range(page_count):
-                page_item = document_item.child(page_index)
-                page_dict[str(page_index + 1)] = {
-                    page_item.get_source_page_num(): page_item.get_source_document()
-                }
+            for page_index, (source_page_num, source_document, transforms, page_id) in enumerate(pages):
+                page_dict[str(page_index + 1)] = {source_page_num: source_document}
+                page_dict[str(page_index + 1)].update(transforms)
+
+            if document_item.options:
+                page_dict["options"] = document_item.options
                 
             document_dict[document_item.text(0)] = page_dict
         
         return document_dict
 
+    def move_pages(self, page_ids, target_item):
+        """
+        Move pages to a document in one batched operation.
+        
+        Pages of unexpanded documents are moved as page data, so no page
+        items are created unless the target document is expanded.
+        
+        Args:
+            page_ids (iterable): Page index ids of the pages to move
+            target_item (DocumentItem): Target document
+            
+        Returns:
+            int: Number of moved pages
+        """
+        pages_by_doc = defaultdict(set)
+        for page_id in page_ids:
+            document_item = self.page_index.get_page_doc(page_id)
+            if document_item is not target_item:
+                pages_by_doc[document_item].add(page_id)
+
+        moved_pages = []
+        for document_item, doc_page_ids in pages_by_doc.items():
+            if document_item.is_populated():
+                for child in [child for child in document_item.get_children() if child.page_id in doc_page_ids]:
+                    document_item.takeChild(document_item.indexOfChild(child))
+                    moved_pages.append(
+                        (child.get_source_page_num(), child.get_source_document(), child.get_transforms(), child.page_id))
+                document_item.update_pages()
+            else:
+                pages = document_item.get_pages_data()
+                moved_pages.extend(page for page in pages if page[3] in doc_page_ids)
+                document_item.set_pending_pages([page for page in pages if page[3] not in doc_page_ids])
+            document_item.update_page_count()
+
+            for page_id in doc_page_ids:
+                self.page_index.move_page(page_id, target_item)
+            if self.filter_ids is not None:
+                self._apply_filter_to_document(document_item)
+
+        if target_item.is_populated():
+            target_item.add_page_items(moved_pages)
+            target_item.update_pages()
+        else:
+            target_item.set_pending_pages(target_item.get_pages_data() + moved_pages)
+        target_item.update_page_count()
+        if self.filter_ids is not None:
+            self._apply_filter_to_document(target_item)
+        return len(moved_pages)
+
     def get_items(self):
         """
         Get all top-level document items.
@@ -786,12 +1125,242 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
         # Create new document
         doc_item = DocumentItem(name)
         self.addTopLevelItem(doc_item)
+        self.page_index.set_doc_name(doc_item, name)
         
         # Move selected pages to new document
         if selected_items:
             for item in selected_items:
                 self._reparent_item(item, doc_item)
 
+    def set_imposition(self):
+        """
+        Set the imposition output option of the selected document.
+        
+        Shows a choice of imposition layouts for the document of the
+        selected item.
+        """
+        selected_items = self.selectedItems()
+        if not selected_items:
+            return
+        document_item = selected_items[0]
+        if document_item.parent():
+            document_item = document_item.parent()
+        if document_item is self.undocumented_item:
+            return
+
+        layouts = ["None", "2-up", "4-up", "booklet"]
+        current = document_item.options.get("imposition", "None")
+        layout, ok = QtWidgets.QInputDialog.getItem(
+            self,
+            "Set Imposition",
+            "Imposition layout:",
+            layouts,
+            layouts.index(current),
+            False
+        )
+        if not ok:
+            return
+
+        options = dict(document_item.options)
+        options.pop("imposition", None)
+        options.pop("signature", None)
+        if layout != "None":
+            options["imposition"] = layout
+        document_item.set_options(options)
+
+    def set_output_format(self):
+        """
+        Set the output format option of the selected documents.
+
+        Object streams make files smaller, linearized files show their
+        first page before they are fully downloaded from a web server.
+        """
+        document_items = []
+        for item in self.selectedItems():
+            document_item = item.parent() or item
+            if document_item is not self.undocumented_item and document_item not in document_items:
+                document_items.append(document_item)
+        if not document_items:
+            return
+
+        # Imported here, it imports pypdf
+        from engine.outputFormat import OUTPUT_FORMATS
+
+        formats = list(OUTPUT_FORMATS)
+        current = document_items[0].options.get("format", "classic")
+        output_format, ok = QtWidgets.QInputDialog.getItem(
+            self,
+            "Set Output Format",
+            "Output format:",
+            formats,
+            formats.index(current) if current in formats else 0,
+            False
+        )
+        if not ok:
+            return
+
+        for document_item in document_items:
+            options = dict(document_item.options)
+            options.pop("format", None)
+            if output_format != "classic":
+                options["format"] = output_format
+            document_item.set_options(options)
+
+    def get_selected_document(self):
+        """
+        Get the document of the selected item, the document itself or the parent of a page.
+
+        Returns:
+            DocumentItem: Selected document, None if nothing or only the undocumented container is selected
+        """
+        selected_items = self.selectedItems()
+        if not selected_items:
+            return None
+        document_item = selected_items[0].parent() or selected_items[0]
+        if document_item is self.undocumented_item:
+            return None
+        return document_item
+
+    def set_pages_data(self, document_item, pages):
+        """
+        Replace the pages of a document with page data, keeping it unexpanded if it was.
+
+        Args:
+            document_item (DocumentItem): Document to fill
+            pages (list): (source_page_num, source_document, transforms, page_id) tuples in page order
+        """
+        if document_item.is_populated():
+            document_item.takeChildren()
+            document_item.add_page_items(pages)
+            document_item.update_pages()
+        else:
+            document_item.set_pending_pages(pages)
+        document_item.update_page_count()
+        if self.filter_ids is not None:
+            self._apply_filter_to_document(document_item)
+
+    def apply_page_order(self, document_item, pages, order):
+        """
+        Set the pages of a document to page data in a computed order.
+
+        Pages left out of the order are moved to the undocumented container,
+        pages taken more than once get a new page id for each copy.
+
+        Args:
+            document_item (DocumentItem): Document to fill
+            pages (list): Page data the order indexes into
+            order (numpy.ndarray): Page indices, see engine.setupAlgebra
+        """
+        ordered_pages = []
+        used_ids = set()
+        for index in order.tolist():
+            source_page_num, source_document, transforms, page_id = pages[index]
+            if page_id in used_ids:
+                page_id = self.page_index.add_page(document_item, source_document, source_page_num)
+            else:
+                self.page_index.move_page(page_id, document_item)
+            used_ids.add(page_id)
+            ordered_pages.append((source_page_num, source_document, dict(transforms), page_id))
+
+        self.set_pages_data(document_item, ordered_pages)
+
+        left_out = [page for page in pages if page[3] not in used_ids]
+        if left_out:
+            for page in left_out:
+                self.page_index.move_page(page[3], self.undocumented_item)
+            if self.undocumented_item.is_populated():
+                self.undocumented_item.add_page_items(left_out)
+                self.undocumented_item.update_pages()
+            else:
+                self.undocumented_item.set_pending_pages(self.undocumented_item.get_pages_data() + left_out)
+            self.undocumented_item.update_page_count()
+            if self.filter_ids is not None:
+                self._apply_filter_to_document(self.undocumented_item)
+
+    def reorder_pages(self, operation):
+        """
+        Reverse, select page ranges of, or rotate the page order of the selected document.
+
+        Args:
+            operation (str): "reverse", "select" or "rotate_order"
+        """
+        document_item = self.get_selected_document()
+        if document_item is None:
+            return
+
+        # Imported here, it imports pypdf
+        from engine.setupAlgebra import get_operation_order
+
+        pages = document_item.get_pages_data()
+        ranges = None
+        steps = 0
+        if operation == "select":
+            ranges, ok = QtWidgets.QInputDialog.getText(
+                self,
+                "Select Pages",
+                "Pages to keep, in order (e.g. 1-4,8,10- or 20-1):"
+            )
+            if not ok or not ranges.strip():
+                return
+        elif operation == "rotate_order":
+            steps, ok = QtWidgets.QInputDialog.getInt(
+                self,
+                "Rotate Page Order",
+                "Move the pages forward by (negative to move back):",
+                1, -len(pages), len(pages)
+            )
+            if not ok:
+                return
+
+        try:
+            order = get_operation_order(operation, [len(pages)], ranges=ranges, steps=steps)
+        except ValueError as exception:
+            QtWidgets.QMessageBox.warning(self, "Invalid Page Ranges", str(exception))
+            return
+        self.apply_page_order(document_item, pages, order)
+
+    def combine_documents(self, operation, reverse_last=False):
+        """
+        Interleave or concatenate another document into the selected document.
+
+        The other document is chosen in a dialog and removed once its pages
+        are in the selected document.
+
+        Args:
+            operation (str): "interleave" or "concatenate"
+            reverse_last (bool, optional): Take the other document backwards, as the
+                backs of a duplex scan. Defaults to False.
+        """
+        document_item = self.get_selected_document()
+        if document_item is None:
+            return
+        other_items = [item for item in self.get_items() if item not in (document_item, self.undocumented_item)]
+        if not other_items:
+            return
+
+        names = [item.text(0) for item in other_items]
+        name, ok = QtWidgets.QInputDialog.getItem(
+            self,
+            "Interleave Documents" if operation == "interleave" else "Append Document",
+            "Pages of {0} with:".format(document_item.text(0)),
+            names,
+            0,
+            False
+        )
+        if not ok:
+            return
+        other_item = other_items[names.index(name)]
+
+        # Imported here, it imports pypdf
+        from engine.setupAlgebra import get_operation_order
+
+        pages = document_item.get_pages_data()
+        other_pages = other_item.get_pages_data()
+        order = get_operation_order(operation, [len(pages), len(other_pages)], reverse_last=reverse_last)
+        self.apply_page_order(document_item, pages + other_pages, order)
+        self.page_index.remove_doc(other_item)
+        self.invisibleRootItem().removeChild(other_item)
+
     def remove(self, items=None, source_deleted=False, bypass_confirm=False):
         """
         Remove items from the tree widget.
@@ -829,12 +1398,25 @@ class DocumentOutputTreeWidget(QtWidgets.QTreeWidget):
             if item.parent():
                 self._reparent_item(item, self.undocumented_item)
 
+            elif not item.is_populated() and not self.undocumented_item.is_populated():
+                # Neither document has page items yet, move the page data
+                pages = item.get_pages_data()
+                for page in pages:
+                    self.page_index.move_page(page[3], self.undocumented_item)
+                self.undocumented_item.set_pending_pages(self.undocumented_item.get_pages_data() + pages)
+                if self.filter_ids is not None:
+                    self._apply_filter_to_document(self.undocumented_item)
+                self.page_index.remove_doc(item)
+                self.invisibleRootItem().removeChild(item)
+
             else:
                 # This is a document item
                 # Move all child pages to undocumented container
+                item.populate()
                 child_items = list(item.get_children())
                 for child_item in child_items:
                     self._reparent_item(child_item, self.undocumented_item)
 
                 # Remove the document item
+                self.page_index.remove_doc(item)
                 self.invisibleRootItem().removeChild(item)
@@ -8,14 +8,20 @@ class DocumentViewerWidget(QtWidgets.QWidget):
     A custom QWidget that integrates QtPdfWidgets.QPdfView to display PDF documents.
     It provides functionality to open PDF files and jump to specific pages.
     """
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, get_password=None, get_local_path=None):
         """
         Initializes the DocumentViewerWidget.
 
         Args:
             parent (QtWidgets.QWidget, optional): The parent widget. Defaults to None.
+            get_password (callable, optional): Returns the known password of an encrypted
+                                               document path, or None. Defaults to None.
+            get_local_path (callable, optional): Returns the path to load a document path from,
+                                                 e.g. its staged local copy. Defaults to None.
         """
         super().__init__(parent)
+        self.get_password = get_password
+        self.get_local_path = get_local_path
         self.setLayout(QtWidgets.QVBoxLayout())
         self.layout().setContentsMargins(0,0,0,0) # Remove margins around the layout
         self.doc_list_combobox = QtWidgets.QComboBox()
@@ -76,7 +82,9 @@ class DocumentViewerWidget(QtWidgets.QWidget):
             self.pdf_view.setPageMode(QtPdfWidgets.QPdfView.PageMode.MultiPage)
 
         # Load the PDF document from the specified path
-        self.qt_pdf_document.load(path)
+        password = self.get_password(path) if self.get_password else None
+        self.qt_pdf_document.setPassword(password or "")
+        self.qt_pdf_document.load(self.get_local_path(path) if self.get_local_path else path)
 
     def page_selected(self, page_number: int):
         """
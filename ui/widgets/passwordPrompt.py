@@ -0,0 +1,66 @@
+"""
+Password prompt for encrypted source documents.
+
+Classes:
+    PasswordPrompt: Password provider of the credential cache asking the user
+"""
+
+import os
+
+from PySide6 import QtCore, QtWidgets
+
+
+class PasswordPrompt(QtCore.QObject):
+    """
+    Password provider asking the user in a dialog.
+
+    Called with (document, attempt) by the credential cache, from the UI
+    thread or from a background thread, in which case the dialog is shown
+    on the UI thread and the caller waits for the answer.
+    """
+
+    requested = QtCore.Signal(str, int)
+
+    def __init__(self, parent_widget=None):
+        """
+        Initialize the password prompt. Must be created on the UI thread.
+
+        Args:
+            parent_widget (QtWidgets.QWidget, optional): Parent of the dialogs. Defaults to None.
+        """
+        super().__init__()
+        self.parent_widget = parent_widget
+        self.password = None
+        self.requested.connect(self.ask, QtCore.Qt.BlockingQueuedConnection)
+
+    def __call__(self, document, attempt):
+        """
+        Asks the password of a document.
+
+        Args:
+            document (str): Path of the encrypted PDF file.
+            attempt (int): Number of this attempt, starting at 1.
+
+        Returns:
+            str: The password, None if the user cancelled.
+        """
+        if QtCore.QThread.currentThread() is self.thread():
+            self.ask(document, attempt)
+        else:
+            self.requested.emit(document, attempt)
+        return self.password
+
+    def ask(self, document, attempt):
+        """
+        Shows the password dialog and stores the answer in self.password.
+
+        Args:
+            document (str): Path of the encrypted PDF file.
+            attempt (int): Number of this attempt, starting at 1.
+        """
+        label = "{0} is password protected.".format(os.path.basename(document))
+        if attempt > 1:
+            label = "Wrong password. " + label
+        password, accepted = QtWidgets.QInputDialog.getText(
+            self.parent_widget, "Password Required", label + "\nPassword:", QtWidgets.QLineEdit.Password)
+        self.password = password if accepted else None
@@ -0,0 +1,51 @@
+"""
+Background thread running a long engine call.
+
+Classes:
+    TaskThread: Runs a callable off the UI thread and reports progress and result
+"""
+
+import logging
+logger = logging.getLogger(__name__)
+
+from PySide6 import QtCore
+
+
+class TaskThread(QtCore.QThread):
+    """
+    Background thread running a callable that accepts a progress_callback.
+
+    Signals:
+        progress (int, int): Emitted with (done, total) by the callable
+        result (object): Emitted with the return value on success
+        error (str): Emitted with the error message on failure
+    """
+
+    progress = QtCore.Signal(int, int)
+    result = QtCore.Signal(object)
+    error = QtCore.Signal(str)
+
+    def __init__(self, function, *args, parent=None, **kwargs):
+        """
+        Initialize the task thread.
+
+        Args:
+            function (callable): Function to run, called with progress_callback as keyword argument
+            *args: Positional arguments of the function
+            parent (QtCore.QObject, optional): Qt parent. Defaults to None.
+            **kwargs: Keyword arguments of the function
+        """
+        super().__init__(parent)
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        """Run the function and emit its result or error."""
+        try:
+            value = self.function(*self.args, progress_callback=self.progress.emit, **self.kwargs)
+        except Exception as e:
+            logger.exception("Background task failed.")
+            self.error.emit(str(e))
+        else:
+            self.result.emit(value)
@@ -0,0 +1,148 @@
+"""
+Full-text search over the loaded source documents.
+
+Classes:
+    TextIndexThread: Background job extracting source text into the text index
+    TextSearchDialog: Dialog to search page text and assign hits to a document
+"""
+
+import os
+
+import logging
+logger = logging.getLogger(__name__)
+
+from PySide6 import QtCore, QtWidgets
+
+from engine.textIndex import TextIndex
+
+# Worker processes extracting text, kept low so the UI and previews stay responsive.
+TEXT_INDEX_WORKERS = 2
+
+
+class TextIndexThread(QtCore.QThread):
+    """
+    Background thread indexing the text of source documents.
+
+    The extraction itself runs in a small process pool, this thread only
+    waits for it so the UI stays responsive.
+
+    Signals:
+        progress (int, int): Emitted after each source (done, total)
+    """
+
+    progress = QtCore.Signal(int, int)
+
+    def __init__(self, documents, passwords=None, parent=None):
+        """
+        Initialize the indexing thread.
+
+        Args:
+            documents (list): List of PDF files to index
+            passwords (dict, optional): Passwords of encrypted sources, keyed by document. Defaults to None.
+            parent (QtCore.QObject, optional): Qt parent. Defaults to None.
+        """
+        super().__init__(parent)
+        self.documents = list(documents)
+        self.passwords = dict(passwords or {})
+
+    def run(self):
+        """Index all documents not indexed yet."""
+        text_index = TextIndex()
+        try:
+            text_index.index_documents(
+                self.documents, max_workers=TEXT_INDEX_WORKERS, progress_callback=self.progress.emit,
+                passwords=self.passwords)
+        except Exception:
+            logger.exception("Text indexing failed.")
+        finally:
+            text_index.close()
+
+
+class TextSearchDialog(QtWidgets.QDialog):
+    """
+    Dialog to search the text of source pages and move the hits to a document.
+    """
+
+    def __init__(self, tree_widget, document_list, parent=None):
+        """
+        Initialize the search dialog.
+
+        Args:
+            tree_widget (DocumentOutputTreeWidget): Output tree holding the pages
+            document_list (list): Source documents to search
+            parent (QtWidgets.QWidget, optional): Parent widget. Defaults to None.
+        """
+        super().__init__(parent)
+        self.tree_widget = tree_widget
+        self.document_list = list(document_list)
+        self.setWindowTitle("Search Text")
+        self.resize(600, 500)
+        self.setLayout(QtWidgets.QVBoxLayout())
+
+        search_layout = QtWidgets.QHBoxLayout()
+        self.search_line_edit = QtWidgets.QLineEdit()
+        self.search_line_edit.setPlaceholderText('Words or "a phrase"')
+        search_layout.addWidget(self.search_line_edit)
+        self.search_button = QtWidgets.QPushButton("Search")
+        search_layout.addWidget(self.search_button)
+        self.layout().addLayout(search_layout)
+
+        self.results_list_widget = QtWidgets.QListWidget()
+        self.layout().addWidget(self.results_list_widget)
+
+        assign_layout = QtWidgets.QHBoxLayout()
+        assign_layout.addWidget(QtWidgets.QLabel("Move checked pages to:"))
+        self.target_combobox = QtWidgets.QComboBox()
+        assign_layout.addWidget(self.target_combobox, 1)
+        self.assign_button = QtWidgets.QPushButton("Assign")
+        assign_layout.addWidget(self.assign_button)
+        self.close_button = QtWidgets.QPushButton("Close")
+        assign_layout.addWidget(self.close_button)
+        self.layout().addLayout(assign_layout)
+
+        self.update_targets()
+
+        self.search_line_edit.returnPressed.connect(self.search)
+        self.search_button.clicked.connect(self.search)
+        self.assign_button.clicked.connect(self.assign)
+        self.close_button.clicked.connect(self.close)
+
+    def update_targets(self):
+        """Fill the target combobox with the current output documents."""
+        self.target_items = list(self.tree_widget.get_items())
+        self.target_combobox.clear()
+        self.target_combobox.addItems([item.text(0) for item in self.target_items])
+
+    def search(self):
+        """Search the text index and list the matching pages."""
+        self.results_list_widget.clear()
+        text_index = TextIndex()
+        try:
+            results = text_index.search(self.search_line_edit.text(), documents=self.document_list)
+        finally:
+            text_index.close()
+
+        for source_document, page_number, snippet in results:
+            list_item = QtWidgets.QListWidgetItem(
+                "{0} p.{1}: {2}".format(os.path.basename(source_document), page_number, snippet))
+            list_item.setData(QtCore.Qt.UserRole, (source_document, page_number))
+            list_item.setFlags(list_item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            list_item.setCheckState(QtCore.Qt.Checked)
+            self.results_list_widget.addItem(list_item)
+
+    def assign(self):
+        """Move all output pages of the checked hits to the target document."""
+        if self.target_combobox.currentIndex() < 0:
+            return
+        target_item = self.target_items[self.target_combobox.currentIndex()]
+
+        page_ids = set()
+        for row in range(self.results_list_widget.count()):
+            list_item = self.results_list_widget.item(row)
+            if list_item.checkState() != QtCore.Qt.Checked:
+                continue
+            source_document, page_number = list_item.data(QtCore.Qt.UserRole)
+            page_ids |= self.tree_widget.page_index.find_pages(source_document, page_number)
+
+        moved = self.tree_widget.move_pages(page_ids, target_item)
+        logger.info("Moved %s pages to %s", moved, target_item.text(0))